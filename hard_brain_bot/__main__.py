@@ -2,18 +2,43 @@ import os
 import sys
 from loguru import logger
 
-from hard_brain_bot.client import HardBrain
+from hard_brain_bot.client import HardBrain, add_shard_to_log_record, parse_shard_ids
+from hard_brain_bot.services.diagnostics import Diagnostics
 
 if __name__ == "__main__":
-    bot = HardBrain()
+    logger.configure(patcher=add_shard_to_log_record)
+    shard_count = int(count) if (count := os.getenv("HARD_BRAIN_SHARD_COUNT")) else None
+    shard_ids = parse_shard_ids(ids) if (ids := os.getenv("HARD_BRAIN_SHARD_IDS")) else None
+    metrics_port = int(port) if (port := os.getenv("HARD_BRAIN_METRICS_PORT")) else None
+    diagnostics = None
+    if os.getenv("HARD_BRAIN_DIAGNOSTICS"):
+        diagnostics = Diagnostics(
+            slow_callback_threshold=int(os.getenv("HARD_BRAIN_SLOW_CALLBACK_MS", 100)) / 1000,
+            profile_directory=os.getenv("HARD_BRAIN_PROFILE_DIR", "profiles"),
+        )
+    bot = HardBrain(
+        shard_count=shard_count,
+        shard_ids=shard_ids,
+        metrics_port=metrics_port,
+        diagnostics=diagnostics,
+        score_database_path=os.getenv("HARD_BRAIN_SCORE_DATABASE"),
+    )
     bot.load_extension("hard_brain_bot.cogs.general_commands")
     bot.load_extension("hard_brain_bot.cogs.quiz_commands")
-    logger.add(sys.stderr, format="{time} {level} {message}", level="INFO")
+    bot.load_extension("hard_brain_bot.cogs.leaderboard_commands")
+    if diagnostics:
+        bot.load_extension("hard_brain_bot.cogs.diagnostics_commands")
+    logger.add(sys.stderr, format="{time} {level} [shard {extra[shard]}] {message}", level="INFO")
 
 
     @bot.event
     async def on_ready():
-        logger.info(f"Logged in as {bot.user} (ID: {bot.user.id})")
+        logger.info(f"Logged in as {bot.user} (ID: {bot.user.id}) running shards {sorted(bot.shards.keys())}")
+
+
+    @bot.event
+    async def on_shard_ready(shard_id: int):
+        logger.info(f"Shard {shard_id} is ready")
 
 
     if not (token := os.getenv("DISCORD_TOKEN")):
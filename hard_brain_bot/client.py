@@ -1,18 +1,106 @@
+import re
+from contextvars import ContextVar
+
 import disnake
 from disnake.ext import commands
 
+from hard_brain_bot.services.diagnostics import Diagnostics
+from hard_brain_bot.services.hard_brain_service import HardBrainService
+from hard_brain_bot.services.metrics_server import MetricsServer
+from hard_brain_bot.services.score_store import ScoreStore
+from hard_brain_bot.services.webhook_pool import WebhookPool
+from hard_brain_bot.utils.metrics import VOICE_CONNECTIONS
+
+# shard of the guild that the current command or event came from, for logging
+current_shard: ContextVar[int | str] = ContextVar("current_shard", default="-")
+
+
+def add_shard_to_log_record(record: dict) -> None:
+    """
+    Loguru patcher which adds the current shard to a log record's extras.
+    """
+    record["extra"].setdefault("shard", current_shard.get())
+
 
-class HardBrain(commands.Bot):
+def parse_shard_ids(user_input: str) -> list[int]:
+    """
+    Parses a comma-separated list of shard ids, with ranges separated by dashes (e.g. 0,1,4-7).
+    """
+    if not re.fullmatch(r"\s*\d+(\s*-\s*\d+)?(\s*,\s*\d+(\s*-\s*\d+)?)*\s*", user_input):
+        raise ValueError(f"Invalid shard ids '{user_input}'")
+    result = set()
+    for i in re.compile(r"(\d+)(?:\s*-\s*(\d+))?").finditer(user_input):
+        start = int(i.group(1))
+        end = int(i.group(2)) if i.group(2) else start
+        result.update(range(start, end + 1))
+    return sorted(result)
+
+
+class HardBrain(commands.AutoShardedBot):
     def __init__(
         self,
         command_prefix: str = "hb!",
         intents: disnake.Intents | None = None,
         debug: bool = False,
+        shard_count: int | None = None,
+        shard_ids: list[int] | None = None,
+        metrics_port: int | None = None,
+        diagnostics: Diagnostics | None = None,
+        score_database_path: str | None = None,
     ) -> None:
+        """
+        The Hard Brain bot. By default, Discord's recommended number of shards is used and all of them are run in
+        this process. To split shards across processes, give each process the total shard count and its shard ids.
+        :param shard_count: Total number of shards across all processes.
+        :param shard_ids: Shards to run in this process. Requires shard_count.
+        :param metrics_port: Port to serve metrics on. If None, metrics are still recorded but not served.
+        :param diagnostics: If given, event loop diagnostics are run while the bot is running.
+        :param score_database_path: Path of the SQLite file to keep scores in for leaderboards, and the channels
+        with quiz webhooks in. If None, scores aren't kept after each game.
+        """
         command_sync_flags = commands.CommandSyncFlags.default()
         if not intents:
             intents = disnake.Intents.default()
             intents.message_content = True
         if debug:
             command_sync_flags.sync_commands_debug = True
-        super().__init__(command_prefix, intents=intents, command_sync_flags=command_sync_flags)
+        if shard_ids is not None and shard_count is None:
+            raise ValueError("shard_count must be set when shard_ids are given")
+        if shard_ids is not None and not all(0 <= shard_id < shard_count for shard_id in shard_ids):
+            raise ValueError(f"shard_ids must be between 0 and {shard_count - 1}")
+        super().__init__(
+            command_prefix,
+            intents=intents,
+            command_sync_flags=command_sync_flags,
+            shard_count=shard_count,
+            shard_ids=shard_ids,
+        )
+        self.backend = HardBrainService()
+        self.metrics_server = MetricsServer(port=metrics_port) if metrics_port else None
+        self.diagnostics = diagnostics
+        self.score_store = ScoreStore(score_database_path) if score_database_path else None
+        self.webhook_pool = WebhookPool(self, database_path=score_database_path)
+        VOICE_CONNECTIONS.set_function(lambda: len(self.voice_clients))
+
+    async def start(self, *args, **kwargs) -> None:
+        await self.backend.start()
+        if self.score_store:
+            await self.score_store.start()
+        await self.webhook_pool.start()
+        if self.diagnostics:
+            await self.diagnostics.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+        await super().start(*args, **kwargs)
+
+    async def close(self) -> None:
+        # webhooks are deleted through the bot's HTTP session, so before it is closed
+        await self.webhook_pool.close()
+        await super().close()
+        if self.metrics_server:
+            await self.metrics_server.close()
+        if self.diagnostics:
+            await self.diagnostics.close()
+        if self.score_store:
+            await self.score_store.close()
+        await self.backend.close()
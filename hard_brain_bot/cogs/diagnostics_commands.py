@@ -0,0 +1,41 @@
+import disnake
+from disnake.ext import commands
+from loguru import logger
+
+from hard_brain_bot.client import HardBrain
+
+
+class DiagnosticsCommands(commands.Cog):
+    def __init__(self, bot: HardBrain) -> None:
+        self.bot = bot
+        self.diagnostics = bot.diagnostics
+
+    async def cog_slash_command_error(self, ctx: disnake.ApplicationCommandInteraction, error: Exception) -> None:
+        if isinstance(error, commands.NotOwner):
+            await ctx.response.send_message("Only the bot owner can use this command.", ephemeral=True)
+            return
+        raise error
+
+    @commands.is_owner()
+    @commands.slash_command(description="Profile the bot's event loop and save the profile to a file (owner only)")
+    async def profile(
+        self,
+        ctx: disnake.ApplicationCommandInteraction,
+        seconds: commands.Range[int, 1, 300] = 30,
+    ) -> None:
+        if self.diagnostics.is_profiling():
+            await ctx.response.send_message("A profile is already being taken.", ephemeral=True)
+            return
+        await ctx.response.send_message(f"Profiling for {seconds} seconds...", ephemeral=True)
+        logger.info(f"Profile of {seconds} seconds requested by {ctx.author}")
+        path = await self.diagnostics.profile(seconds)
+        await ctx.edit_original_response(
+            f"Profile written to `{path}` (summary in `{path.with_suffix('.txt')}`). "
+            f"Highest event loop lag so far: {self.diagnostics.max_lag * 1000:.0f} ms"
+        )
+
+
+def setup(bot: HardBrain) -> None:
+    if not bot.diagnostics:
+        raise commands.ExtensionError("Diagnostics are not enabled", name=__name__)
+    bot.add_cog(DiagnosticsCommands(bot))
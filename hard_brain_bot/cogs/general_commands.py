@@ -1,5 +1,5 @@
 import disnake
-from aiohttp import ClientSession, ClientConnectorError
+from aiohttp import ClientConnectorError
 from disnake.ext import commands
 from disnake.ext.commands import CommandInvokeError
 from loguru import logger
@@ -23,7 +23,7 @@ class GeneralCommands(commands.Cog):
         guild_name = ctx.guild.name
         embed = embeds.embed_suggest(author_name, guild_name, current_song_title, suggested_title)
         try:
-            await GeneralCommands._send_feedback(embed)
+            await self._send_feedback(embed)
             await ctx.response.send_message("Your suggestion has been received.", ephemeral=True)
             logger.info(
                 f"Song title suggestion received from user '{author_name}' in guild '{guild_name}': "
@@ -37,15 +37,13 @@ class GeneralCommands(commands.Cog):
             )
             logger.error(f"Unexpected {type(e)} error occurred while sending feedback")
 
-    @staticmethod
-    async def _send_feedback(embed):
+    async def _send_feedback(self, embed):
         feedback_webhook_url = "https://discord.com/api/webhooks/1238906406032117821/" \
                                "hEZy1y2rafcmvPbY1_BkfuGw4GqicKbYPdxtO9JG5hbukZFXQZhc_UXdkqnAUR-ZK5WE"
-        async with ClientSession() as session:
-            feedback_webhook = disnake.Webhook.from_url(
-                feedback_webhook_url,
-                session=session)
-            await feedback_webhook.send(embed=embed)
+        feedback_webhook = disnake.Webhook.from_url(
+            feedback_webhook_url,
+            session=self.bot.backend.session)
+        await feedback_webhook.send(embed=embed)
 
 
 def setup(bot: HardBrain) -> None:
@@ -0,0 +1,59 @@
+import disnake
+from disnake.ext import commands
+from loguru import logger
+
+from hard_brain_bot.client import HardBrain
+from hard_brain_bot.message_templates import embeds
+
+
+class LeaderboardCommands(commands.Cog):
+    LEADERBOARD_SIZE: int = 10
+    HISTORY_SIZE: int = 10
+
+    def __init__(self, bot: HardBrain) -> None:
+        self.bot = bot
+        self.score_store = bot.score_store
+
+    @commands.slash_command(description="Shows the players with the most points across all quizzes")
+    async def leaderboard(
+        self,
+        ctx: disnake.ApplicationCommandInteraction,
+        scope: str = commands.Param(default="server", choices=["server", "global"]),
+    ) -> None:
+        logger.info("Responding to 'leaderboard' command")
+        if not await self._check_score_store(ctx):
+            return
+        if scope == "server" and not ctx.guild:
+            await ctx.response.send_message("Error: server leaderboards can only be shown in a server", ephemeral=True)
+            return
+        guild_id = ctx.guild.id if scope == "server" else None
+        entries = await self.score_store.top_players(guild_id, limit=LeaderboardCommands.LEADERBOARD_SIZE)
+        title = f"{ctx.guild.name} Leaderboard" if guild_id else "Global Leaderboard"
+        await ctx.response.send_message(embed=embeds.embed_leaderboard(entries, title=title))
+
+    @commands.slash_command(description="Shows a player's points and recent scores in this server")
+    async def player_scores(
+        self,
+        ctx: disnake.ApplicationCommandInteraction,
+        player: disnake.User | None = None,
+    ) -> None:
+        logger.info("Responding to 'player_scores' command")
+        if not await self._check_score_store(ctx):
+            return
+        player = player or ctx.author
+        history = await self.score_store.player_history(
+            player.id, guild_id=ctx.guild.id if ctx.guild else None, limit=LeaderboardCommands.HISTORY_SIZE
+        )
+        await ctx.response.send_message(
+            embed=embeds.embed_player_history(player.display_name, history, thumbnail=player.display_avatar)
+        )
+
+    async def _check_score_store(self, ctx: disnake.ApplicationCommandInteraction) -> bool:
+        if self.score_store is None:
+            await ctx.response.send_message("Leaderboards are not enabled on this bot", ephemeral=True)
+            return False
+        return True
+
+
+def setup(bot: HardBrain) -> None:
+    bot.add_cog(LeaderboardCommands(bot))
@@ -1,18 +1,31 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict
 
 import disnake
 from aiohttp import ClientConnectorError
 from disnake import VoiceClient, Webhook, Thread, TextChannel
-from disnake.ext import commands
+from disnake.ext import commands, tasks
 from disnake.ext.commands import CommandInvokeError
 from loguru import logger
 
-from hard_brain_bot.client import HardBrain
+from hard_brain_bot.client import HardBrain, current_shard
 from hard_brain_bot.message_templates import embeds
-from hard_brain_bot.services.hard_brain_service import HardBrainService
-from hard_brain_bot.services.quiz_service import QuizService
+from hard_brain_bot.services.message_scheduler import MessageScheduler
+from hard_brain_bot.services.question_pool import QuestionPool
+from hard_brain_bot.services.quiz_service import QuizService, load_opus
+from hard_brain_bot.services.song_catalog import SongCatalog
+from hard_brain_bot.services.worker_pool import WorkerPool, WorkerError
 from hard_brain_bot.data_models.game import Game
+from hard_brain_bot.utils.audio import EncoderPool
 from hard_brain_bot.utils.helpers import VersionHelper
+from hard_brain_bot.utils.metrics import ACTIVE_GAMES
+
+
+class QuizSetupError(Exception):
+    pass
 
 
 class QuizCommands(commands.Cog):
@@ -20,21 +33,95 @@ class QuizCommands(commands.Cog):
     MAX_TIME_LIMIT: float = 60.0
     MIN_ROUNDS: int = 1
     MAX_ROUNDS: int = 100
+    PREFETCH_DEPTH: int = int(os.getenv("HARD_BRAIN_PREFETCH_DEPTH", 1))
+    SCORING_WORKERS: int = int(os.getenv("HARD_BRAIN_SCORING_WORKERS", 0))
+    SONG_CATALOG_PATH: str | None = os.getenv("HARD_BRAIN_SONG_CATALOG")
+    ENCODER_POOL_SIZE: int = int(os.getenv("HARD_BRAIN_ENCODER_POOL_SIZE", 0))
+    GAME_WORKERS: int = int(os.getenv("HARD_BRAIN_GAME_WORKERS", 0))
 
     def __init__(self, bot: HardBrain) -> None:
         self.bot = bot
         self.voice: VoiceClient | None = None
-        self.backend = HardBrainService()
+        self.backend = bot.backend
+        self.song_catalog: SongCatalog | None = None
+        if QuizCommands.SONG_CATALOG_PATH:
+            self.song_catalog = SongCatalog(self.backend, QuizCommands.SONG_CATALOG_PATH)
+        self.question_pool = QuestionPool(self.backend, catalog=self.song_catalog)
+        self.encoder_pool: EncoderPool | None = None
+        self.webhook_pool = bot.webhook_pool
+        self.message_scheduler = MessageScheduler()
         self.games: Dict[int, Game] = {}
+        ACTIVE_GAMES.set_function(lambda: len(self.games))
+        # index of games by the id of the text channel or thread they are being played in
+        self.games_by_channel: Dict[int, Game] = {}
+        self.scoring_executor: ProcessPoolExecutor | None = None
+        if QuizCommands.SCORING_WORKERS > 0:
+            self.scoring_executor = ProcessPoolExecutor(max_workers=QuizCommands.SCORING_WORKERS)
+        self.worker_pool: WorkerPool | None = None
+        if QuizCommands.GAME_WORKERS > 0:
+            self.worker_pool = WorkerPool(QuizCommands.GAME_WORKERS)
+
+    def cog_unload(self) -> None:
+        self._sync_song_catalog.cancel()
+        self._sweep_webhooks.cancel()
+        self._sweep_orphaned_webhooks.cancel()
+        if self.encoder_pool:
+            self.encoder_pool.close()
+        if self.scoring_executor:
+            self.scoring_executor.shutdown(wait=False, cancel_futures=True)
+        if self.worker_pool:
+            self.worker_pool.close()
+
+    async def cog_before_slash_command_invoke(self, ctx: disnake.ApplicationCommandInteraction) -> None:
+        if ctx.guild:
+            current_shard.set(ctx.guild.shard_id)
 
     @commands.Cog.listener()
     async def on_message(self, ctx: disnake.Message) -> None:
-        guild_id = ctx.guild.id
-        if (guild_id not in self.games.keys()) or (ctx.author.id == self.bot.user.id):
+        # most messages are not in a quiz channel, so check that before anything else
+        game = self.games_by_channel.get(ctx.channel.id)
+        if game is None or ctx.author.bot:
             return
-        game = self.games[guild_id]
+        current_shard.set(game.shard_id)
         await game.quiz_service.queue_answer_to_check(ctx)
 
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        # warm up the pool for the most common version filter, all styles
+        self.question_pool.refill([])
+        if self.song_catalog and not self._sync_song_catalog.is_running():
+            self._sync_song_catalog.start()
+        if QuizCommands.ENCODER_POOL_SIZE > 0 and not self.encoder_pool:
+            self.encoder_pool = EncoderPool(QuizCommands.ENCODER_POOL_SIZE)
+        if not self._sweep_webhooks.is_running():
+            self._sweep_webhooks.start()
+        if not self._sweep_orphaned_webhooks.is_running():
+            self._sweep_orphaned_webhooks.start()
+
+    @tasks.loop(minutes=10)
+    async def _sweep_webhooks(self) -> None:
+        await self.webhook_pool.sweep()
+
+    @tasks.loop(count=1)
+    async def _sweep_orphaned_webhooks(self) -> None:
+        await self.webhook_pool.sweep_orphans()
+
+    @tasks.loop(hours=6)
+    async def _sync_song_catalog(self) -> None:
+        try:
+            await self.song_catalog.sync()
+        except (ClientConnectorError, ValueError) as e:
+            logger.error(f"Syncing song catalog failed: {e}")
+
+    @_sync_song_catalog.before_loop
+    async def _load_song_catalog(self) -> None:
+        await self.song_catalog.load()
+
+    @commands.Cog.listener()
+    async def on_shard_disconnect(self, shard_id: int) -> None:
+        if games := self.get_games_on_shard(shard_id):
+            logger.warning(f"Shard {shard_id} disconnected with {len(games)} game(s) in progress")
+
     @commands.slash_command(description="Starts a quiz")
     async def start_quiz(
         self,
@@ -72,44 +159,93 @@ class QuizCommands(commands.Cog):
                 await ctx.response.send_message(f"Error: {str(error)}", ephemeral=True)
                 return
 
+        setup_started_at = time.perf_counter()
         await ctx.response.defer()
 
         # begin preparing quiz
         await ctx.edit_original_response("Please wait, preparing a quiz...")
-        if (
-            question_response := await self._get_questions(rounds, validated_versions)
-        ) == {}:
-            await ctx.edit_original_response(
-                f"Network error occurred while preparing quiz..."
+        timings = {"respond": time.perf_counter() - setup_started_at}
+        try:
+            question_response, message_receiver, voice_client = await self._prepare_game(
+                ctx, rounds, validated_versions, timings
             )
+        except QuizSetupError as error:
+            await ctx.edit_original_response(str(error))
             return
-
-        # set up the message receiver to send quiz messages through (either text channel webhook or a thread)
-        message_receiver = await self._setup_message_receiver(ctx)
-        if not message_receiver:
-            await ctx.edit_original_response(
-                f"Error: Channel '{ctx.channel.name}' is not a TextChannel or Thread"
+        finally:
+            timings["total"] = time.perf_counter() - setup_started_at
+            logger.info(
+                "Quiz setup timings: " + ", ".join(f"{phase}={elapsed * 1000:.0f}ms" for phase, elapsed in timings.items())
             )
-            return
 
-        # create quiz instance and add to dict
-        quiz_service = QuizService(
-            ctx,
-            message_receiver,
-            self.backend,
-            song_data_list=question_response,
-            round_time_limit=time_limit,
-        )
-        game = Game(quiz_service, message_receiver)
         guild_id = ctx.guild.id
-        self.games[guild_id] = game
-
+        worker = None
+        game = None
         try:
-            await game.quiz_service.start_game(validated_versions)
+            # the game's scoring and audio work goes to one worker process, if enabled
+            if self.worker_pool:
+                try:
+                    worker = self.worker_pool.assign(guild_id)
+                except WorkerError as e:
+                    logger.error(f"Running game in the gateway process: {e}")
+
+            # create quiz instance and add to dict
+            quiz_service = QuizService(
+                ctx,
+                message_receiver,
+                self.backend,
+                song_data_list=question_response,
+                round_time_limit=time_limit,
+                prefetch_depth=QuizCommands.PREFETCH_DEPTH,
+                scoring_executor=worker or self.scoring_executor,
+                voice_client=voice_client,
+                encoder_pool=self.encoder_pool,
+                message_scheduler=self.message_scheduler,
+                audio_executor=worker,
+                score_store=self.bot.score_store,
+            )
+            game = Game(
+                quiz_service, message_receiver, shard_id=ctx.guild.shard_id,
+                worker_id=worker.worker_id if worker else None,
+            )
+            self.games[guild_id] = game
+            self.games_by_channel[quiz_service.text_channel.id] = game
+            try:
+                await quiz_service.announce(validated_versions)
+            except disnake.NotFound:
+                if not isinstance(message_receiver, Webhook):
+                    raise
+                # the cached webhook was deleted since the last quiz in this channel, so replace it and try again
+                logger.warning(f"Webhook in channel {ctx.channel.id} was deleted, creating a new one")
+                self.webhook_pool.invalidate(ctx.channel.id)
+                self.webhook_pool.release(ctx.channel.id)
+                message_receiver = None
+                try:
+                    message_receiver = await self._setup_message_receiver(ctx)
+                    quiz_service.webhook = message_receiver
+                    await quiz_service.announce(validated_versions)
+                except QuizSetupError as error:
+                    await ctx.edit_original_response(str(error))
+                    return
+                except disnake.NotFound:
+                    self.webhook_pool.invalidate(ctx.channel.id)
+                    await ctx.edit_original_response("Error: Could not send messages to this channel, please try again")
+                    return
+            await quiz_service.play()
+        except disnake.NotFound:
+            # the webhook was most likely deleted during the quiz, so don't reuse it
+            self.webhook_pool.invalidate(ctx.channel.id)
+            raise
         finally:
-            if game.message_receiver and isinstance(game.message_receiver, Webhook):
-                await game.message_receiver.delete()
-            self._remove_game(guild_id)
+            if isinstance(message_receiver, Webhook):
+                self.webhook_pool.release(ctx.channel.id)
+            if game:
+                self._remove_game(guild_id)
+            elif worker:
+                self.worker_pool.release(guild_id, worker.worker_id)
+            # the game normally disconnects when it ends, but not if it failed before starting
+            if voice_client.is_connected():
+                await voice_client.disconnect(force=True)
 
     @commands.slash_command(description="Cancels an ongoing quiz")
     async def end_quiz(self, ctx: disnake.ApplicationCommandInteraction) -> None:
@@ -149,35 +285,92 @@ class QuizCommands(commands.Cog):
             embed=embeds.embed_scores(scores, title="Current Scores")
         )
 
-    async def _setup_message_receiver(self, ctx: disnake.ApplicationCommandInteraction):
-        message_receiver = None
+    async def _prepare_game(
+        self,
+        ctx: disnake.ApplicationCommandInteraction,
+        rounds: int,
+        versions: list[int],
+        timings: Dict[str, float],
+    ) -> tuple[list[dict], Webhook | Thread, VoiceClient]:
+        """
+        Runs the independent quiz setup steps concurrently. If any step fails, the other steps are cancelled and
+        any resources they already set up are released.
+        :param timings: Filled in with how long each step took, in seconds.
+        :return: The questions, message receiver and connected voice client.
+        :raises QuizSetupError: If any step fails, with a message to show the user.
+        """
+        async def timed(phase, coroutine):
+            started_at = time.perf_counter()
+            try:
+                return await coroutine
+            finally:
+                timings[phase] = time.perf_counter() - started_at
+
+        # the guild may already have a voice client, e.g. from a quiz which is still being set up, which isn't
+        # this setup's to disconnect
+        existing_voice_client = ctx.guild.voice_client
+        steps = {
+            "questions": asyncio.create_task(timed("questions", self._get_questions(ctx.guild.id, rounds, versions))),
+            # set up the message receiver to send quiz messages through (either text channel webhook or a thread)
+            "message_receiver": asyncio.create_task(timed("message_receiver", self._setup_message_receiver(ctx))),
+            "voice": asyncio.create_task(timed("voice", self._connect_voice(ctx))),
+            "opus": asyncio.create_task(timed("opus", asyncio.to_thread(load_opus))),
+        }
+        done, pending = await asyncio.wait(steps.values(), return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        succeeded = [task for task in done if not task.cancelled() and task.exception() is None]
+        errors = [task.exception() for task in done if task not in succeeded and not task.cancelled()]
+        if not errors:
+            return steps["questions"].result(), steps["message_receiver"].result(), steps["voice"].result()
+
+        # release whatever this setup acquired before the failure
+        if steps["message_receiver"] in succeeded and isinstance(steps["message_receiver"].result(), Webhook):
+            self.webhook_pool.release(ctx.channel.id)
+        if steps["voice"] in succeeded:
+            await steps["voice"].result().disconnect(force=True)
+        elif ctx.guild.voice_client and ctx.guild.voice_client is not existing_voice_client:
+            # the connection was cancelled part way through
+            await ctx.guild.voice_client.disconnect(force=True)
+        setup_errors = [error for error in errors if isinstance(error, QuizSetupError)]
+        if not setup_errors:
+            logger.error(f"Unexpected error while preparing quiz: {errors[0]!r}")
+            raise QuizSetupError("An unexpected error occurred while preparing quiz...")
+        raise setup_errors[0]
+
+    async def _connect_voice(self, ctx: disnake.ApplicationCommandInteraction) -> VoiceClient:
+        voice_channel = ctx.author.voice.channel
+        try:
+            return await voice_channel.connect()
+        except (asyncio.TimeoutError, disnake.ClientException) as e:
+            logger.error(f"Failed to connect to voice channel: {e}")
+            raise QuizSetupError(f"Error: Could not connect to voice channel '{voice_channel.name}'")
+
+    async def _setup_message_receiver(self, ctx: disnake.ApplicationCommandInteraction) -> Webhook | Thread:
         if isinstance(ctx.channel, TextChannel):
             try:
-                message_receiver = await ctx.channel.create_webhook(
-                    name="Hard Brain",
-                    avatar=self.bot.user.avatar,
-                    reason="Temporary webhook created by Hard Brain and should be removed automatically - "
-                    "if it persists when the quiz is not running, feel free to delete",
-                )
-                logger.debug("Webhook created successfully")
+                return await self.webhook_pool.acquire(ctx.channel)
             except disnake.Forbidden:
-                await ctx.edit_original_response(
+                logger.error("Failed to create webhook: Forbidden")
+                raise QuizSetupError(
                     f"Error: Missing 'Manage Webhooks' permission, try starting in a Thread instead of a text channel"
                 )
-                logger.error("Failed to create webhook: Forbidden")
-                return
         elif isinstance(ctx.channel, Thread):
-            message_receiver = ctx.channel
-        return message_receiver
+            return ctx.channel
+        raise QuizSetupError(f"Error: Channel '{ctx.channel.name}' is not a TextChannel or Thread")
 
-    async def _get_questions(self, rounds: int, versions: list[int]):
+    async def _get_questions(self, guild_id: int, rounds: int, versions: list[int]):
         try:
-            question_response = await self.backend.get_question(
-                number_of_songs=rounds, versions=versions
+            question_response = await self.question_pool.get_questions(
+                guild_id, rounds=rounds, versions=versions
             )
-            return question_response
-        except (CommandInvokeError, ClientConnectorError):
-            return {}
+        except (CommandInvokeError, ClientConnectorError, ValueError):
+            question_response = []
+        if not question_response:
+            raise QuizSetupError("Network error occurred while preparing quiz...")
+        return question_response
 
     async def _check_game_setup_is_possible(
         self, ctx: disnake.ApplicationCommandInteraction
@@ -199,9 +392,17 @@ class QuizCommands(commands.Cog):
             return False
         return True
 
+    def get_games_on_shard(self, shard_id: int) -> Dict[int, Game]:
+        return {guild_id: game for guild_id, game in self.games.items() if game.shard_id == shard_id}
+
     def _remove_game(self, guild_id: int):
         try:
-            del self.games[guild_id]
+            game = self.games.pop(guild_id)
+            channel_id = game.quiz_service.text_channel.id
+            if self.games_by_channel.get(channel_id) is game:
+                del self.games_by_channel[channel_id]
+            if game.worker_id is not None:
+                self.worker_pool.release(guild_id, game.worker_id)
             logger.info(f"Removed game with id '{guild_id}'")
         except KeyError:
             pass
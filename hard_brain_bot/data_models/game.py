@@ -9,3 +9,6 @@ from hard_brain_bot.services.quiz_service import QuizService
 class Game:
     quiz_service: QuizService
     message_receiver: Webhook | Thread
+    shard_id: int = 0
+    # index of the game worker process the game's work is sent to, if game workers are enabled
+    worker_id: int | None = None
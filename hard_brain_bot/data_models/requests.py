@@ -1,42 +1,187 @@
-from dataclasses import dataclass
-from thefuzz import fuzz
+import sys
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+from rapidfuzz import fuzz, process
+from thefuzz import utils
 
 from hard_brain_bot.utils.helpers import VersionHelper
 
 
-@dataclass
+class AnswerKey(NamedTuple):
+    """
+    What a song's answers are checked against, kept apart from the rest of the song so that only these strings
+    are pickled when answers are checked in another process.
+    """
+    # lowercased titles for exact matches, sharing the title strings which are already lowercase
+    correct_answers: tuple[str, ...]
+    # normalized, token-sorted forms of the correct answers, ready to be scored against
+    scorable_answers: tuple[str, ...]
+    # ascii answers shorter than this can't reach the threshold against any scorable answer
+    min_scorable_length: int
+    similarity_threshold: int
+
+    def first_correct_answer(self, answers: list[str]) -> tuple[int | None, Counter[str]]:
+        """
+        Checks a batch of answers in order. Can be run in a process pool.
+        :param answers: Answers in the order they were received.
+        :return: Index of the first correct answer, or None if none are correct, and how many of the answers checked
+        were accepted by exact match ("exact_match"), rejected before fuzzy matching ("rejected_early") or fuzzy
+        matched ("scored").
+        """
+        checks = Counter()
+        for index, answer in enumerate(answers):
+            is_correct, check = self.check_answer(answer)
+            checks[check] += 1
+            if is_correct:
+                return index, checks
+        return None, checks
+
+    def check_answer(self, answer: str) -> tuple[bool, str]:
+        """
+        Checks one answer. Not asynchronous.
+        :return: Whether the answer is correct, and how it was checked, as counted by `first_correct_answer`.
+        """
+        # fast check if answer is in alt_titles
+        if answer.lower() in self.correct_answers:
+            return True, "exact_match"
+
+        # ascii answers can only get shorter when normalized, so short messages can be rejected straight away
+        if answer.isascii() and len(answer) < self.min_scorable_length:
+            return False, "rejected_early"
+
+        # make sure answers are not length of 0, as two empty strings will have 100% similarity
+        normalized_answer = SongData._normalize_text(answer)
+        if len(normalized_answer) == 0 or len(self.scorable_answers) == 0:
+            return False, "rejected_early"
+
+        # only fuzzy match against correct answers which could possibly reach the threshold
+        prepared_answer = SongData._prepare_for_scoring(normalized_answer)
+        candidates = self._get_candidate_answers(prepared_answer)
+        if len(candidates) == 0:
+            return False, "rejected_early"
+
+        # fuzzy match answer against correct answers, stopping at the first one which passes the threshold
+        # scores are rounded before comparing with the threshold, so a raw score of just under it can still pass
+        best_match = process.extractOne(
+            prepared_answer,
+            candidates,
+            scorer=fuzz.ratio,
+            processor=None,
+            score_cutoff=self.similarity_threshold - 0.5,
+        )
+        return best_match is not None and round(best_match[1]) >= self.similarity_threshold, "scored"
+
+    def _get_candidate_answers(self, prepared_answer: str) -> list[str]:
+        # the score is 200 * (longest common subsequence) / (total length), and the longest common subsequence
+        # can't be longer than the shorter string. rapidfuzz stops scoring the rest early once the cutoff is missed
+        cutoff = self.similarity_threshold - 0.5
+        answer_length = len(prepared_answer)
+        return [
+            correct_answer for correct_answer in self.scorable_answers
+            if 200 * min(answer_length, len(correct_answer)) >= cutoff * (answer_length + len(correct_answer))
+        ]
+
+
+@dataclass(frozen=True, slots=True)
 class SongData:
     song_id: str
     filename: str
     title: str
-    alt_titles: list[str]
+    alt_titles: tuple[str, ...]
     game_version: int
     genre: str
     artist: str
+    answer_key: AnswerKey = field(init=False, repr=False, compare=False)
+    version: str = field(init=False, compare=False)
     similarity_threshold = 85
+    # songs created from props by song id, shared between games so their answers are only prepared once
+    _instances = OrderedDict()
+    _max_instances = 8192
 
     def __post_init__(self) -> None:
         alt_titles = list(filter(lambda a: len(a) != 0, self.alt_titles))
-        correct_answers = set(map(lambda s: s.lower(), (self.title, *alt_titles)))
-        self.correct_answers = correct_answers
-        self.version = VersionHelper.get_game_version_from_song_id(self.song_id)
+        correct_answers = tuple(dict.fromkeys(SongData._lower(s) for s in (self.title, *alt_titles)))
+        normalized_answers = (SongData._normalize_text(answer) for answer in correct_answers)
+        prepared_answers = dict.fromkeys(SongData._prepare_for_scoring(a) for a in normalized_answers if len(a) > 0)
+        # reuse the correct answer strings which are already in their prepared form
+        existing = {answer: answer for answer in correct_answers}
+        scorable_answers = tuple(existing.get(a, a) for a in prepared_answers)
+        min_scorable_length = min(
+            (SongData._min_matching_length(len(a)) for a in scorable_answers), default=0
+        )
+        object.__setattr__(
+            self, "answer_key",
+            AnswerKey(correct_answers, scorable_answers, min_scorable_length, self.similarity_threshold),
+        )
+        object.__setattr__(self, "version", sys.intern(VersionHelper.get_game_version_from_song_id(self.song_id)))
+
+    @classmethod
+    def from_props(cls, props: dict) -> "SongData":
+        """
+        Creates a song from the Hard Brain API's question props, reusing the existing instance if the same song
+        has been created before. Not asynchronous.
+        """
+        song_id = props["song_id"]
+        if (song := cls._instances.get(song_id)) is not None and song._has_props(props):
+            cls._instances.move_to_end(song_id)
+            return song
+        song = cls(
+            song_id=props["song_id"],
+            filename=props["filename"],
+            title=props["title"],
+            alt_titles=tuple(props["alt_titles"].split(", ")),
+            game_version=props["game_version"],
+            # many songs share the same genres and artists
+            genre=sys.intern(props["genre"]),
+            artist=sys.intern(props["artist"]),
+        )
+        cls._instances[song_id] = song
+        cls._instances.move_to_end(song_id)
+        if len(cls._instances) > cls._max_instances:
+            cls._instances.popitem(last=False)
+        return song
+
+    def _has_props(self, props: dict) -> bool:
+        return (
+            self.title == props["title"] and ", ".join(self.alt_titles) == props["alt_titles"]
+            and self.filename == props["filename"] and self.game_version == props["game_version"]
+            and self.genre == props["genre"] and self.artist == props["artist"]
+        )
 
     def is_correct_answer(self, answer: str) -> bool:
-        # fast check if answer is in alt_titles
-        if answer.lower() in self.correct_answers:
-            return True
+        return self.answer_key.check_answer(answer)[0]
 
-        # fuzzy match answer against correct answers
-        normalized_answer = SongData._normalize_text(answer)
-        for correct_answer in self.correct_answers:
-            normalized_correct_answer = SongData._normalize_text(correct_answer)
-            score = fuzz.token_sort_ratio(normalized_correct_answer, normalized_answer)
+    def first_correct_answer(self, answers: list[str]) -> tuple[int | None, Counter[str]]:
+        """
+        Checks a batch of answers in order. To check them in another process, send `answer_key.first_correct_answer`
+        rather than this, so that only the answers are pickled and not the whole song.
+        :param answers: Answers in the order they were received.
+        :return: See `AnswerKey.first_correct_answer`.
+        """
+        return self.answer_key.first_correct_answer(answers)
+
+    @classmethod
+    def _min_matching_length(cls, length: int) -> int:
+        # shortest answer which could score above the threshold against a correct answer of the given length
+        cutoff = cls.similarity_threshold - 0.5
+        min_length = 0
+        while 200 * min_length < cutoff * (min_length + length):
+            min_length += 1
+        return min_length
 
-            # make sure answers are not length of 0, as two empty strings will have 100% similarity
-            if len(normalized_correct_answer) > 0 and len(normalized_answer) > 0 and score >= self.similarity_threshold:
-                return True
-        return False
+    @staticmethod
+    def _lower(text: str) -> str:
+        lowered = text.lower()
+        return text if lowered == text else lowered
 
     @staticmethod
     def _normalize_text(text: str) -> str:
         return ''.join(e.lower() for e in text if e.isalnum())
+
+    @staticmethod
+    def _prepare_for_scoring(normalized_text: str) -> str:
+        # equivalent to the preprocessing done by thefuzz's token_sort_ratio
+        processed = utils.full_process(normalized_text, force_ascii=True)
+        return " ".join(sorted(processed.split()))
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Index, String
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class SongRecord(Base):
+    __tablename__ = "songs"
+
+    song_id: Mapped[str] = mapped_column(String(16), primary_key=True)
+    filename: Mapped[str]
+    title: Mapped[str]
+    alt_titles: Mapped[str]
+    game_version: Mapped[int] = mapped_column(index=True)
+    genre: Mapped[str]
+    artist: Mapped[str]
+
+    def to_props(self) -> dict:
+        """
+        The song in the same format as the Hard Brain API's question props.
+        """
+        return {
+            "song_id": self.song_id,
+            "filename": self.filename,
+            "title": self.title,
+            "alt_titles": self.alt_titles,
+            "game_version": self.game_version,
+            "genre": self.genre,
+            "artist": self.artist,
+        }
+
+
+class ScoreEvent(Base):
+    __tablename__ = "score_events"
+    __table_args__ = (
+        Index("ix_score_events_guild_user", "guild_id", "user_id"),
+        Index("ix_score_events_user_scored_at", "user_id", "scored_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    guild_id: Mapped[int] = mapped_column(BigInteger)
+    # display name when the points were scored, for showing in leaderboards
+    user_name: Mapped[str]
+    points: Mapped[int]
+    song_id: Mapped[str | None] = mapped_column(String(16))
+    scored_at: Mapped[datetime] = mapped_column(DateTime)
+
+
+class WebhookChannel(Base):
+    __tablename__ = "webhook_channels"
+
+    # channels the bot has created or adopted a webhook in, so that it can be removed if the bot stops uncleanly
+    channel_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    guild_id: Mapped[int] = mapped_column(BigInteger, index=True)
@@ -1,8 +1,19 @@
-from collections import Counter
+from collections import Counter, OrderedDict
+from datetime import timezone
+from functools import cache
 
 from disnake import Embed, Asset
 import importlib.metadata
 from hard_brain_bot.data_models.requests import SongData
+from hard_brain_bot.services.score_store import LeaderboardEntry, PlayerHistory
+
+MAX_CACHED_SONG_EMBEDS = 1024
+_song_embeds: OrderedDict[str, tuple[SongData, Embed]] = OrderedDict()
+
+
+@cache
+def _bot_version() -> str:
+    return importlib.metadata.version('hard_brain_bot')
 
 
 def embed_about() -> Embed:
@@ -13,10 +24,11 @@ def embed_about() -> Embed:
     )
     embed.add_field(
         name="Commands",
-        value="`about`, `start_quiz`, `skip_round`, `end_quiz`, `current_scores`, `suggest`",
+        value="`about`, `start_quiz`, `skip_round`, `end_quiz`, `current_scores`, `leaderboard`, `player_scores`, "
+              "`suggest`",
         inline=False,
     )
-    embed.add_field(name="Version", value=f"{importlib.metadata.version('hard_brain_bot')}")
+    embed.add_field(name="Version", value=_bot_version())
     return embed
 
 
@@ -33,11 +45,24 @@ def embed_suggest(user_name: str, guild_name: str, current_title: str, suggested
 def embed_song_data(
     title: str, song_data: SongData, thumbnail: Asset | None = None
 ) -> Embed:
-    embed = Embed(
-        title=title,
-    )
+    embed = _song_embed(song_data).copy()
+    embed.title = title
     if thumbnail:
         embed.set_thumbnail(thumbnail)
+    return embed
+
+
+def _song_embed(song_data: SongData) -> Embed:
+    """
+    The parts of a song's embed which only depend on the song, built once per song id and kept in a bounded LRU.
+    Callers must copy it before changing it.
+    """
+    cached = _song_embeds.get(song_data.song_id)
+    # SongData instances are shared, so a different instance means the song may have changed since it was cached
+    if cached is not None and cached[0] is song_data:
+        _song_embeds.move_to_end(song_data.song_id)
+        return cached[1]
+    embed = Embed()
     embed.add_field(name="Song Title", value=song_data.title, inline=False)
     embed.add_field(name="Song Artist", value=song_data.artist, inline=False)
     embed.add_field(name="Genre", value=song_data.genre, inline=False)
@@ -45,6 +70,10 @@ def embed_song_data(
         titles = [f"`{title}`" for title in song_data.alt_titles]
         embed.add_field(name="Alternate Titles", value=", ".join(titles), inline=False)
     embed.add_field(name="Game Version", value=song_data.version, inline=False)
+    _song_embeds[song_data.song_id] = (song_data, embed)
+    _song_embeds.move_to_end(song_data.song_id)
+    if len(_song_embeds) > MAX_CACHED_SONG_EMBEDS:
+        _song_embeds.popitem(last=False)
     return embed
 
 
@@ -70,3 +99,33 @@ def embed_scores(scores: Counter, title: str = "Scores") -> Embed:
         value="\n".join(players) if len(players) > 0 else "No one got any points!",
     )
     return embed
+
+
+def embed_leaderboard(entries: list[LeaderboardEntry], title: str) -> Embed:
+    embed = Embed(title=title)
+    players = [
+        f"#{rank}: {entry.user_name} - `{entry.points}` ({entry.rounds_won} round{'s' if entry.rounds_won != 1 else ''})"
+        for rank, entry in enumerate(entries, 1)
+    ]
+    embed.add_field(
+        name=f"Top {len(entries)} Player{'s' if len(entries) != 1 else ''}" if entries else "Results",
+        value="\n".join(players) if players else "No one has scored any points yet!",
+    )
+    return embed
+
+
+def embed_player_history(player_name: str, history: PlayerHistory, thumbnail: Asset | None = None) -> Embed:
+    embed = Embed(
+        title=f"Scores for {player_name}",
+        description=f"`{history.total_points}` points from {history.rounds_won} "
+                    f"round{'s' if history.rounds_won != 1 else ''} won",
+    )
+    if thumbnail:
+        embed.set_thumbnail(thumbnail)
+    if history.recent:
+        recent = [
+            f"<t:{int(scored_at.replace(tzinfo=timezone.utc).timestamp())}:R> - `{points}` points"
+            for scored_at, _, _, points in history.recent
+        ]
+        embed.add_field(name="Recent Scores", value="\n".join(recent), inline=False)
+    return embed
@@ -0,0 +1,162 @@
+import asyncio
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+
+class AudioCache:
+    def __init__(
+        self,
+        memory_budget: int = 64 * 1024 * 1024,
+        disk_directory: str | None = None,
+        disk_budget: int = 1024 * 1024 * 1024,
+    ):
+        """
+        A two-tier cache of audio clips keyed by song id. Clips are kept in a size-bounded in-memory LRU and,
+        if a directory is given, in a size-bounded directory on disk. Both tiers evict least recently used clips
+        first once over budget.
+        :param memory_budget: Maximum total size in bytes of clips held in memory.
+        :param disk_directory: Directory to store clips in. If None, the disk tier is disabled.
+        :param disk_budget: Maximum total size in bytes of clips stored on disk.
+        """
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.disk_directory = Path(disk_directory) if disk_directory else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_size = 0
+        self._in_flight: dict[str, asyncio.Future] = {}
+        if self.disk_directory:
+            self._load_disk_index()
+
+    async def get_or_fetch(self, song_id: str, fetch: Callable[[str], Awaitable[bytes]]) -> bytes:
+        """
+        Gets a clip from the cache, fetching and storing it on a miss. Concurrent requests for the same clip share
+        a single fetch.
+        :param song_id: Song id of the clip.
+        :param fetch: Coroutine function which fetches the clip for a song id.
+        :return: The clip bytes.
+        """
+        if (data := self._get_from_memory(song_id)) is not None:
+            self.hits += 1
+            return data
+
+        while song_id in self._in_flight:
+            in_flight = self._in_flight[song_id]
+            try:
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                # only give up if this caller was cancelled, otherwise take over the cancelled fetch
+                if not in_flight.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[song_id] = future
+        try:
+            data = await self._get_from_disk(song_id)
+            if data is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                data = await fetch(song_id)
+                await self._put_on_disk(song_id, data)
+            self._put_in_memory(song_id, data)
+            future.set_result(data)
+            return data
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark the exception as retrieved in case no one else is waiting on this fetch
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[song_id]
+
+    def __contains__(self, song_id: str) -> bool:
+        return song_id in self._memory
+
+    def stats(self) -> dict[str, int]:
+        """
+        Hit/miss counters and current tier sizes. Not asynchronous.
+        """
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_bytes": self._memory_size,
+            "disk_bytes": self._disk_size,
+        }
+
+    def _get_from_memory(self, song_id: str) -> bytes | None:
+        data = self._memory.get(song_id)
+        if data is not None:
+            self._memory.move_to_end(song_id)
+        return data
+
+    def _put_in_memory(self, song_id: str, data: bytes) -> None:
+        if len(data) > self.memory_budget:
+            return
+        if song_id in self._memory:
+            self._memory_size -= len(self._memory.pop(song_id))
+        self._memory[song_id] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _path_for(self, song_id: str) -> Path:
+        return self.disk_directory / f"{song_id}.audio"
+
+    def _load_disk_index(self) -> None:
+        self.disk_directory.mkdir(parents=True, exist_ok=True)
+        entries = sorted(self.disk_directory.glob("*.audio"), key=lambda p: p.stat().st_mtime)
+        for path in entries:
+            size = path.stat().st_size
+            self._disk[path.stem] = size
+            self._disk_size += size
+        self._evict_from_disk()
+
+    async def _get_from_disk(self, song_id: str) -> bytes | None:
+        if not self.disk_directory or song_id not in self._disk:
+            return None
+        self._disk.move_to_end(song_id)
+        try:
+            return await asyncio.to_thread(self._path_for(song_id).read_bytes)
+        except OSError as e:
+            logger.warning(f"Could not read cached audio for song id {song_id}: {e}")
+            self._disk_size -= self._disk.pop(song_id, 0)
+            return None
+
+    async def _put_on_disk(self, song_id: str, data: bytes) -> None:
+        if not self.disk_directory or len(data) > self.disk_budget:
+            return
+        path = self._path_for(song_id)
+        temp_path = path.with_suffix(".tmp")
+        try:
+            await asyncio.to_thread(temp_path.write_bytes, data)
+            await asyncio.to_thread(os.replace, temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write cached audio for song id {song_id}: {e}")
+            return
+        self._disk_size -= self._disk.pop(song_id, 0)
+        self._disk[song_id] = len(data)
+        self._disk_size += len(data)
+        self._evict_from_disk()
+
+    def _evict_from_disk(self) -> None:
+        while self._disk_size > self.disk_budget and self._disk:
+            song_id, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            try:
+                self._path_for(song_id).unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not evict cached audio for song id {song_id}: {e}")
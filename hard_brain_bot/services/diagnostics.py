@@ -0,0 +1,166 @@
+import asyncio
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import traceback
+from asyncio.events import Handle
+from datetime import datetime
+from pathlib import Path
+
+from loguru import logger
+
+from hard_brain_bot.utils.async_helpers import measure_loop_lag
+
+
+class Diagnostics:
+    def __init__(
+        self,
+        slow_callback_threshold: float = 0.1,
+        lag_interval: float = 0.5,
+        lag_warning_threshold: float = 0.25,
+        profile_directory: str = "profiles",
+    ):
+        """
+        Opt-in tools for finding what is blocking the event loop. While running, it logs event loop lag and any
+        callback which runs for longer than the threshold, along with its coroutine and the stack it was blocked in,
+        and can profile the event loop for a window of time.
+        :param slow_callback_threshold: Seconds a callback can run for before it is logged.
+        :param lag_interval: Seconds between event loop lag measurements.
+        :param lag_warning_threshold: Event loop lag in seconds above which a warning is logged.
+        :param profile_directory: Directory to write profiles to.
+        """
+        self.slow_callback_threshold = slow_callback_threshold
+        self.lag_interval = lag_interval
+        self.lag_warning_threshold = lag_warning_threshold
+        self.profile_directory = Path(profile_directory)
+        self.max_lag = 0.0
+        self._loop_thread_id: int | None = None
+        self._original_run = None
+        self._lag_task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._profiling = False
+        # the callback currently running on the event loop, and the stack it was seen blocked in by the watchdog
+        self._current_handle: Handle | None = None
+        self._current_started_at = 0.0
+        self._blocked_stack: tuple[Handle, str] | None = None
+
+    async def start(self) -> None:
+        """
+        Starts monitoring the running event loop.
+        """
+        if self._original_run is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._original_run = Handle._run
+        diagnostics = self
+
+        def timed_run(handle: Handle) -> None:
+            if threading.get_ident() != diagnostics._loop_thread_id:
+                return diagnostics._original_run(handle)
+            diagnostics._current_handle = handle
+            diagnostics._current_started_at = time.perf_counter()
+            try:
+                return diagnostics._original_run(handle)
+            finally:
+                elapsed = time.perf_counter() - diagnostics._current_started_at
+                diagnostics._current_handle = None
+                if elapsed >= diagnostics.slow_callback_threshold:
+                    diagnostics._report_slow_callback(handle, elapsed)
+
+        Handle._run = timed_run
+        self._stopped.clear()
+        self._watchdog = threading.Thread(target=self._watch_loop, name="hard-brain-diagnostics", daemon=True)
+        self._watchdog.start()
+        self._lag_task = asyncio.create_task(measure_loop_lag(self.lag_interval, self._on_lag))
+        logger.info(
+            f"Diagnostics enabled, logging callbacks slower than {self.slow_callback_threshold * 1000:.0f} ms"
+        )
+
+    async def close(self) -> None:
+        if self._original_run is None:
+            return
+        Handle._run = self._original_run
+        self._original_run = None
+        self._stopped.set()
+        if self._lag_task:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    def is_profiling(self) -> bool:
+        return self._profiling
+
+    async def profile(self, duration: float) -> Path:
+        """
+        Profiles the event loop thread with cProfile for `duration` seconds, and writes the profile to the profile
+        directory, both in pstats format and as a text summary.
+        :return: Path of the pstats file.
+        """
+        if self._profiling:
+            raise RuntimeError("A profile is already being taken")
+        self._profiling = True
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await asyncio.sleep(duration)
+            finally:
+                profiler.disable()
+            path = self.profile_directory / f"profile-{datetime.now():%Y%m%d-%H%M%S}.prof"
+            await asyncio.to_thread(self._write_profile, profiler, path)
+        finally:
+            self._profiling = False
+        logger.info(f"Wrote {duration:g} second profile to {path}")
+        return path
+
+    def _write_profile(self, profiler: cProfile.Profile, path: Path) -> None:
+        self.profile_directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(50)
+        path.with_suffix(".txt").write_text(summary.getvalue())
+
+    def _on_lag(self, lag: float) -> None:
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.lag_warning_threshold:
+            logger.warning(f"Event loop lag of {lag * 1000:.0f} ms")
+
+    def _watch_loop(self) -> None:
+        """
+        Runs in a separate thread, capturing the event loop thread's stack while a callback is blocking it, since
+        by the time the callback returns the blocking code is no longer on the stack.
+        """
+        watched_handle = None
+        while not self._stopped.wait(self.slow_callback_threshold / 2):
+            handle = self._current_handle
+            if handle is None or handle is watched_handle:
+                continue
+            if time.perf_counter() - self._current_started_at < self.slow_callback_threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None and self._current_handle is handle:
+                watched_handle = handle
+                self._blocked_stack = (handle, "".join(traceback.format_stack(frame)))
+
+    def _report_slow_callback(self, handle: Handle, elapsed: float) -> None:
+        blocked_handle, stack = self._blocked_stack or (None, None)
+        self._blocked_stack = None
+        if blocked_handle is not handle:
+            stack = None
+        callback = handle._callback
+        task = getattr(callback, "__self__", None)
+        if isinstance(task, asyncio.Task):
+            coroutine = task.get_coro()
+            name = f"task '{task.get_name()}' running {getattr(coroutine, '__qualname__', coroutine)}"
+        else:
+            name = f"callback {getattr(callback, '__qualname__', callback)}"
+        if stack is None and isinstance(task, asyncio.Task) and (frames := task.get_stack()):
+            # the watchdog didn't catch it in time, so fall back to where the coroutine is now suspended
+            stack = "".join(traceback.StackSummary.extract((frame, frame.f_lineno) for frame in frames).format())
+        logger.warning(
+            f"Slow callback: {name} blocked the event loop for {elapsed * 1000:.0f} ms"
+            + (f", blocked in:\n{stack}" if stack else "")
+        )
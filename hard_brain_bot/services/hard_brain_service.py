@@ -1,18 +1,47 @@
 import os
-from aiohttp import ClientSession
+from typing import AsyncIterator
 
+from aiohttp import ClientSession, TCPConnector
+
+from hard_brain_bot.services.audio_cache import AudioCache
 from hard_brain_bot.utils import http_requests
+from hard_brain_bot.utils.audio import transcode_to_opus
+from hard_brain_bot.utils.metrics import API_LATENCY, AUDIO_BYTES, AUDIO_CACHE_BYTES, AUDIO_CACHE_LOOKUPS
+
+
+def _expose_cache_metrics(name: str, cache: AudioCache) -> None:
+    for result in ("hits", "disk_hits", "misses"):
+        AUDIO_CACHE_LOOKUPS.labels(name, result).set_function(lambda result=result: cache.stats()[result])
+    for tier in ("memory", "disk"):
+        AUDIO_CACHE_BYTES.labels(name, tier).set_function(lambda tier=tier: cache.stats()[f"{tier}_bytes"])
 
 
 class HardBrainService:
+    CONNECTION_LIMIT: int = 100
+    CONNECTION_LIMIT_PER_HOST: int = 20
+    KEEPALIVE_TIMEOUT: float = 60.0
+    DNS_CACHE_TTL: int = 300
+    MEGABYTE: int = 1024 * 1024
+
     def __init__(
-        self, hostname: str | None = None, port: int = 8000, use_https: bool = False
+        self,
+        hostname: str | None = None,
+        port: int = 8000,
+        use_https: bool = False,
+        audio_cache: AudioCache | None = None,
+        opus_cache: AudioCache | None = None,
+        stream_audio: bool | None = None,
     ):
         """
         A service that provides connections to the Hard Brain API.
         :param hostname: hostname of the location where Hard Brain API is hosted
         :param port: on which Hard Brain API is listening
         :param use_https: whether to use HTTP or HTTPS for requests
+        :param audio_cache: cache for audio clips. If None, one is configured from the environment
+        :param opus_cache: cache for clips transcoded to Ogg/Opus. If given, or if the HARD_BRAIN_OPUS_PASSTHROUGH
+        environment variable is set, clips are transcoded once and played back without re-encoding
+        :param stream_audio: whether audio which isn't already downloaded should be streamed into playback as it
+        downloads. If None, the HARD_BRAIN_STREAM_AUDIO environment variable is used
         """
         if not hostname:
             hostname = os.getenv("HARD_BRAIN_API_HOSTNAME")
@@ -20,6 +49,57 @@ class HardBrainService:
         self.port = port
         self.use_https = use_https
         self.url = self.__set_url()
+        self._session: ClientSession | None = None
+        if not audio_cache:
+            audio_cache = AudioCache(
+                memory_budget=int(os.getenv("HARD_BRAIN_AUDIO_CACHE_MEMORY_MB", 64)) * HardBrainService.MEGABYTE,
+                disk_directory=os.getenv("HARD_BRAIN_AUDIO_CACHE_DIR"),
+                disk_budget=int(os.getenv("HARD_BRAIN_AUDIO_CACHE_DISK_MB", 1024)) * HardBrainService.MEGABYTE,
+            )
+        self.audio_cache = audio_cache
+        if not opus_cache and os.getenv("HARD_BRAIN_OPUS_PASSTHROUGH"):
+            cache_directory = os.getenv("HARD_BRAIN_AUDIO_CACHE_DIR")
+            opus_cache = AudioCache(
+                memory_budget=int(os.getenv("HARD_BRAIN_AUDIO_CACHE_MEMORY_MB", 64)) * HardBrainService.MEGABYTE,
+                disk_directory=os.path.join(cache_directory, "opus") if cache_directory else None,
+                disk_budget=int(os.getenv("HARD_BRAIN_AUDIO_CACHE_DISK_MB", 1024)) * HardBrainService.MEGABYTE,
+            )
+        self.opus_cache = opus_cache
+        for name, cache in (("audio", self.audio_cache), ("opus", self.opus_cache)):
+            if cache:
+                _expose_cache_metrics(name, cache)
+        if stream_audio is None:
+            stream_audio = bool(os.getenv("HARD_BRAIN_STREAM_AUDIO"))
+        self.stream_audio_enabled = stream_audio
+
+    @property
+    def session(self) -> ClientSession:
+        """
+        The shared HTTP session used for all requests. Created on first use if `start` has not been called.
+        """
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(
+                limit=HardBrainService.CONNECTION_LIMIT,
+                limit_per_host=HardBrainService.CONNECTION_LIMIT_PER_HOST,
+                keepalive_timeout=HardBrainService.KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=HardBrainService.DNS_CACHE_TTL,
+            )
+            self._session = ClientSession(connector=connector)
+        return self._session
+
+    async def start(self) -> None:
+        """
+        Opens the shared HTTP session. Must be called from within the running event loop.
+        """
+        _ = self.session
+
+    async def close(self) -> None:
+        """
+        Closes the shared HTTP session and its pooled connections.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
     async def get_question(
         self, number_of_songs: int = 5, versions: str = ""
@@ -30,22 +110,56 @@ class HardBrainService:
         if number_of_songs <= 0:
             raise ValueError("Number of songs requested must be greater than 0")
         params["number_of_songs"] = number_of_songs
-        async with ClientSession() as session:
+        with API_LATENCY.labels("question").time():
             if len(params) > 0:
                 return await http_requests.request_json(
-                    "GET", f"{self.url}/question", session, params=params
+                    "GET", f"{self.url}/question", self.session, params=params
                 )
             return await http_requests.request_json(
-                "GET", f"{self.url}/question", session
+                "GET", f"{self.url}/question", self.session
             )
 
     async def get_audio(self, song_id: str) -> bytes:
-        async with ClientSession() as session:
-            return await http_requests.request_bytes(
+        return await self.audio_cache.get_or_fetch(song_id, self._fetch_audio)
+
+    async def stream_audio(self, song_id: str) -> AsyncIterator[bytes]:
+        """
+        Streams the audio for a song in chunks as it downloads. Bypasses the audio cache.
+        """
+        total_bytes = 0
+        with API_LATENCY.labels("audio_stream").time():
+            async for chunk in http_requests.request_stream(
+                "GET",
+                f"{self.url}/audio/{song_id}",
+                self.session,
+            ):
+                total_bytes += len(chunk)
+                yield chunk
+        AUDIO_BYTES.labels("stream").observe(total_bytes)
+
+    async def get_opus_audio(self, song_id: str) -> bytes:
+        """
+        Gets the audio for a song transcoded to Ogg/Opus, transcoding and caching it on first use.
+        """
+        if not self.opus_cache:
+            raise RuntimeError("Opus passthrough is not enabled")
+        return await self.opus_cache.get_or_fetch(song_id, self._transcode_audio)
+
+    def is_opus_passthrough(self) -> bool:
+        return self.opus_cache is not None
+
+    async def _transcode_audio(self, song_id: str) -> bytes:
+        return await transcode_to_opus(await self.get_audio(song_id))
+
+    async def _fetch_audio(self, song_id: str) -> bytes:
+        with API_LATENCY.labels("audio").time():
+            audio = await http_requests.request_bytes(
                 "GET",
                 f"{self.url}/audio/{song_id}",
-                session,
+                self.session,
             )
+        AUDIO_BYTES.labels("download").observe(len(audio))
+        return audio
 
     def __set_url(self) -> str:
         protocol = "https" if self.use_https else "http"
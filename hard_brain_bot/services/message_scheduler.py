@@ -0,0 +1,220 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from disnake import Embed, Thread, Webhook
+from loguru import logger
+
+from hard_brain_bot.utils.metrics import MESSAGE_SEND_LATENCY, MESSAGES_COALESCED
+
+
+class MessagePriority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+@dataclass(order=True)
+class _OutboundMessage:
+    priority: int
+    sequence: int
+    content: str | None = field(compare=False)
+    embeds: list[Embed] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class _Bucket:
+    def __init__(self, destination: Webhook | Thread, rate: int, per: float):
+        """
+        Mirrors Discord's rate limit bucket for a destination: `rate` messages are allowed per `per` seconds, from
+        the first message sent in the window.
+        """
+        self.destination = destination
+        self.rate = rate
+        self.per = per
+        self.remaining = rate
+        self.reset_at = 0.0
+        self.queue: list[_OutboundMessage] = []
+        self.task: asyncio.Task | None = None
+        self.wakeup = asyncio.Event()
+
+    def wait_time(self) -> float:
+        """
+        Seconds until a message can be sent.
+        """
+        if self.remaining > 0:
+            return 0.0
+        return self.refill_time()
+
+    def refill_time(self) -> float:
+        """
+        Seconds until the window resets.
+        """
+        if (reset_after := self.reset_at - time.monotonic()) <= 0:
+            self.remaining = self.rate
+            return 0.0
+        return reset_after
+
+    def take(self) -> bool:
+        """
+        Uses up one message from the window.
+        :return: Whether this message opens a new window.
+        """
+        self.refill_time()
+        opens_window = self.remaining == self.rate
+        self.remaining -= 1
+        if opens_window:
+            # until the message has been sent, don't let the window reset
+            self.reset_at = math.inf
+        return opens_window
+
+    def start_window(self) -> None:
+        """
+        Starts the window once its first message has been sent. Discord starts it when it receives the message,
+        which is before this, so the window never resets before Discord's does.
+        """
+        self.reset_at = time.monotonic() + self.per
+
+
+class MessageScheduler:
+    MAX_EMBEDS: int = 10
+    MAX_EMBED_LENGTH: int = 6000
+    WEBHOOK_RATE_LIMIT: tuple[int, float] = (5, 2.0)
+    CHANNEL_RATE_LIMIT: tuple[int, float] = (5, 5.0)
+
+    def __init__(self):
+        """
+        Sends quiz messages while staying inside Discord's rate limits. Each webhook or channel has its own bucket
+        of messages, which are sent in priority order as the rate limit allows. While a bucket is waiting, queued
+        messages with only embeds are merged into the message being sent, up to Discord's embed limits.
+        """
+        self._buckets: dict[tuple[type, int], _Bucket] = {}
+        self._sequence = itertools.count()
+
+    def schedule(
+        self,
+        destination: Webhook | Thread,
+        content: str | None = None,
+        embed: Embed | None = None,
+        priority: MessagePriority = MessagePriority.NORMAL,
+    ) -> asyncio.Future:
+        """
+        Queues a message to be sent. Not asynchronous.
+        :return: A future which completes once the message has been sent. Failures are also logged, so it doesn't
+        need to be awaited.
+        """
+        bucket = self._get_bucket(destination)
+        future = asyncio.get_running_loop().create_future()
+        embeds = [embed] if embed else []
+        heapq.heappush(bucket.queue, _OutboundMessage(priority, next(self._sequence), content, embeds, future))
+        bucket.wakeup.set()
+        if bucket.task is None or bucket.task.done():
+            bucket.task = asyncio.create_task(self._drain(bucket))
+        return future
+
+    async def send(
+        self,
+        destination: Webhook | Thread,
+        content: str | None = None,
+        embed: Embed | None = None,
+        priority: MessagePriority = MessagePriority.NORMAL,
+    ) -> None:
+        """
+        Queues a message to be sent and waits until it has been sent.
+        """
+        await self.schedule(destination, content=content, embed=embed, priority=priority)
+
+    def _get_bucket(self, destination: Webhook | Thread) -> _Bucket:
+        key = (type(destination), destination.id)
+        if key not in self._buckets:
+            rate, per = self.WEBHOOK_RATE_LIMIT if isinstance(destination, Webhook) else self.CHANNEL_RATE_LIMIT
+            self._buckets[key] = _Bucket(destination, rate, per)
+        return self._buckets[key]
+
+    async def _drain(self, bucket: _Bucket) -> None:
+        try:
+            while True:
+                if not bucket.queue:
+                    # keep the bucket until it has refilled, so that messages sent one at a time still share its limit
+                    if (refill_time := bucket.refill_time()) <= 0:
+                        break
+                    bucket.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(bucket.wakeup.wait(), refill_time)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if (wait_time := bucket.wait_time()) > 0:
+                    await asyncio.sleep(wait_time)
+                    continue
+                messages = self._take_batch(bucket)
+                opens_window = bucket.take()
+                try:
+                    await self._send_batch(bucket, messages)
+                finally:
+                    if opens_window:
+                        bucket.start_window()
+        except asyncio.CancelledError:
+            for message in bucket.queue:
+                message.future.cancel()
+            bucket.queue.clear()
+            raise
+        finally:
+            if self._buckets.get((type(bucket.destination), bucket.destination.id)) is bucket:
+                del self._buckets[(type(bucket.destination), bucket.destination.id)]
+
+    async def _send_batch(self, bucket: _Bucket, messages: list[_OutboundMessage]) -> None:
+        content = next((message.content for message in messages if message.content), None)
+        embeds = [embed for message in messages for embed in message.embeds]
+        MESSAGES_COALESCED.inc(len(messages) - 1)
+        try:
+            with MESSAGE_SEND_LATENCY.labels(type(bucket.destination).__name__.lower()).time():
+                if embeds:
+                    await bucket.destination.send(content=content, embeds=embeds)
+                else:
+                    await bucket.destination.send(content)
+        except asyncio.CancelledError:
+            for message in messages:
+                message.future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Failed to send message to {type(bucket.destination).__name__} "
+                         f"{bucket.destination.id}: {e!r}")
+            for message in messages:
+                if not message.future.done():
+                    message.future.set_exception(e)
+                    # mark the exception as retrieved, as scheduled messages may not be awaited
+                    message.future.exception()
+            return
+        for message in messages:
+            if not message.future.done():
+                message.future.set_result(None)
+
+    def _take_batch(self, bucket: _Bucket) -> list[_OutboundMessage]:
+        """
+        Takes the most urgent message, along with any other queued messages which can be merged into the same
+        Discord message. Messages are merged in the order they were queued.
+        """
+        first = heapq.heappop(bucket.queue)
+        batch = [first]
+        embed_count = len(first.embeds)
+        embed_length = sum(len(embed) for embed in first.embeds)
+        for message in sorted(bucket.queue, key=lambda m: m.sequence):
+            length = sum(len(embed) for embed in message.embeds)
+            # content is shown above embeds, so only merge embed-only messages, and only ones queued after any content
+            if message.content or (first.content and message.sequence < first.sequence):
+                continue
+            if embed_count + len(message.embeds) > self.MAX_EMBEDS or embed_length + length > self.MAX_EMBED_LENGTH:
+                continue
+            batch.append(message)
+            embed_count += len(message.embeds)
+            embed_length += length
+        merged = {id(message) for message in batch}
+        bucket.queue = [message for message in bucket.queue if id(message) not in merged]
+        heapq.heapify(bucket.queue)
+        batch.sort(key=lambda m: m.sequence)
+        return batch
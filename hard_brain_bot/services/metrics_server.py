@@ -0,0 +1,55 @@
+import asyncio
+
+from aiohttp import web
+from loguru import logger
+
+from hard_brain_bot.utils import metrics
+from hard_brain_bot.utils.async_helpers import measure_loop_lag
+from hard_brain_bot.utils.metrics import MetricsRegistry
+
+
+class MetricsServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 9100,
+        registry: MetricsRegistry | None = None,
+        lag_interval: float = 0.5,
+    ):
+        """
+        A local HTTP server which serves the bot's metrics at /metrics in the Prometheus text exposition format, and
+        measures event loop lag while it is running.
+        :param host: Address to listen on.
+        :param port: Port to listen on.
+        :param registry: Registry of metrics to serve. If None, the bot's default registry is used.
+        :param lag_interval: Seconds between event loop lag measurements.
+        """
+        self.host = host
+        self.port = port
+        self.registry = registry or metrics.REGISTRY
+        self.lag_interval = lag_interval
+        self._runner: web.AppRunner | None = None
+        self._lag_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._lag_task = asyncio.create_task(measure_loop_lag(self.lag_interval, metrics.EVENT_LOOP_LAG.observe))
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        if self._lag_task:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.registry.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
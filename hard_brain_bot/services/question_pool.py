@@ -0,0 +1,153 @@
+import asyncio
+from collections import OrderedDict, deque
+
+from loguru import logger
+
+from hard_brain_bot.services.hard_brain_service import HardBrainService
+from hard_brain_bot.services.song_catalog import SongCatalog
+
+
+class QuestionPool:
+    def __init__(
+        self,
+        backend: HardBrainService,
+        batch_size: int = 100,
+        capacity: int = 300,
+        max_filters: int = 16,
+        no_repeat_window: int = 100,
+        catalog: SongCatalog | None = None,
+    ):
+        """
+        A local pool of random questions for each version filter, refilled from the Hard Brain API in the background
+        so that quizzes can be started without waiting for the API.
+        :param backend: Application HardBrainService instance.
+        :param batch_size: Number of questions to request from the API per refill.
+        :param capacity: Maximum number of questions to keep for each version filter.
+        :param max_filters: Maximum number of version filters to keep pools for. The least recently used pool is
+        dropped when this is exceeded.
+        :param no_repeat_window: Number of most recently played songs per guild which won't be served to it again.
+        :param catalog: Local song catalog. If given and loaded, questions are sampled from it instead of the pool.
+        """
+        self.backend = backend
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self.max_filters = max_filters
+        self.no_repeat_window = no_repeat_window
+        self._pools: OrderedDict[tuple[int, ...], list[dict]] = OrderedDict()
+        self._refill_tasks: dict[tuple[int, ...], asyncio.Task] = {}
+        self._recent_songs: dict[int, deque[str]] = {}
+        self.catalog = catalog
+
+    async def get_questions(self, guild_id: int, rounds: int, versions: list[int]) -> list[dict]:
+        """
+        Gets questions for a quiz, from the pool if it has enough songs which the guild hasn't played recently, or
+        from the API otherwise. Songs are never repeated within a quiz.
+        :param guild_id: Guild the quiz is for.
+        :param rounds: Number of questions to get.
+        :param versions: Game versions to pick songs from. An empty list means all versions.
+        :return: A list of question props.
+        """
+        if self.catalog and self.catalog.is_ready():
+            if questions := self._sample_from_catalog(guild_id, rounds, versions):
+                self._remember(guild_id, questions)
+                return questions
+
+        key = tuple(versions)
+        questions = self._take(key, guild_id, rounds)
+        if questions is None:
+            logger.debug(f"Question pool for versions {list(key)} can't serve {rounds} rounds, requesting from API")
+            questions = _unique_questions(await self.backend.get_question(number_of_songs=rounds, versions=versions))
+        self._remember(guild_id, questions)
+        self.refill(versions)
+        return questions
+
+    def refill(self, versions: list[int]) -> None:
+        """
+        Starts refilling the pool for a version filter in the background, unless it is already full or being
+        refilled. Not asynchronous.
+        """
+        key = tuple(versions)
+        pool = self._get_pool(key)
+        task = self._refill_tasks.get(key)
+        if len(pool) >= self.capacity or (task and not task.done()):
+            return
+        self._refill_tasks[key] = asyncio.create_task(self._refill(key))
+
+    def _get_pool(self, key: tuple[int, ...]) -> list[dict]:
+        if key not in self._pools:
+            self._pools[key] = []
+        self._pools.move_to_end(key)
+        while len(self._pools) > self.max_filters:
+            evicted_key, _ = self._pools.popitem(last=False)
+            if (task := self._refill_tasks.pop(evicted_key, None)) and not task.done():
+                task.cancel()
+        return self._pools[key]
+
+    def _take(self, key: tuple[int, ...], guild_id: int, rounds: int) -> list[dict] | None:
+        pool = self._get_pool(key)
+        recent = set(self._recent_songs.get(guild_id, ()))
+        taken_indexes = []
+        taken_song_ids = set()
+        for index, question in enumerate(pool):
+            song_id = question["song_id"]
+            if song_id in recent or song_id in taken_song_ids:
+                continue
+            taken_indexes.append(index)
+            taken_song_ids.add(song_id)
+            if len(taken_indexes) == rounds:
+                break
+        if len(taken_indexes) < rounds:
+            return None
+        questions = [pool[index] for index in taken_indexes]
+        for index in reversed(taken_indexes):
+            del pool[index]
+        return questions
+
+    def _sample_from_catalog(self, guild_id: int, rounds: int, versions: list[int]) -> list[dict] | None:
+        """
+        :return: The sampled questions, or None if the catalog doesn't have enough songs for the versions, e.g.
+        because it hasn't been fully synced.
+        """
+        recent = set(self._recent_songs.get(guild_id, ()))
+        candidates = self.catalog.sample(rounds + len(recent), versions)
+        if len(candidates) < rounds:
+            logger.debug(f"Song catalog has {len(candidates)} songs for versions {versions}, not {rounds}")
+            return None
+        # prefer songs the guild hasn't played recently, but allow them if there aren't enough other songs
+        candidates.sort(key=lambda question: question["song_id"] in recent)
+        return candidates[:rounds]
+
+    def _remember(self, guild_id: int, questions: list[dict]) -> None:
+        if guild_id not in self._recent_songs:
+            self._recent_songs[guild_id] = deque(maxlen=self.no_repeat_window)
+        self._recent_songs[guild_id].extend(question["song_id"] for question in questions)
+
+    async def _refill(self, key: tuple[int, ...]) -> None:
+        try:
+            response = await self.backend.get_question(number_of_songs=self.batch_size, versions=list(key))
+        except Exception as e:
+            logger.warning(f"Refilling question pool for versions {list(key)} failed: {e}")
+            return
+        pool = self._pools.get(key)
+        if pool is None:
+            return
+        pooled_song_ids = {question["song_id"] for question in pool}
+        for question in _unique_questions(response):
+            if len(pool) >= self.capacity:
+                break
+            if question["song_id"] not in pooled_song_ids:
+                pool.append(question)
+                pooled_song_ids.add(question["song_id"])
+        logger.debug(f"Refilled question pool for versions {list(key)} to {len(pool)} questions")
+
+
+def _unique_questions(response: dict | list[dict]) -> list[dict]:
+    if not isinstance(response, list):
+        raise ValueError(f"Unexpected question response from API: {response}")
+    song_ids = set()
+    questions = []
+    for question in response:
+        if question["song_id"] not in song_ids:
+            song_ids.add(question["song_id"])
+            questions.append(question)
+    return questions
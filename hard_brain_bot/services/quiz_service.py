@@ -1,6 +1,8 @@
 import asyncio
 import io
 import platform
+import time
+from concurrent.futures import Executor
 
 import disnake
 from disnake import FFmpegOpusAudio, ApplicationCommandInteraction, Webhook, Thread
@@ -9,21 +11,25 @@ from loguru import logger
 from hard_brain_bot.data_models.requests import SongData
 from hard_brain_bot.message_templates import embeds
 from hard_brain_bot.services.hard_brain_service import HardBrainService
+from hard_brain_bot.services.message_scheduler import MessagePriority, MessageScheduler
+from hard_brain_bot.services.score_store import ScoreStore
 from hard_brain_bot.services.scoring_service import ScoringService
+from hard_brain_bot.utils.audio import AudioPipe, EncoderPool, OggOpusAudio, TimedAudioSource, transcode_to_opus_sync
 from hard_brain_bot.utils.helpers import VersionHelper
+from hard_brain_bot.utils.metrics import TIME_TO_FIRST_AUDIO
 from hard_brain_bot.utils.async_helpers import AsyncTimer, AnswerQueue
 
 
+def load_opus():
+    try:
+        if platform.system() != "Windows" and not disnake.opus.is_loaded():
+            disnake.opus.load_opus("libopusenc.so.0")
+    except OSError:
+        logger.info("Could not load the opus shared library")
+
+
 def _process_song_data_from_props(song_data_list):
-    song_data_map = map(lambda props: SongData(
-        song_id=props["song_id"],
-        filename=props["filename"],
-        title=props["title"],
-        alt_titles=props["alt_titles"].split(", "),
-        genre=props["genre"],
-        artist=props["artist"],
-        game_version=props["game_version"]), song_data_list)
-    return list(song_data_map)
+    return list(map(SongData.from_props, song_data_list))
 
 
 class QuizService:
@@ -34,6 +40,13 @@ class QuizService:
             backend: HardBrainService,
             song_data_list: list[dict],
             round_time_limit: float = 30.0,
+            prefetch_depth: int = 1,
+            scoring_executor: Executor | None = None,
+            voice_client: disnake.VoiceClient | None = None,
+            encoder_pool: EncoderPool | None = None,
+            message_scheduler: MessageScheduler | None = None,
+            audio_executor: Executor | None = None,
+            score_store: ScoreStore | None = None,
     ):
         """
         The service that manages and drives the quiz game.
@@ -42,79 +55,250 @@ class QuizService:
         :param backend: Application HardBrainService instance.
         :param song_data_list: A list of SongData to use in the game.
         :param round_time_limit: Maximum round time in seconds.
+        :param prefetch_depth: Number of upcoming rounds to download audio for in the background.
+        :param scoring_executor: Executor to score answers in. If None, answers are scored on the event loop.
+        :param voice_client: Voice client already connected to the player's voice channel. If None, the voice
+        channel is connected to when the game starts.
+        :param encoder_pool: Pool of idle encoders to play audio through. If None, an encoder is spawned per round.
+        :param message_scheduler: Scheduler to send messages through, shared between games so that rate limits are
+        respected. If None, the game uses its own.
+        :param audio_executor: Executor to transcode each clip to Ogg/Opus in, so that it can be played without an
+        encoder. If None, clips are encoded as they play, unless Opus passthrough is enabled.
+        :param score_store: Store to record the game's scores in for leaderboards. If None, scores aren't kept after
+        the game.
         """
         self.round_time_limit = round_time_limit
-        try:
-            if platform.system() != "Windows" and not disnake.opus.is_loaded():
-                disnake.opus.load_opus("libopusenc.so.0")
-        except OSError:
-            logger.info("Could not load the opus shared library")
+        self.prefetch_depth = max(0, prefetch_depth)
+        load_opus()
         self.backend = backend
         self.song_data_list = _process_song_data_from_props(song_data_list)
-        self.score_service = ScoringService()
+        self.score_service = ScoringService(score_store, guild_id=ctx.guild.id if ctx.guild else None)
         self.webhook = message_receiver
-        self.voice_channel = ctx.author.voice.channel
+        self.messages = message_scheduler or MessageScheduler()
+        # the player may have left voice since the voice client connected
+        self.voice_channel = voice_client.channel if voice_client else ctx.author.voice.channel
         self.text_channel = ctx.channel
         self._game_in_progress = False
         self._current_song: SongData | None = None
         self._round_is_over = False
         self._round_timer: AsyncTimer | None = None
-        self._voice: disnake.VoiceClient | None = None
-        self._stream: FFmpegOpusAudio | None = None
-        self._answer_queue = AnswerQueue()
+        self._voice: disnake.VoiceClient | None = voice_client
+        self.encoder_pool = encoder_pool
+        self.audio_executor = audio_executor
+        self._round_started_at = 0.0
+        self._stream: disnake.AudioSource | None = None
+        self._audio_pipe: AudioPipe | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._playback_finished = asyncio.Event()
+        self._playback_finished.set()
+        self._answer_queue = AnswerQueue(self._on_correct_answer, scoring_executor)
         self._current_round = 1
+        self._prefetch_tasks: dict[int, asyncio.Task] = {}
 
     async def _process_rounds(self):
-        _round_tasks = [self._next_round(song) for song in self.song_data_list]
-        for task in _round_tasks:
-            await asyncio.create_task(task)
+        for index, song in enumerate(self.song_data_list):
+            if not self._game_in_progress:
+                break
+            await asyncio.create_task(self._next_round(index, song))
             self._current_round += 1
 
     async def start_game(self, styles: str = ""):
+        await self.announce(styles)
+        await self.play()
+
+    async def announce(self, styles: str = "") -> None:
+        """
+        Sends the message announcing the game, which is the first message sent through the webhook.
+        :raises disnake.NotFound: If the webhook has been deleted.
+        """
         logger.info(
             f"Starting new game with {len(self.song_data_list)} questions in {self.voice_channel}"
         )
         start_message = f"Quiz starting in #{self.voice_channel} with {len(self.song_data_list)} rounds!"
         if styles != "":
             start_message += f"\nStyles: {'all' if len(styles) == 0 else VersionHelper.format_styles(styles)}"
-        await self.webhook.send(start_message)
-        self._voice = await self.voice_channel.connect()
+        await self.messages.send(self.webhook, start_message)
+
+    async def play(self) -> None:
+        """
+        Plays every round of an announced game, then ends it.
+        """
+        self._loop = asyncio.get_running_loop()
+        if self._voice is None:
+            self._voice = await self.voice_channel.connect()
         self._game_in_progress = True
         await self._process_rounds()
         await self.end_game()
 
-    async def _next_round(self, song: SongData):
-        while self._voice.is_playing():
-            await asyncio.sleep(0.05)
+    async def _next_round(self, index: int, song: SongData):
+        self._prefetch_audio(index)
+        await self._playback_finished.wait()
+        self._round_started_at = time.perf_counter()
         song_id = song.song_id
         try:
-            audio_response = await self.backend.get_audio(song_id)
+            audio_response = await self._get_audio(index, song_id)
         except Exception as e:
             logger.error(f"Fetching audio for song id {song_id} failed: {e}")
-            await self.webhook.send("An error occurred while loading the next song, skipping round")
+            self.messages.schedule(self.webhook, "An error occurred while loading the next song, skipping round")
             await self._end_round()
             return
 
+        if audio_response is None:
+            logger.debug(f"Audio fetch for song id {song_id} was cancelled, skipping this round")
+            return
+
         if not self._game_in_progress:
             logger.debug("Game has ended, skipping this round")
             return
 
-        song_bytes = io.BytesIO(audio_response)
         self._current_song = song
         self._round_is_over = False
-        self._stream = FFmpegOpusAudio(song_bytes, pipe=True)
-        self._voice.play(self._stream)
+        self._stream = self._create_audio_source(audio_response)
+        self._playback_finished.clear()
+        try:
+            self._voice.play(self._stream, after=self._on_playback_finished)
+        except disnake.ClientException as e:
+            logger.error(f"Could not play audio for song id {song_id}: {e}")
+            self._playback_finished.set()
         self._round_timer = AsyncTimer(self.round_time_limit, self._end_round)
         self._round_timer.start()
 
-        await self.webhook.send(
+        self.messages.schedule(
+            self.webhook,
             embed=embeds.embed_round_start(
                 current_round=self._current_round,
                 total_rounds=len(self.song_data_list),
                 time_limit=self.round_time_limit
-            ))
+            ),
+            priority=MessagePriority.HIGH,
+        )
         await self._round_timer.timeout()
 
+    def _on_playback_finished(self, error: Exception | None):
+        """
+        Called from the voice client's player thread once playback has stopped, either because the clip ended or
+        because the round was ended early.
+        """
+        if error:
+            logger.error(f"Audio playback failed: {error}")
+        self._loop.call_soon_threadsafe(self._playback_finished.set)
+        audio_pipe, song = self._audio_pipe, self._current_song
+        if audio_pipe is not None and audio_pipe.error is not None:
+            asyncio.run_coroutine_threadsafe(self._on_stream_failed(song), self._loop)
+
+    async def _on_stream_failed(self, song: SongData):
+        """
+        Ends a round whose audio stream failed part way through, rather than leaving it silent until it times out.
+        """
+        if song is not self._current_song or self._round_is_over:
+            return
+        logger.error(f"Audio stream for song id {song.song_id} failed part way through, skipping round")
+        self.messages.schedule(self.webhook, "An error occurred while streaming the song, skipping round")
+        self._round_is_over = True
+        self._round_timer.cancel()
+        await self._end_round()
+
+    def _prefetch_audio(self, index: int):
+        """
+        Schedules background downloads for the audio of the given round and the next `prefetch_depth` rounds.
+        Rounds which already have a download scheduled are left alone.
+        """
+        last_index = min(index + self.prefetch_depth, len(self.song_data_list) - 1)
+        for i in range(index, last_index + 1):
+            if i in self._prefetch_tasks:
+                continue
+            song_id = self.song_data_list[i].song_id
+            self._prefetch_tasks[i] = asyncio.create_task(self._download_audio(song_id))
+
+    async def _get_audio(self, index: int, song_id: str) -> bytes | AudioPipe | None:
+        """
+        Gets the audio for a round, using the prefetched download if one exists and falling back to fetching it
+        on demand if the prefetch failed. If audio streaming is enabled and the audio hasn't finished downloading,
+        it is streamed instead.
+        :return: The audio bytes or stream, or None if the download was cancelled.
+        """
+        task = self._prefetch_tasks.get(index)
+        if self._should_stream_audio(song_id, task):
+            self._cancel_prefetch(index)
+            audio_pipe = AudioPipe(self.backend.stream_audio(song_id))
+            try:
+                await audio_pipe.wait_until_started()
+                return audio_pipe
+            except asyncio.CancelledError:
+                audio_pipe.close()
+                raise
+            except Exception as e:
+                audio_pipe.close()
+                logger.warning(f"Streaming audio for song id {song_id} failed, downloading it instead: {e!r}")
+                return await self._download_audio(song_id)
+        if task is not None:
+            await asyncio.wait({task})
+            self._prefetch_tasks.pop(index, None)
+            if task.cancelled():
+                return None
+            if task.exception() is None:
+                return task.result()
+            logger.warning(f"Prefetching audio for song id {song_id} failed, retrying: {task.exception()}")
+        return await self._download_audio(song_id)
+
+    async def _download_audio(self, song_id: str) -> bytes:
+        if self.backend.is_opus_passthrough():
+            return await self.backend.get_opus_audio(song_id)
+        audio = await self.backend.get_audio(song_id)
+        if self.audio_executor:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.audio_executor, transcode_to_opus_sync, audio)
+        return audio
+
+    def _is_audio_opus(self) -> bool:
+        return self.backend.is_opus_passthrough() or self.audio_executor is not None
+
+    def _should_stream_audio(self, song_id: str, prefetch_task: asyncio.Task | None) -> bool:
+        if not self.backend.stream_audio_enabled or self._is_audio_opus():
+            return False
+        if prefetch_task is not None and prefetch_task.done() and not prefetch_task.cancelled() \
+                and prefetch_task.exception() is None:
+            return False
+        return song_id not in self.backend.audio_cache
+
+    def _create_audio_source(self, audio: bytes | AudioPipe) -> disnake.AudioSource:
+        if isinstance(audio, AudioPipe):
+            self._audio_pipe = audio
+            source = self._create_encoder(audio)
+        elif self._is_audio_opus():
+            source = OggOpusAudio(audio)
+        else:
+            source = self._create_encoder(io.BytesIO(audio))
+        current_round = self._current_round
+        return TimedAudioSource(
+            source,
+            started_at=self._round_started_at,
+            on_first_audio=lambda elapsed: self._on_first_audio(current_round, elapsed),
+        )
+
+    def _on_first_audio(self, current_round: int, elapsed: float):
+        """
+        Called from the voice client's player thread once a round's first audio frame has been read.
+        """
+        TIME_TO_FIRST_AUDIO.observe(elapsed)
+        logger.info(f"Round {current_round} time to first audio: {elapsed * 1000:.0f} ms")
+
+    def _create_encoder(self, source: io.IOBase) -> FFmpegOpusAudio:
+        if self.encoder_pool:
+            return self.encoder_pool.claim(source)
+        return FFmpegOpusAudio(source, pipe=True)
+
+    def _cancel_prefetch(self, index: int | None = None):
+        """
+        Cancels outstanding audio downloads.
+        :param index: Round index of the download to cancel. If None, all downloads are cancelled.
+        """
+        indexes = list(self._prefetch_tasks.keys()) if index is None else [index]
+        for i in indexes:
+            task = self._prefetch_tasks.pop(i, None)
+            if task and not task.done():
+                task.cancel()
+
     async def _end_round(self, ctx: disnake.Message | None = None):
         logger.debug("Ending round")
         self._round_is_over = True
@@ -124,19 +308,16 @@ class QuizService:
         await self._cleanup_voice()
 
     async def queue_answer_to_check(self, ctx: disnake.Message):
-        if ctx.channel.id != self.text_channel.id:
+        if ctx.channel.id != self.text_channel.id or self._round_is_over:
             return
-        await self._check_answer(ctx)
+        self._answer_queue.queue_answer(self._current_song, ctx.content, ctx.created_at, ctx)
 
-    async def _check_answer(self, ctx):
-        current_song = self._current_song
-        await self._answer_queue.queue_answer(current_song, ctx.content)
-        answer_is_correct = await self._answer_queue.check_answer_fifo()
-
-        if not self._round_is_over and answer_is_correct:
-            self._round_is_over = True
-            self._round_timer.cancel()
-            await self._end_round(ctx)
+    async def _on_correct_answer(self, song: SongData, ctx: disnake.Message):
+        if song is not self._current_song or self._round_is_over:
+            return
+        self._round_is_over = True
+        self._round_timer.cancel()
+        await self._end_round(ctx)
 
     async def end_game(self, show_embed=True):
         logger.info(
@@ -148,23 +329,31 @@ class QuizService:
             except RuntimeWarning as e:
                 logger.debug(f"RuntimeWarning: {e}")
 
-        if show_embed:  # this is so stupid btw
-            await self.webhook.send(
-                embed=embeds.embed_scores(
-                    self.score_service.get_scores(),
-                    title="Game ending. Thank you for playing!",
+        try:
+            if show_embed:  # this is so stupid btw
+                await self.messages.send(
+                    self.webhook,
+                    embed=embeds.embed_scores(
+                        self.score_service.get_scores(),
+                        title="Game ending. Thank you for playing!",
+                    )
                 )
-            )
+        finally:
+            # clean up game stuff
+            self._game_in_progress = False
+            self._cancel_prefetch()
+            self._answer_queue.close()
 
-        # clean up game stuff
-        self._game_in_progress = False
-
-        # clean up voice
-        await self._voice.disconnect()
-        await self._cleanup_voice()
+            # clean up voice
+            await self._voice.disconnect()
+            await self._cleanup_voice()
 
     async def skip_round(self):
-        self._round_timer.cancel()
+        if self._current_song is None:
+            # round is still loading, so stop downloading its audio
+            self._cancel_prefetch(self._current_round - 1)
+        if self._round_timer:
+            self._round_timer.cancel()
         await self._end_round()
 
     def current_scores(self):
@@ -176,15 +365,20 @@ class QuizService:
     async def _cleanup_voice(self):
         if self._voice and self._voice.is_playing():
             self._voice.stop()
-        if isinstance(self._stream, FFmpegOpusAudio):
+        if self._stream:
             self._stream.cleanup()
+        if self._audio_pipe:
+            self._audio_pipe.close()
+            self._audio_pipe = None
 
     async def _send_end_of_round_embed(self, ctx: disnake.Message):
         winner: disnake.Member | disnake.User | None = None
         points = 10
         if ctx:
             winner = ctx.author
-            self.score_service.add_points(winner.display_name, points)
+            self.score_service.add_points(
+                winner.display_name, points, user_id=winner.id, song_id=self._current_song.song_id
+            )
         winner_name = winner.display_name if winner else "No one"
         embed = embeds.embed_song_data(
             title=f"{winner_name} got the correct answer{'' if winner else '...'}",
@@ -193,4 +387,5 @@ class QuizService:
         )
         if winner:
             embed.description = f"{points} points go to {winner.display_name}"
-        await self.webhook.send(embed=embed)
+        # not awaited, so that this can be merged with the next round's start message if sending is rate limited
+        self.messages.schedule(self.webhook, embed=embed)
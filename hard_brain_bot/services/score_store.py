@@ -0,0 +1,179 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from loguru import logger
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+from hard_brain_bot.data_models.tables import Base, ScoreEvent
+
+
+@dataclass(frozen=True, slots=True)
+class LeaderboardEntry:
+    user_id: int
+    user_name: str
+    points: int
+    rounds_won: int
+
+
+@dataclass(frozen=True, slots=True)
+class PlayerHistory:
+    total_points: int
+    rounds_won: int
+    # most recent score events first, as (scored_at, guild_id, song_id, points)
+    recent: list[tuple[datetime, int, str | None, int]]
+
+
+class ScoreStore:
+    def __init__(
+        self,
+        database_path: str = "hard_brain_scores.db",
+        flush_interval: float = 5.0,
+        flush_size: int = 100,
+        cache_ttl: float = 60.0,
+    ):
+        """
+        Persistent score history, stored in SQLite. Scores are buffered in memory and written in batches in the
+        background, so recording a score never waits for the database. Leaderboard queries are cached until the
+        next write or until they expire.
+        :param database_path: Path of the SQLite database file.
+        :param flush_interval: Seconds between writes of buffered scores.
+        :param flush_size: Buffered scores are written early once this many are waiting.
+        :param cache_ttl: Seconds to cache query results for.
+        """
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.cache_ttl = cache_ttl
+        self._engine = create_engine(
+            f"sqlite:///{database_path}", connect_args={"check_same_thread": False}
+        )
+        self._buffer: list[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+        self._size_flush_task: asyncio.Task | None = None
+        self._cache: dict[tuple, tuple[float, object]] = {}
+
+    async def start(self) -> None:
+        """
+        Creates the score tables if needed and starts writing buffered scores in the background.
+        """
+        await asyncio.to_thread(Base.metadata.create_all, self._engine)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        """
+        Stops the background writes and writes any scores still buffered.
+        """
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def record(self, user_id: int, guild_id: int, user_name: str, points: int, song_id: str | None = None) -> None:
+        """
+        Buffers a score to be written in the background. Not asynchronous.
+        """
+        self._buffer.append({
+            "user_id": user_id,
+            "guild_id": guild_id,
+            "user_name": user_name,
+            "points": points,
+            "song_id": song_id,
+            "scored_at": datetime.now(timezone.utc).replace(tzinfo=None),
+        })
+        if len(self._buffer) >= self.flush_size and (self._size_flush_task is None or self._size_flush_task.done()):
+            self._size_flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> int:
+        """
+        Writes all buffered scores in one bulk insert. If the write fails, the scores are kept for the next flush.
+        :return: Number of scores written.
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            events, self._buffer = self._buffer, []
+            try:
+                await asyncio.to_thread(self._insert_events, events)
+            except Exception as e:
+                logger.error(f"Writing {len(events)} score(s) failed, will retry: {e}")
+                self._buffer[:0] = events
+                return 0
+            self._cache.clear()
+            logger.debug(f"Wrote {len(events)} score(s)")
+            return len(events)
+
+    async def top_players(self, guild_id: int | None = None, limit: int = 10) -> list[LeaderboardEntry]:
+        """
+        Players with the most points, highest first.
+        :param guild_id: Guild to get the leaderboard for. If None, points across all guilds are counted.
+        :param limit: Maximum number of players to return.
+        """
+        return await self._cached(("top_players", guild_id, limit), self._query_top_players, guild_id, limit)
+
+    async def player_history(self, user_id: int, guild_id: int | None = None, limit: int = 10) -> PlayerHistory:
+        """
+        A player's total points and most recent scores.
+        :param user_id: The player's user id.
+        :param guild_id: Guild to count scores from. If None, scores from all guilds are counted.
+        :param limit: Maximum number of recent scores to return.
+        """
+        return await self._cached(
+            ("player_history", user_id, guild_id, limit), self._query_player_history, user_id, guild_id, limit
+        )
+
+    async def _cached(self, key: tuple, query, *args):
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        result = await asyncio.to_thread(query, *args)
+        self._cache[key] = (time.monotonic() + self.cache_ttl, result)
+        return result
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _insert_events(self, events: list[dict]) -> None:
+        with Session(self._engine) as session:
+            session.execute(insert(ScoreEvent), events)
+            session.commit()
+
+    def _query_top_players(self, guild_id: int | None, limit: int) -> list[LeaderboardEntry]:
+        total_points = func.sum(ScoreEvent.points)
+        statement = select(ScoreEvent.user_id, total_points, func.count(), func.max(ScoreEvent.id)) \
+            .group_by(ScoreEvent.user_id) \
+            .order_by(total_points.desc()) \
+            .limit(limit)
+        if guild_id is not None:
+            statement = statement.where(ScoreEvent.guild_id == guild_id)
+        with Session(self._engine) as session:
+            rows = session.execute(statement).all()
+            # show each player by the name they last scored with
+            latest_ids = [latest_id for _, _, _, latest_id in rows]
+            names = dict(session.execute(
+                select(ScoreEvent.id, ScoreEvent.user_name).where(ScoreEvent.id.in_(latest_ids))
+            ).all())
+        return [
+            LeaderboardEntry(user_id, names.get(latest_id, str(user_id)), points, rounds_won)
+            for user_id, points, rounds_won, latest_id in rows
+        ]
+
+    def _query_player_history(self, user_id: int, guild_id: int | None, limit: int) -> PlayerHistory:
+        totals = select(func.coalesce(func.sum(ScoreEvent.points), 0), func.count()) \
+            .where(ScoreEvent.user_id == user_id)
+        recent = select(ScoreEvent.scored_at, ScoreEvent.guild_id, ScoreEvent.song_id, ScoreEvent.points) \
+            .where(ScoreEvent.user_id == user_id) \
+            .order_by(ScoreEvent.scored_at.desc()) \
+            .limit(limit)
+        if guild_id is not None:
+            totals = totals.where(ScoreEvent.guild_id == guild_id)
+            recent = recent.where(ScoreEvent.guild_id == guild_id)
+        with Session(self._engine) as session:
+            total_points, rounds_won = session.execute(totals).one()
+            recent_events = [tuple(row) for row in session.execute(recent).all()]
+        return PlayerHistory(total_points, rounds_won, recent_events)
@@ -1,12 +1,25 @@
 from collections import Counter
 
+from hard_brain_bot.services.score_store import ScoreStore
+from hard_brain_bot.utils.metrics import POINTS_AWARDED
+
 
 class ScoringService:
-    def __init__(self):
+    def __init__(self, score_store: ScoreStore | None = None, guild_id: int | None = None):
+        """
+        Keeps the scores of the current game, and records them in the persistent score store if one is given.
+        :param score_store: Store to record scores in.
+        :param guild_id: Guild the game is being played in.
+        """
         self.players = Counter()
+        self.score_store = score_store
+        self.guild_id = guild_id
 
     def get_scores(self) -> Counter:
         return self.players
 
-    def add_points(self, username: str, points: int = 1):
+    def add_points(self, username: str, points: int = 1, user_id: int | None = None, song_id: str | None = None):
         self.players[username] += points
+        POINTS_AWARDED.inc(points)
+        if self.score_store and user_id is not None and self.guild_id is not None:
+            self.score_store.record(user_id, self.guild_id, username, points, song_id)
@@ -0,0 +1,124 @@
+import asyncio
+import random
+from bisect import bisect_right
+from itertools import accumulate
+
+from loguru import logger
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from hard_brain_bot.data_models.tables import Base, SongRecord
+from hard_brain_bot.services.hard_brain_service import HardBrainService
+
+
+class SongCatalog:
+    SONG_FIELDS = ("song_id", "filename", "title", "alt_titles", "game_version", "genre", "artist")
+
+    def __init__(
+        self,
+        backend: HardBrainService,
+        database_path: str = "hard_brain_catalog.db",
+        sync_batch_size: int = 100,
+        max_idle_batches: int = 5,
+    ):
+        """
+        A local catalog of every song, stored in SQLite and indexed by game version in memory, so that quiz songs
+        can be sampled without calling the Hard Brain API.
+        :param backend: Application HardBrainService instance.
+        :param database_path: Path of the SQLite database file.
+        :param sync_batch_size: Number of songs to request from the API per batch when syncing.
+        :param max_idle_batches: Syncing stops after this many batches in a row contain no new or changed songs.
+        """
+        self.backend = backend
+        self.sync_batch_size = sync_batch_size
+        self.max_idle_batches = max_idle_batches
+        self._engine = create_engine(
+            f"sqlite:///{database_path}", connect_args={"check_same_thread": False}
+        )
+        self._songs: dict[str, dict] = {}
+        self._songs_by_version: dict[int, list[dict]] = {}
+
+    def is_ready(self) -> bool:
+        return len(self._songs) > 0
+
+    def __len__(self) -> int:
+        return len(self._songs)
+
+    async def load(self) -> None:
+        """
+        Creates the catalog's tables if needed and loads all stored songs into memory.
+        """
+        songs = await asyncio.to_thread(self._load_songs)
+        self._songs = {song["song_id"]: song for song in songs}
+        self._rebuild_index()
+        logger.info(f"Loaded {len(self._songs)} songs from the song catalog")
+
+    async def sync(self) -> int:
+        """
+        Incrementally syncs the catalog with the API by requesting batches of random songs and storing any which
+        are new or have changed, until several batches in a row bring nothing new.
+        :return: Number of songs added or updated.
+        """
+        changed_count = 0
+        idle_batches = 0
+        while idle_batches < self.max_idle_batches:
+            response = await self.backend.get_question(number_of_songs=self.sync_batch_size)
+            if not isinstance(response, list):
+                raise ValueError(f"Unexpected question response from API: {response}")
+            changed = {}
+            for props in response:
+                song = {field: props[field] for field in SongCatalog.SONG_FIELDS}
+                if self._songs.get(song["song_id"]) != song:
+                    changed[song["song_id"]] = song
+            if not changed:
+                idle_batches += 1
+                continue
+            idle_batches = 0
+            await asyncio.to_thread(self._store_songs, list(changed.values()))
+            self._songs.update(changed)
+            changed_count += len(changed)
+        self._rebuild_index()
+        logger.info(f"Synced song catalog, {changed_count} songs added or updated, {len(self._songs)} in total")
+        return changed_count
+
+    def sample(self, number_of_songs: int, versions: list[int]) -> list[dict]:
+        """
+        Picks random songs from the given game versions without replacement. Not asynchronous.
+        :param number_of_songs: Number of songs to pick. Fewer are returned if not enough songs match.
+        :param versions: Game versions to pick songs from. An empty list means all versions.
+        :return: A list of song props in the same format as the API's questions.
+        """
+        song_lists = [self._songs_by_version.get(v, []) for v in versions] if versions else \
+            list(self._songs_by_version.values())
+        # treat the song lists as one long list, and map sampled positions back to their list
+        offsets = list(accumulate(len(songs) for songs in song_lists))
+        total = offsets[-1] if offsets else 0
+        positions = random.sample(range(total), min(number_of_songs, total))
+        questions = []
+        for position in positions:
+            list_index = bisect_right(offsets, position)
+            start = offsets[list_index - 1] if list_index > 0 else 0
+            questions.append(song_lists[list_index][position - start])
+        return questions
+
+    def _rebuild_index(self) -> None:
+        songs_by_version = {}
+        for song in self._songs.values():
+            songs_by_version.setdefault(song["game_version"], []).append(song)
+        self._songs_by_version = songs_by_version
+
+    def _load_songs(self) -> list[dict]:
+        Base.metadata.create_all(self._engine)
+        with Session(self._engine) as session:
+            return [record.to_props() for record in session.scalars(select(SongRecord))]
+
+    def _store_songs(self, songs: list[dict]) -> None:
+        statement = insert(SongRecord)
+        statement = statement.on_conflict_do_update(
+            index_elements=[SongRecord.song_id],
+            set_={field: statement.excluded[field] for field in SongCatalog.SONG_FIELDS if field != "song_id"},
+        )
+        with Session(self._engine) as session:
+            session.execute(statement, songs)
+            session.commit()
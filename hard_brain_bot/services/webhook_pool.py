@@ -0,0 +1,229 @@
+import asyncio
+import time
+from collections import Counter
+
+import disnake
+from disnake import TextChannel, Webhook
+from loguru import logger
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from hard_brain_bot.data_models.tables import Base, WebhookChannel
+
+
+class WebhookPool:
+    WEBHOOK_NAME = "Hard Brain"
+
+    def __init__(self, bot: disnake.Client, max_idle_time: float = 3600.0, database_path: str | None = None):
+        """
+        A cache of the webhooks used to send quiz messages, one per text channel. Webhooks are reused between
+        quizzes in the same channel, and webhooks left behind by a previous run of the bot are adopted rather than
+        creating new ones.
+        :param bot: The bot, whose user owns the webhooks.
+        :param max_idle_time: Seconds a webhook can go unused before the sweeper deletes it.
+        :param database_path: Path of a SQLite file to record the channels with webhooks in, so that webhooks left
+        behind by a run of the bot which didn't stop cleanly can be found and deleted. If None, they are only
+        cleaned up when a quiz is next started in their channel.
+        """
+        self.bot = bot
+        self.max_idle_time = max_idle_time
+        self._engine = create_engine(
+            f"sqlite:///{database_path}", connect_args={"check_same_thread": False}
+        ) if database_path else None
+        self._webhooks: dict[int, Webhook] = {}
+        self._last_used: dict[int, float] = {}
+        # number of quizzes using each channel's webhook, including ones still being set up
+        self._in_use: Counter[int] = Counter()
+        # guild id of each channel recorded as having a webhook, including ones recorded by earlier runs
+        self._recorded_channels: dict[int, int] = {}
+        self._orphans_swept = False
+
+    async def start(self) -> None:
+        """
+        Creates the webhook channel table if needed and loads the channels recorded by earlier runs of the bot.
+        """
+        if self._engine is not None:
+            self._recorded_channels = await asyncio.to_thread(self._load_channels)
+
+    async def acquire(self, channel: TextChannel) -> Webhook:
+        """
+        Gets the webhook for a channel, finding or creating it if it isn't cached. Each successful call must be
+        matched by a call to `release`.
+        :raises disnake.Forbidden: If the bot is missing the 'Manage Webhooks' permission.
+        """
+        self._in_use[channel.id] += 1
+        try:
+            webhook = self._webhooks.get(channel.id)
+            if webhook is None:
+                webhook = await self._find_webhook(channel) or await self._create_webhook(channel)
+                self._webhooks[channel.id] = webhook
+                await self._record_channel(channel)
+        except BaseException:
+            self.release(channel.id)
+            raise
+        self._last_used[channel.id] = time.monotonic()
+        return webhook
+
+    def release(self, channel_id: int) -> None:
+        """
+        Marks a channel's webhook as no longer in use by one quiz, keeping it cached for the next quiz. Not
+        asynchronous.
+        """
+        self._in_use[channel_id] -= 1
+        if self._in_use[channel_id] <= 0:
+            del self._in_use[channel_id]
+        if channel_id in self._webhooks:
+            self._last_used[channel_id] = time.monotonic()
+
+    def invalidate(self, channel_id: int) -> None:
+        """
+        Forgets a channel's webhook, e.g. because it was deleted by someone else. Quizzes still using it should
+        still release it. Not asynchronous.
+        """
+        self._webhooks.pop(channel_id, None)
+        self._last_used.pop(channel_id, None)
+
+    async def sweep(self) -> None:
+        """
+        Deletes cached webhooks which are not in use and have been idle for longer than `max_idle_time`.
+        """
+        now = time.monotonic()
+        idle_channel_ids = [
+            channel_id for channel_id, last_used in self._last_used.items()
+            if channel_id not in self._in_use and now - last_used > self.max_idle_time
+        ]
+        for channel_id in idle_channel_ids:
+            webhook = self._webhooks.get(channel_id)
+            self.invalidate(channel_id)
+            if webhook is not None:
+                await self._delete_webhook(webhook, "Unused Hard Brain webhook")
+        await self._forget_channels(idle_channel_ids)
+        if idle_channel_ids:
+            logger.info(f"Swept {len(idle_channel_ids)} idle webhook(s)")
+
+    async def sweep_orphans(self, delay: float = 1.0) -> None:
+        """
+        Deletes webhooks owned by the bot which aren't cached, i.e. ones left behind by a previous run of the bot
+        which was stopped without deleting them. Only the channels recorded as having a webhook in this process's
+        guilds are checked, once, so this only needs to run after startup.
+        :param delay: Seconds to wait between channels, to spread the requests out.
+        """
+        if self._orphans_swept:
+            return
+        self._orphans_swept = True
+        guild_ids = {guild.id for guild in self.bot.guilds}
+        deleted = 0
+        swept_channel_ids = []
+        for channel_id, guild_id in list(self._recorded_channels.items()):
+            # channels in guilds handled by other processes are left to them
+            if guild_id not in guild_ids:
+                continue
+            # webhooks in channels with a quiz starting or running may be about to be adopted
+            if channel_id in self._webhooks or channel_id in self._in_use:
+                continue
+            swept_channel_ids.append(channel_id)
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                continue
+            try:
+                webhooks = await channel.webhooks()
+            except disnake.HTTPException as e:
+                logger.warning(f"Failed to list webhooks in channel {channel_id}: {e}")
+                continue
+            for webhook in webhooks:
+                if self._is_owned(webhook) and await self._delete_webhook(webhook, "Orphaned Hard Brain webhook"):
+                    deleted += 1
+            await asyncio.sleep(delay)
+        # a quiz may have adopted a webhook in one of these channels while the sweep was waiting
+        await self._forget_channels([
+            channel_id for channel_id in swept_channel_ids
+            if channel_id not in self._webhooks and channel_id not in self._in_use
+        ])
+        logger.info(f"Swept {deleted} orphaned webhook(s) from {len(swept_channel_ids)} channel(s)")
+
+    async def close(self) -> None:
+        """
+        Deletes every cached webhook, so that none are left behind while the bot isn't running.
+        """
+        webhooks = list(self._webhooks.values())
+        for channel_id in list(self._webhooks):
+            self.invalidate(channel_id)
+        await asyncio.gather(*(self._delete_webhook(webhook, "Hard Brain is shutting down") for webhook in webhooks))
+        await self._forget_channels([webhook.channel_id for webhook in webhooks])
+        if webhooks:
+            logger.info(f"Deleted {len(webhooks)} webhook(s) on shutdown")
+
+    async def _record_channel(self, channel: TextChannel) -> None:
+        if self._engine is None or channel.id in self._recorded_channels:
+            return
+        self._recorded_channels[channel.id] = channel.guild.id
+        try:
+            await asyncio.to_thread(self._insert_channel, channel.id, channel.guild.id)
+        except Exception as e:
+            logger.error(f"Failed to record webhook channel {channel.id}: {e}")
+
+    async def _forget_channels(self, channel_ids: list[int]) -> None:
+        channel_ids = [
+            channel_id for channel_id in channel_ids if self._recorded_channels.pop(channel_id, None) is not None
+        ]
+        if self._engine is None or not channel_ids:
+            return
+        try:
+            await asyncio.to_thread(self._delete_channels, channel_ids)
+        except Exception as e:
+            logger.error(f"Failed to forget {len(channel_ids)} webhook channel(s): {e}")
+
+    def _load_channels(self) -> dict[int, int]:
+        Base.metadata.create_all(self._engine, tables=[WebhookChannel.__table__])
+        with Session(self._engine) as session:
+            return dict(session.execute(select(WebhookChannel.channel_id, WebhookChannel.guild_id)).all())
+
+    def _insert_channel(self, channel_id: int, guild_id: int) -> None:
+        with Session(self._engine) as session:
+            session.execute(
+                insert(WebhookChannel).values(channel_id=channel_id, guild_id=guild_id).on_conflict_do_nothing()
+            )
+            session.commit()
+
+    def _delete_channels(self, channel_ids: list[int]) -> None:
+        with Session(self._engine) as session:
+            session.execute(delete(WebhookChannel).where(WebhookChannel.channel_id.in_(channel_ids)))
+            session.commit()
+
+    def _is_owned(self, webhook: Webhook) -> bool:
+        return webhook.name == WebhookPool.WEBHOOK_NAME and webhook.token is not None \
+            and webhook.user is not None and webhook.user.id == self.bot.user.id
+
+    async def _delete_webhook(self, webhook: Webhook, reason: str) -> bool:
+        """
+        :return: Whether the webhook was deleted by this call.
+        """
+        try:
+            await webhook.delete(reason=reason)
+        except (disnake.NotFound, disnake.Forbidden):
+            return False
+        except disnake.HTTPException as e:
+            logger.warning(f"Failed to delete webhook in channel {webhook.channel_id}: {e}")
+            return False
+        return True
+
+    async def _find_webhook(self, channel: TextChannel) -> Webhook | None:
+        owned_webhooks = [webhook for webhook in await channel.webhooks() if self._is_owned(webhook)]
+        if not owned_webhooks:
+            return None
+        # any extras were orphaned by an earlier run, so clean them up
+        for orphan in owned_webhooks[1:]:
+            await self._delete_webhook(orphan, "Orphaned Hard Brain webhook")
+        logger.debug(f"Reusing existing webhook in channel {channel.id}")
+        return owned_webhooks[0]
+
+    async def _create_webhook(self, channel: TextChannel) -> Webhook:
+        webhook = await channel.create_webhook(
+            name=WebhookPool.WEBHOOK_NAME,
+            avatar=self.bot.user.avatar,
+            reason="Webhook used by Hard Brain to send quiz messages - it is reused between quizzes and removed "
+            "automatically once unused for a while",
+        )
+        logger.debug("Webhook created successfully")
+        return webhook
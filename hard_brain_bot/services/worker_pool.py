@@ -0,0 +1,255 @@
+import itertools
+import multiprocessing
+import pickle
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from multiprocessing.context import BaseContext
+
+from loguru import logger
+
+
+class WorkerError(RuntimeError):
+    pass
+
+
+def _run_worker(requests: multiprocessing.Queue, responses: multiprocessing.Queue) -> None:
+    # the gateway process handles interrupts and shuts its workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while (request := requests.get()) is not None:
+        request_id, payload = request
+        try:
+            function, args, kwargs = pickle.loads(payload)
+            response = (request_id, True, function(*args, **kwargs))
+        except Exception as e:
+            response = (request_id, False, e)
+        try:
+            responses.put(pickle.dumps(response))
+        except Exception as e:
+            responses.put(pickle.dumps((request_id, False, WorkerError(f"Could not return result: {e!r}"))))
+    responses.put(None)
+
+
+class GameWorker(Executor):
+    POLL_INTERVAL: float = 1.0
+
+    def __init__(self, worker_id: int, context: BaseContext):
+        """
+        A worker process which runs game work sent to it over multiprocessing queues. It is an Executor, so work
+        can be sent to it with `loop.run_in_executor`.
+        :param worker_id: Index of the worker in its pool.
+        :param context: Multiprocessing context to create the process and queues with.
+        """
+        self.worker_id = worker_id
+        self.guild_ids: set[int] = set()
+        self._requests = context.Queue()
+        self._responses = context.Queue()
+        self._process = context.Process(
+            target=_run_worker,
+            args=(self._requests, self._responses),
+            name=f"hard-brain-worker-{worker_id}",
+            daemon=True,
+        )
+        self._futures: dict[int, Future] = {}
+        self._request_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._reader = threading.Thread(target=self._read_responses, name=f"hard-brain-worker-{worker_id}-reader",
+                                        daemon=True)
+
+    def start(self) -> None:
+        self._process.start()
+        self._reader.start()
+
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+    def is_usable(self) -> bool:
+        """
+        Whether the worker is running and accepting work. Not asynchronous.
+        """
+        return not self._shutdown and self._process.is_alive()
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        # pickle here rather than in the queue's feeder thread, so that unpicklable work fails in the caller
+        payload = pickle.dumps((fn, args, kwargs))
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError(f"Worker {self.worker_id} has been shut down")
+            request_id = next(self._request_ids)
+            self._futures[request_id] = future
+        self._requests.put((request_id, payload))
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            if cancel_futures:
+                for future in self._futures.values():
+                    future.cancel()
+        self._requests.put(None)
+        if wait:
+            self._process.join()
+            self._reader.join()
+
+    def _read_responses(self) -> None:
+        while True:
+            try:
+                response = self._responses.get(timeout=GameWorker.POLL_INTERVAL)
+            except queue.Empty:
+                if self._process.is_alive() or not self._process.pid:
+                    continue
+                self._fail_pending(WorkerError(f"Worker {self.worker_id} exited with code {self._process.exitcode}"))
+                return
+            if response is None:
+                self._fail_pending(WorkerError(f"Worker {self.worker_id} has been shut down"))
+                return
+            request_id, succeeded, result = pickle.loads(response)
+            with self._lock:
+                future = self._futures.pop(request_id, None)
+            if future is None or not future.set_running_or_notify_cancel():
+                continue
+            if succeeded:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    def _fail_pending(self, error: Exception) -> None:
+        with self._lock:
+            self._shutdown = True
+            futures = list(self._futures.values())
+            self._futures.clear()
+        if futures:
+            logger.error(f"{error}, failing {len(futures)} pending request(s)")
+        for future in futures:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+
+class GameExecutor(Executor):
+    def __init__(self, pool: "WorkerPool", worker_id: int):
+        """
+        The executor a game sends its work to. Work goes to the game's worker process, or to the pool's in-process
+        fallback while that worker is dead and can't be replaced yet. Work which was sent to a worker that died
+        before finishing it is run again in the fallback.
+        """
+        self.pool = pool
+        self.worker_id = worker_id
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        worker = self.pool.get_worker(self.worker_id)
+        if worker is None:
+            return self.pool.fallback.submit(fn, *args, **kwargs)
+        try:
+            worker_future = worker.submit(fn, *args, **kwargs)
+        except RuntimeError:
+            # the worker died since it was checked
+            return self.pool.fallback.submit(fn, *args, **kwargs)
+        future = Future()
+
+        def on_worker_done(done: Future) -> None:
+            if done.cancelled():
+                future.cancel()
+            elif isinstance(done.exception(), WorkerError):
+                _chain_future(self.pool.fallback.submit(fn, *args, **kwargs), future)
+            else:
+                _chain_future(done, future)
+
+        worker_future.add_done_callback(on_worker_done)
+        return future
+
+
+def _chain_future(source: Future, destination: Future) -> None:
+    def copy_result(done: Future) -> None:
+        if done.cancelled():
+            destination.cancel()
+            return
+        if not destination.set_running_or_notify_cancel():
+            return
+        if done.exception() is not None:
+            destination.set_exception(done.exception())
+        else:
+            destination.set_result(done.result())
+
+    source.add_done_callback(copy_result)
+
+
+class WorkerPool:
+    RESPAWN_INTERVAL: float = 10.0
+
+    def __init__(self, size: int = 2, fallback_threads: int = 2):
+        """
+        A pool of worker processes which game work, such as answer scoring and audio transcoding, is sent to
+        instead of running it in the gateway process. Each game is assigned to one worker for its whole duration.
+        Dead workers are replaced, and while a worker can't be replaced its games' work runs in a thread pool in
+        the gateway process instead.
+        :param size: Number of worker processes.
+        :param fallback_threads: Number of threads in the in-process fallback.
+        """
+        # spawn rather than fork, as the gateway process has an event loop and threads running
+        self._context = multiprocessing.get_context("spawn")
+        self.workers = [GameWorker(worker_id, self._context) for worker_id in range(size)]
+        for worker in self.workers:
+            worker.start()
+        self.fallback = ThreadPoolExecutor(max_workers=fallback_threads, thread_name_prefix="hard-brain-fallback")
+        self._respawned_at = [-WorkerPool.RESPAWN_INTERVAL] * size
+        self._closed = False
+        logger.info(f"Started {size} game worker process(es)")
+
+    def assign(self, guild_id: int) -> GameExecutor:
+        """
+        Assigns a guild's game to the live worker with the fewest games. Not asynchronous.
+        :return: The executor to send the game's work to.
+        :raises WorkerError: If every worker has exited and none could be replaced.
+        """
+        live_workers = [worker for worker_id in range(len(self.workers)) if (worker := self.get_worker(worker_id))]
+        if not live_workers:
+            raise WorkerError("No game workers are running")
+        worker = min(live_workers, key=lambda w: len(w.guild_ids))
+        worker.guild_ids.add(guild_id)
+        return GameExecutor(self, worker.worker_id)
+
+    def get_worker(self, worker_id: int) -> GameWorker | None:
+        """
+        Gets a live worker, replacing it first if it has died and wasn't replaced in the last `RESPAWN_INTERVAL`
+        seconds. Not asynchronous.
+        :return: The worker, or None if it is dead and can't be replaced yet.
+        """
+        worker = self.workers[worker_id]
+        if worker.is_usable() or self._closed:
+            return worker if worker.is_usable() else None
+        now = time.monotonic()
+        if now - self._respawned_at[worker_id] < WorkerPool.RESPAWN_INTERVAL:
+            return None
+        self._respawned_at[worker_id] = now
+        logger.warning(f"Worker {worker_id} has died, replacing it")
+        worker.shutdown(wait=False, cancel_futures=True)
+        replacement = GameWorker(worker_id, self._context)
+        replacement.guild_ids = worker.guild_ids
+        try:
+            replacement.start()
+        except OSError as e:
+            logger.error(f"Failed to replace worker {worker_id}: {e}")
+            return None
+        self.workers[worker_id] = replacement
+        return replacement
+
+    def release(self, guild_id: int, worker_id: int) -> None:
+        """
+        Removes a guild's game from its worker. Not asynchronous.
+        """
+        self.workers[worker_id].guild_ids.discard(guild_id)
+
+    def close(self) -> None:
+        """
+        Stops all workers without waiting for their outstanding work. Not asynchronous.
+        """
+        self._closed = True
+        for worker in self.workers:
+            worker.shutdown(wait=False, cancel_futures=True)
+        self.fallback.shutdown(wait=False, cancel_futures=True)
@@ -1,8 +1,14 @@
 import asyncio
+import time
 from collections import namedtuple
-from typing import Callable, Any
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import Callable, Any, Awaitable
+
+from loguru import logger
 
 from hard_brain_bot.data_models.requests import SongData
+from hard_brain_bot.utils.metrics import ANSWER_CHECK_LATENCY, ANSWER_CHECKS, ANSWERS_CHECKED, ANSWERS_DROPPED
 
 
 class AsyncTimer:
@@ -88,21 +94,108 @@ class AsyncTimer:
         await self._event.wait()
 
 
-class AnswerQueue:
-    Input = namedtuple("Input", "current_song answer")
+async def measure_loop_lag(interval: float, on_lag: Callable[[float], Any]) -> None:
+    """
+    Repeatedly sleeps for `interval` seconds and calls `on_lag` with how many seconds late the event loop was in
+    waking up. Runs until cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started_at = loop.time()
+        await asyncio.sleep(interval)
+        on_lag(max(0.0, loop.time() - started_at - interval))
 
-    def __init__(self):
-        self._queue = asyncio.Queue(1)
 
-    async def queue_answer(self, current_song: SongData, answer: str):
-        await self._queue.put(AnswerQueue.Input(current_song, answer))
+class AnswerQueue:
+    Input = namedtuple("Input", "current_song answer created_at sender")
 
-    async def check_answer_fifo(self):
-        await asyncio.sleep(0.1)
-        if self._queue.empty():
-            return False
+    def __init__(
+        self,
+        on_correct_answer: Callable[[SongData, Any], Awaitable[Any]],
+        executor: Executor | None = None,
+        max_pending: int = 200,
+    ):
+        """
+        A non-blocking queue of answers to check against the current song. Answers are checked in batches in the
+        order they were sent, and the sender of the first correct answer for a song is passed to the callback.
+        Later answers for a song which has already been answered are discarded.
+        :param on_correct_answer: Coroutine function called with the song and the sender of its first correct answer.
+        :param executor: If given, answers are scored in this executor instead of on the event loop.
+        :param max_pending: Maximum number of answers waiting to be checked. Answers received while the queue is
+        full are dropped, as answers already waiting were sent earlier.
+        """
+        self._on_correct_answer = on_correct_answer
+        self._executor = executor
+        self._max_pending = max_pending
+        self._pending: list[AnswerQueue.Input] = []
+        self._answered_song: SongData | None = None
+        self._task: asyncio.Task | None = None
+        self.dropped = 0
 
-        answer_input: AnswerQueue.Input = await self._queue.get()
-        if not isinstance(answer_input.current_song, SongData):
+    def queue_answer(self, current_song: SongData, answer: str, created_at: datetime, sender: Any = None) -> bool:
+        """
+        Queues an answer to be checked. Not asynchronous.
+        :param current_song: Song the answer is for.
+        :param answer: The answer text.
+        :param created_at: When the answer was sent, used to order answers within a batch.
+        :param sender: Passed to the callback if this is the first correct answer, e.g. the answer's message.
+        :return: False if the answer was discarded, otherwise True.
+        """
+        if not isinstance(current_song, SongData) or current_song is self._answered_song:
+            return False
+        if len(self._pending) >= self._max_pending:
+            self.dropped += 1
+            ANSWERS_DROPPED.inc()
             return False
-        return answer_input.current_song.is_correct_answer(answer_input.answer)
+        self._pending.append(AnswerQueue.Input(current_song, answer, created_at, sender))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._check_answers())
+        return True
+
+    def close(self) -> None:
+        """
+        Discards any waiting answers and stops checking answers. Not asynchronous.
+        """
+        self._pending.clear()
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def _check_answers(self):
+        # let answers arriving in the same loop iteration join the first batch
+        await asyncio.sleep(0)
+        while self._pending:
+            current_song = self._pending[0].current_song
+            batch = [item for item in self._pending if item.current_song is current_song]
+            self._pending = [item for item in self._pending if item.current_song is not current_song]
+            if current_song is self._answered_song:
+                continue
+
+            batch.sort(key=lambda item: item.created_at)
+            answers = [item.answer for item in batch]
+            started_at = time.perf_counter()
+            if self._executor is None:
+                winner, checks = current_song.first_correct_answer(answers)
+            else:
+                loop = asyncio.get_running_loop()
+                try:
+                    # only the answer key is sent, not the whole song
+                    winner, checks = await loop.run_in_executor(
+                        self._executor, current_song.answer_key.first_correct_answer, answers
+                    )
+                except Exception as e:
+                    # e.g. a broken process pool, which shouldn't stop answers being accepted
+                    logger.error(f"Scoring answers in executor failed, scoring them on the event loop: {e!r}")
+                    winner, checks = current_song.first_correct_answer(answers)
+            ANSWER_CHECK_LATENCY.observe(time.perf_counter() - started_at)
+            # counted here rather than where the answers were checked, which may be another process
+            for check, count in checks.items():
+                ANSWER_CHECKS.labels(check).inc(count)
+            # answers after the winner are not checked
+            checked = len(answers) if winner is None else winner + 1
+            ANSWERS_CHECKED.labels("incorrect").inc(checked - (winner is not None))
+            if winner is not None:
+                ANSWERS_CHECKED.labels("correct").inc()
+
+            if winner is not None:
+                self._answered_song = current_song
+                await self._on_correct_answer(current_song, batch[winner].sender)
@@ -0,0 +1,262 @@
+import asyncio
+import io
+import queue
+import subprocess
+import threading
+import time
+from typing import AsyncIterator, Callable
+
+from disnake import AudioSource, FFmpegOpusAudio
+from disnake.oggparse import OggStream
+from loguru import logger
+
+OPUS_HEADER_PACKETS = (b"OpusHead", b"OpusTags")
+
+
+async def transcode_to_opus(audio: bytes, bitrate: int = 128, executable: str = "ffmpeg") -> bytes:
+    """
+    Transcodes an audio clip to an Ogg/Opus stream in the format Discord expects, so it can be played without
+    being re-encoded.
+    :param audio: Audio clip in any format supported by ffmpeg.
+    :param bitrate: Opus bitrate in kbps.
+    :param executable: ffmpeg executable to use.
+    :return: The Ogg/Opus stream bytes.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *_transcode_args(bitrate, executable),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate(audio)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}: {stderr.decode(errors='replace')}")
+    return stdout
+
+
+def transcode_to_opus_sync(audio: bytes, bitrate: int = 128, executable: str = "ffmpeg") -> bytes:
+    """
+    Blocking version of `transcode_to_opus`, for running in a worker process.
+    """
+    process = subprocess.run(_transcode_args(bitrate, executable), input=audio, capture_output=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}: {process.stderr.decode(errors='replace')}")
+    return process.stdout
+
+
+def _transcode_args(bitrate: int, executable: str) -> list[str]:
+    return [
+        executable,
+        "-i", "-",
+        "-map_metadata", "-1",
+        "-f", "opus",
+        "-c:a", "libopus",
+        "-ar", "48000",
+        "-ac", "2",
+        "-b:a", f"{bitrate}k",
+        "-loglevel", "warning",
+        "pipe:1",
+    ]
+
+
+class OggOpusAudio(AudioSource):
+    def __init__(self, data: bytes) -> None:
+        """
+        An audio source that plays an already encoded Ogg/Opus stream by reading its packets directly, without
+        spawning ffmpeg.
+        :param data: Ogg/Opus stream bytes, as produced by `transcode_to_opus`.
+        """
+        self._packet_iter = OggStream(io.BytesIO(data)).iter_packets()
+
+    def read(self) -> bytes:
+        packet = next(self._packet_iter, b"")
+        while packet.startswith(OPUS_HEADER_PACKETS):
+            packet = next(self._packet_iter, b"")
+        return packet
+
+    def is_opus(self) -> bool:
+        return True
+
+
+class AudioPipe(io.RawIOBase):
+    def __init__(self, chunks: AsyncIterator[bytes], max_buffered_chunks: int = 8) -> None:
+        """
+        A file-like object which is fed from an async iterator of audio chunks as they arrive, so that it can be
+        passed to `FFmpegOpusAudio(..., pipe=True)` before the whole clip has downloaded. Reads block the calling
+        thread until a chunk is available. Must be created from within the running event loop.
+        :param chunks: Async iterator of audio chunks, e.g. from `HardBrainService.stream_audio`.
+        :param max_buffered_chunks: Maximum number of chunks held in memory waiting to be read.
+        """
+        super().__init__()
+        self._loop = asyncio.get_running_loop()
+        self._chunks: queue.SimpleQueue[bytes] = queue.SimpleQueue()
+        self._space = asyncio.Semaphore(max_buffered_chunks)
+        self._started = asyncio.Event()
+        self.bytes_received = 0
+        # the error the stream failed with, if it did. A failed stream is ended early rather than raising in reads
+        self.error: Exception | None = None
+        self._feed_task = self._loop.create_task(self._feed(chunks))
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._chunks.get()
+        if chunk:
+            self._loop.call_soon_threadsafe(self._space.release)
+        else:
+            # put the end of stream marker back for any later reads
+            self._chunks.put(b"")
+        return chunk
+
+    async def wait_until_started(self) -> None:
+        """
+        Waits until the first chunk has arrived, or the stream has ended.
+        :raises Exception: The error the stream failed with, if it failed before any audio arrived.
+        """
+        await self._started.wait()
+        if self.error is not None and self.bytes_received == 0:
+            raise self.error
+
+    def close(self) -> None:
+        """
+        Stops downloading and ends the stream. Not asynchronous.
+        """
+        if not self._feed_task.done():
+            self._feed_task.cancel()
+        self._chunks.put(b"")
+        super().close()
+
+    async def _feed(self, chunks: AsyncIterator[bytes]) -> None:
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                await self._space.acquire()
+                self._chunks.put(chunk)
+                self.bytes_received += len(chunk)
+                self._started.set()
+        except Exception as e:
+            logger.error(f"Streaming audio failed after {self.bytes_received} bytes: {e!r}")
+            self.error = e
+        finally:
+            self._chunks.put(b"")
+            self._started.set()
+
+
+class PendingSource(io.RawIOBase):
+    def __init__(self) -> None:
+        """
+        A file-like object whose underlying source is given later. Reads block until the source is set, so an
+        ffmpeg process can be spawned with this as its input before the audio is known.
+        """
+        super().__init__()
+        self._source: io.IOBase | None = None
+        self._source_set = threading.Event()
+
+    def readable(self) -> bool:
+        return True
+
+    def set_source(self, source: io.IOBase) -> None:
+        self._source = source
+        self._source_set.set()
+
+    def read(self, size: int = -1) -> bytes:
+        self._source_set.wait()
+        return self._source.read(size)
+
+    def close(self) -> None:
+        if not self._source_set.is_set():
+            self.set_source(io.BytesIO())
+        super().close()
+
+
+class EncoderPool:
+    def __init__(self, size: int = 2) -> None:
+        """
+        A pool of idle ffmpeg Opus encoder processes, spawned ahead of time so that rounds don't wait for ffmpeg to
+        start. Must be created from within the running event loop.
+        :param size: Number of idle encoders to keep ready.
+        """
+        self.size = size
+        self._loop = asyncio.get_running_loop()
+        self._idle: list[tuple[FFmpegOpusAudio, PendingSource]] = []
+        self._spawning = 0
+        self._closed = False
+        self._replenish()
+
+    def claim(self, source: io.IOBase) -> FFmpegOpusAudio:
+        """
+        Takes an idle encoder and starts feeding it the given audio, spawning a new encoder if none are idle.
+        Not asynchronous.
+        :param source: File-like object containing the audio to encode.
+        """
+        if self._idle:
+            encoder, pending = self._idle.pop()
+            pending.set_source(source)
+        else:
+            encoder = FFmpegOpusAudio(source, pipe=True)
+        self._replenish()
+        return encoder
+
+    def close(self) -> None:
+        """
+        Kills all idle encoders. Not asynchronous.
+        """
+        self._closed = True
+        for encoder, pending in self._idle:
+            pending.close()
+            encoder.cleanup()
+        self._idle.clear()
+
+    def _replenish(self) -> None:
+        while not self._closed and len(self._idle) + self._spawning < self.size:
+            self._spawning += 1
+            future = self._loop.run_in_executor(None, EncoderPool._spawn)
+            future.add_done_callback(self._on_spawned)
+
+    def _on_spawned(self, future: asyncio.Future) -> None:
+        self._spawning -= 1
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error(f"Could not spawn idle encoder: {future.exception()}")
+            return
+        encoder, pending = future.result()
+        if self._closed:
+            pending.close()
+            encoder.cleanup()
+            return
+        self._idle.append((encoder, pending))
+
+    @staticmethod
+    def _spawn() -> tuple[FFmpegOpusAudio, PendingSource]:
+        pending = PendingSource()
+        return FFmpegOpusAudio(pending, pipe=True), pending
+
+
+class TimedAudioSource(AudioSource):
+    def __init__(self, original: AudioSource, started_at: float, on_first_audio: Callable[[float], None]) -> None:
+        """
+        Wraps an audio source to measure how long it takes for its first audio frame to be read.
+        :param original: The audio source to wrap.
+        :param started_at: `time.perf_counter()` value to measure from.
+        :param on_first_audio: Called with the elapsed seconds once the first frame is read, from the player thread.
+        """
+        self.original = original
+        self._started_at = started_at
+        self._on_first_audio = on_first_audio
+        self._measured = False
+
+    def read(self) -> bytes:
+        data = self.original.read()
+        if not self._measured and data:
+            self._measured = True
+            self._on_first_audio(time.perf_counter() - self._started_at)
+        return data
+
+    def is_opus(self) -> bool:
+        return self.original.is_opus()
+
+    def cleanup(self) -> None:
+        self.original.cleanup()
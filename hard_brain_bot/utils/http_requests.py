@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import AsyncIterator, Literal
 from aiohttp import ClientSession
 
 
@@ -23,4 +23,20 @@ async def request_bytes(
     if not params:
         params = {}
     async with session.request(method, url, params=params) as response:
+        response.raise_for_status()
         return await response.read()
+
+
+async def request_stream(
+    method: Literal["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
+    url: str,
+    session: ClientSession,
+    params: dict | None = None,
+    chunk_size: int = 16 * 1024,
+) -> AsyncIterator[bytes]:
+    if not params:
+        params = {}
+    async with session.request(method, url, params=params) as response:
+        response.raise_for_status()
+        async for chunk in response.content.iter_chunked(chunk_size):
+            yield chunk
@@ -0,0 +1,277 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTE_BUCKETS = tuple(2 ** exponent for exponent in range(14, 25))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        A collection of metrics which can be rendered in the Prometheus text exposition format.
+        """
+        self._metrics: dict[str, "_Metric"] = {}
+
+    def register(self, metric: "_Metric") -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"A metric named '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """
+        Renders every metric in the text exposition format. Not asynchronous.
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        registry: MetricsRegistry | None = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+        if not label_names:
+            # unlabelled metrics are always exposed, even before they are first recorded
+            self.labels()
+
+    def labels(self, *label_values: str):
+        """
+        Gets the child metric for a set of label values, creating it on first use. Not asynchronous.
+        """
+        child = self._children.get(label_values)
+        if child is None:
+            if len(label_values) != len(self.label_names):
+                raise ValueError(f"Metric '{self.name}' expects labels {self.label_names}, got {label_values}")
+            with self._lock:
+                child = self._children.setdefault(label_values, self._new_child())
+        return child
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for label_values, child in list(self._children.items()):
+            lines.extend(self._collect_child(_format_labels(self.label_names, label_values), child))
+        return lines
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _collect_child(self, labels: str, child) -> list[str]:
+        raise NotImplementedError
+
+
+class _CounterValue:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+    def _collect_child(self, labels: str, child: _CounterValue) -> list[str]:
+        return [f"{self.name}_total{labels} {_format_value(child.value)}"]
+
+
+class _GaugeValue:
+    def __init__(self):
+        self.value = 0.0
+        self.function: Callable[[], float] | None = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        Reads the gauge's value from a function whenever it is collected, instead of it being set.
+        """
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function else self.value
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+    def _new_child(self) -> _GaugeValue:
+        return _GaugeValue()
+
+    def _collect_child(self, labels: str, child: _GaugeValue) -> list[str]:
+        return [f"{self.name}{labels} {_format_value(child.get())}"]
+
+
+class _HistogramValue:
+    def __init__(self, upper_bounds: tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # counts are per bucket rather than cumulative, with a final bucket for values above every bound
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """
+        Observes the number of seconds spent inside the `with` block.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: MetricsRegistry | None = None,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, label_names, registry)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def _collect_child(self, labels: str, child: _HistogramValue) -> list[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for upper_bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            bucket_labels = _format_labels(("le",), (_format_value(upper_bound),), labels)
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...], existing: str = "") -> str:
+    pairs = [existing[1:-1]] if existing else []
+    for name, value in zip(label_names, label_values):
+        escaped = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f"{name}=\"{escaped}\"")
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    return repr(float(value))
+
+
+# metrics recorded by the bot
+API_LATENCY = Histogram(
+    "hard_brain_api_request_seconds", "Latency of Hard Brain API requests.", ("endpoint",)
+)
+AUDIO_BYTES = Histogram(
+    "hard_brain_audio_bytes", "Size of audio clips fetched from the Hard Brain API.", ("method",), BYTE_BUCKETS
+)
+AUDIO_CACHE_LOOKUPS = Gauge(
+    "hard_brain_audio_cache_lookups", "Audio cache lookups since startup, by cache and result.", ("cache", "result")
+)
+AUDIO_CACHE_BYTES = Gauge(
+    "hard_brain_audio_cache_bytes", "Size of the clips held by each audio cache tier.", ("cache", "tier")
+)
+TIME_TO_FIRST_AUDIO = Histogram(
+    "hard_brain_time_to_first_audio_seconds", "Time from a round starting to its first audio frame being played."
+)
+ANSWER_CHECK_LATENCY = Histogram(
+    "hard_brain_answer_check_seconds", "Time taken to check a batch of answers."
+)
+ANSWERS_CHECKED = Counter(
+    "hard_brain_answers_checked", "Answers checked against the current song.", ("result",)
+)
+ANSWER_CHECKS = Counter(
+    "hard_brain_answer_checks", "Answers checked, by whether they matched exactly, were rejected before fuzzy "
+    "matching or were fuzzy matched.", ("check",)
+)
+ANSWERS_DROPPED = Counter(
+    "hard_brain_answers_dropped", "Answers dropped because too many were waiting to be checked."
+)
+POINTS_AWARDED = Counter(
+    "hard_brain_points_awarded", "Points awarded to players."
+)
+MESSAGE_SEND_LATENCY = Histogram(
+    "hard_brain_message_send_seconds", "Latency of sending quiz messages to Discord.", ("destination",)
+)
+MESSAGES_COALESCED = Counter(
+    "hard_brain_messages_coalesced", "Quiz messages merged into another message instead of being sent separately."
+)
+EVENT_LOOP_LAG = Histogram(
+    "hard_brain_event_loop_lag_seconds", "How late the event loop was in waking up a sleeping task."
+)
+ACTIVE_GAMES = Gauge(
+    "hard_brain_active_games", "Number of quizzes in progress."
+)
+VOICE_CONNECTIONS = Gauge(
+    "hard_brain_voice_connections", "Number of connected voice clients."
+)
@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import sys
+
+from loguru import logger
+
+from loadtest.harness import LoadTest, LoadTestOptions
+
+if __name__ == "__main__":
+    defaults = LoadTestOptions()
+    parser = argparse.ArgumentParser(
+        prog="python -m loadtest",
+        description="Runs concurrent quizzes against a stub Hard Brain API and fake Discord clients",
+    )
+    parser.add_argument("--games", type=int, default=defaults.games, help="number of concurrent games")
+    parser.add_argument("--rounds", type=int, default=defaults.rounds, help="rounds per game")
+    parser.add_argument("--time-limit", type=float, default=defaults.time_limit, help="round time limit in seconds")
+    parser.add_argument("--players", type=int, default=defaults.players, help="simulated players per game")
+    parser.add_argument("--wrong-answer-rate", type=float, default=defaults.wrong_answer_rate,
+                        help="wrong answers per second per game")
+    parser.add_argument("--answer-delay", type=float, default=defaults.answer_delay,
+                        help="mean seconds until a round is answered correctly")
+    parser.add_argument("--correct-probability", type=float, default=defaults.correct_probability,
+                        help="chance of a round being answered correctly at all")
+    parser.add_argument("--ramp-interval", type=float, default=defaults.ramp_interval,
+                        help="seconds between starting each game")
+    parser.add_argument("--api-latency", type=float, default=defaults.api_latency,
+                        help="stub API latency in seconds")
+    parser.add_argument("--audio-seconds", type=float, default=defaults.audio_seconds,
+                        help="length of the stub API's audio clips")
+    parser.add_argument("--catalog-size", type=int, default=defaults.catalog_size,
+                        help="number of songs in the stub API")
+    parser.add_argument("--fast-audio", action="store_true", help="play audio as fast as possible, not in real time")
+    parser.add_argument("--no-ffmpeg", action="store_true", help="don't encode audio, even if ffmpeg is installed")
+    parser.add_argument("--game-workers", type=int, help="number of game worker processes, overriding "
+                                                          "HARD_BRAIN_GAME_WORKERS")
+    parser.add_argument("--shards", type=int, default=defaults.shards, help="number of shards the games' guilds are "
+                                                                          "spread across")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--metrics", action="store_true", help="also print every recorded metric")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    options = LoadTestOptions(
+        games=args.games,
+        rounds=args.rounds,
+        time_limit=args.time_limit,
+        players=args.players,
+        wrong_answer_rate=args.wrong_answer_rate,
+        answer_delay=args.answer_delay,
+        correct_probability=args.correct_probability,
+        ramp_interval=args.ramp_interval,
+        api_latency=args.api_latency,
+        audio_seconds=args.audio_seconds,
+        catalog_size=args.catalog_size,
+        realtime_audio=not args.fast_audio,
+        use_ffmpeg=False if args.no_ffmpeg else None,
+        game_workers=args.game_workers,
+        shards=args.shards,
+        seed=args.seed,
+    )
+    print(asyncio.run(LoadTest(options).run()))
+    if args.metrics:
+        from hard_brain_bot.utils.metrics import REGISTRY
+        print(REGISTRY.render())
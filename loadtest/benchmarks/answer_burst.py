@@ -0,0 +1,112 @@
+"""
+Sends bursts of answers to several games at once and measures the event loop's lag and how long each burst takes to
+be judged, with answers scored on the event loop or in a process pool (HARD_BRAIN_SCORING_WORKERS). The answers are
+the title's letters shuffled, so every one of them has to be fuzzy matched. Also shows how much is pickled per batch
+sent to the pool: each song's answer key, rather than the whole song as before.
+
+    python -m loadtest.benchmarks.answer_burst --burst 200 --games 5 --workers 2
+"""
+import argparse
+import asyncio
+import pickle
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from hard_brain_bot.data_models.requests import SongData
+from hard_brain_bot.utils.async_helpers import AnswerQueue, measure_loop_lag
+from loadtest.stats import format_percentiles
+
+
+def _make_song(index: int, rng: random.Random) -> SongData:
+    words = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(4, 9))) for _ in range(12)]
+    alt_titles = ", ".join(" ".join(rng.sample(words, 3)) for _ in range(5))
+    return SongData.from_props({
+        "song_id": f"01{index:03d}", "filename": "", "title": " ".join(words[:4]), "alt_titles": alt_titles,
+        "game_version": 1, "genre": "GENRE", "artist": "Artist",
+    })
+
+
+def _near_miss(title: str, rng: random.Random) -> str:
+    letters = list(title)
+    rng.shuffle(letters)
+    return "".join(letters)
+
+
+async def _run_burst(song: SongData, executor, burst: int, burst_seconds: float, rng: random.Random) -> float:
+    """
+    Sends `burst` answers over `burst_seconds`, the last one correct, and returns the seconds from the first answer
+    until the verdict.
+    """
+    answered = asyncio.Event()
+
+    async def on_correct_answer(current_song, sender):
+        answered.set()
+
+    queue = AnswerQueue(on_correct_answer, executor=executor, max_pending=burst)
+    sent_at = datetime.now(timezone.utc)
+    started_at = time.perf_counter()
+    for index in range(burst):
+        answer = song.title if index == burst - 1 else _near_miss(song.title, rng)
+        queue.queue_answer(song, answer, sent_at + timedelta(milliseconds=index), index)
+        if index % 20 == 19:
+            await asyncio.sleep(burst_seconds / burst * 20)
+    await answered.wait()
+    queue.close()
+    return time.perf_counter() - started_at
+
+
+async def run(mode: str, games: int, bursts: int, burst: int, burst_seconds: float, workers: int) -> str:
+    rng = random.Random(0)
+    songs = [_make_song(index, rng) for index in range(games * bursts)]
+    executor = ProcessPoolExecutor(max_workers=workers) if mode == "process-pool" else None
+    if executor:
+        # start the worker processes before measuring
+        await asyncio.gather(*(
+            asyncio.get_running_loop().run_in_executor(executor, songs[0].answer_key.first_correct_answer, [])
+            for _ in range(workers)
+        ))
+    loop_lags: list[float] = []
+    lag_task = asyncio.create_task(measure_loop_lag(0.005, loop_lags.append))
+    verdict_times: list[float] = []
+    started_at = time.perf_counter()
+    try:
+        for index in range(bursts):
+            verdict_times += await asyncio.gather(*(
+                _run_burst(songs[index * games + game], executor, burst, burst_seconds, rng) for game in range(games)
+            ))
+            await asyncio.sleep(0.05)
+    finally:
+        lag_task.cancel()
+        if executor:
+            executor.shutdown()
+    elapsed = time.perf_counter() - started_at
+    lines = [
+        f"[{mode}] {bursts} rounds of {burst} answers to {games} games at once in {elapsed:.1f} s",
+        f"  burst to verdict: {format_percentiles(verdict_times)}",
+        f"  event loop lag: {format_percentiles(loop_lags)}",
+    ]
+    if executor:
+        answers = [_near_miss(songs[0].title, rng) for _ in range(burst)]
+        song_bytes = len(pickle.dumps((songs[0].first_correct_answer, answers)))
+        key_bytes = len(pickle.dumps((songs[0].answer_key.first_correct_answer, answers)))
+        lines.append(f"  pickled per batch of {burst}: {key_bytes} bytes with the answer key, "
+                     f"{song_bytes} bytes with the whole song")
+    return "\n".join(lines)
+
+
+async def main(args: argparse.Namespace) -> None:
+    for mode in ("event-loop", "process-pool"):
+        print(await run(mode, args.games, args.bursts, args.burst, args.burst_seconds, args.workers))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest.benchmarks.answer_burst", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=200, help="answers per game per burst")
+    parser.add_argument("--burst-seconds", type=float, default=0.1, help="seconds each burst is spread over")
+    parser.add_argument("--games", type=int, default=5, help="games receiving a burst at the same time")
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2, help="scoring worker processes")
+    asyncio.run(main(parser.parse_args()))
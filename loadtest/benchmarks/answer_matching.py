@@ -0,0 +1,168 @@
+"""
+Times `SongData.is_correct_answer` on the stub API's song titles, plus some with full-width and Japanese characters,
+against a mix of chat messages: the title or an alternate title, with typos, with words swapped or missing, and
+unrelated chatter. Compares the answers prepared once per song and scored with rapidfuzz against the thefuzz
+`token_sort_ratio` loop which normalized every correct answer on every check, and counts any answers the two judge
+differently.
+
+    python -m loadtest.benchmarks.answer_matching --songs 200 --messages 50 --repeat 5
+"""
+import argparse
+import random
+import string
+import time
+from dataclasses import dataclass
+
+from thefuzz import fuzz
+
+from hard_brain_bot.data_models.requests import SongData
+from hard_brain_bot.utils.helpers import VersionHelper
+from loadtest.stub_api import WORDS, StubHardBrainApi
+
+# titles like the ones in the real catalog which the stub API doesn't generate
+EXTRA_TITLES = (
+    ("卑弥呼", "Himiko, himiko"), ("冥", "mei"), ("ＦＬＯＷＥＲ", "flower"), ("smooooch・∀・", "smooch"),
+    ("Colors (radio edit)", "colors"), ("Ｃａｓｔｌｅ", "castle"), ("V", ""), ("Xepher", ""),
+    ("Hard Brain", "hardbrain"), ("灼熱 Pt.2 Long Train Running", "shakunetsu pt 2, long train running"),
+)
+CHATTER = (
+    "lol", "no idea", "what is this", "?", "i know this one", "ugh", "sounds like a 17 chart", "gg", "skip",
+    "is this from sirius", "www", "わからない", "ｗｗｗ", "so close", "the piano one", "😭",
+)
+
+
+@dataclass
+class LegacySongData:
+    """
+    SongData's answer checking as it was before the answers were prepared once per song, for comparison.
+    """
+    song_id: str
+    filename: str
+    title: str
+    alt_titles: list[str]
+    game_version: int
+    genre: str
+    artist: str
+    similarity_threshold = 85
+
+    def __post_init__(self) -> None:
+        alt_titles = list(filter(lambda a: len(a) != 0, self.alt_titles))
+        correct_answers = set(map(lambda s: s.lower(), (self.title, *alt_titles)))
+        self.correct_answers = correct_answers
+        self.version = VersionHelper.get_game_version_from_song_id(self.song_id)
+
+    @classmethod
+    def from_props(cls, props: dict) -> "LegacySongData":
+        return cls(
+            song_id=props["song_id"],
+            filename=props["filename"],
+            title=props["title"],
+            alt_titles=props["alt_titles"].split(", "),
+            game_version=props["game_version"],
+            genre=props["genre"],
+            artist=props["artist"],
+        )
+
+    def is_correct_answer(self, answer: str) -> bool:
+        if answer.lower() in self.correct_answers:
+            return True
+        normalized_answer = LegacySongData._normalize_text(answer)
+        for correct_answer in self.correct_answers:
+            normalized_correct_answer = LegacySongData._normalize_text(correct_answer)
+            score = fuzz.token_sort_ratio(normalized_correct_answer, normalized_answer)
+            if len(normalized_correct_answer) > 0 and len(normalized_answer) > 0 and score >= self.similarity_threshold:
+                return True
+        return False
+
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        return ''.join(e.lower() for e in text if e.isalnum())
+
+
+def _catalog(songs: int, seed: int) -> list[dict]:
+    catalog = StubHardBrainApi(catalog_size=songs, seed=seed).songs
+    for index, (title, alt_titles) in enumerate(EXTRA_TITLES):
+        catalog.append({
+            "song_id": f"31{900 + index}", "filename": "", "title": title, "alt_titles": alt_titles,
+            "game_version": 31, "genre": "GENRE", "artist": "Artist",
+        })
+    return catalog
+
+
+def _typo(text: str, rng: random.Random) -> str:
+    if len(text) < 2:
+        return text + rng.choice(string.ascii_lowercase)
+    index = rng.randrange(len(text))
+    edit = rng.randrange(3)
+    if edit == 0:
+        return text[:index] + text[index + 1:]
+    if edit == 1:
+        return text[:index] + rng.choice(string.ascii_lowercase) + text[index + 1:]
+    return text[:index] + rng.choice(string.ascii_lowercase) + text[index:]
+
+
+def _chat_message(props: dict, rng: random.Random) -> str:
+    """
+    A message a player might send while the song is playing, aimed at it or not.
+    """
+    answers = [props["title"], *filter(None, props["alt_titles"].split(", "))]
+    answer = rng.choice(answers)
+    kind = rng.random()
+    if kind < 0.1:
+        return answer
+    if kind < 0.2:
+        return answer.upper() + "!!"
+    if kind < 0.4:
+        return _typo(_typo(answer, rng), rng) if rng.random() < 0.3 else _typo(answer, rng)
+    if kind < 0.5:
+        words = answer.split()
+        rng.shuffle(words)
+        return " ".join(words)
+    if kind < 0.6:
+        words = answer.split()
+        return " ".join(words[:-1]) if len(words) > 1 else answer[:max(1, len(answer) // 2)]
+    if kind < 0.75:
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+    return rng.choice(CHATTER)
+
+
+def run(mode: str, rounds: list[tuple[SongData | LegacySongData, list[str]]], repeat: int) -> tuple[str, list[bool]]:
+    answers = sum(len(messages) for _, messages in rounds)
+    times = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for song, messages in rounds:
+            for message in messages:
+                song.is_correct_answer(message)
+        times.append(time.perf_counter() - started_at)
+    verdicts = [song.is_correct_answer(message) for song, messages in rounds for message in messages]
+    best = min(times)
+    return (f"[{mode}] {best / answers * 1e6:.2f} µs per answer ({answers / best:,.0f} answers/s), "
+            f"{sum(verdicts)} of {answers} accepted"), verdicts
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    catalog = _catalog(args.songs, args.seed)
+    messages = [[_chat_message(props, rng) for _ in range(args.messages)] for props in catalog]
+    legacy_verdicts = None
+    for mode in ("thefuzz-loop", "prepared"):
+        song_type = LegacySongData if mode == "thefuzz-loop" else SongData
+        rounds = [(song_type.from_props(props), song_messages) for props, song_messages in zip(catalog, messages)]
+        result, verdicts = run(mode, rounds, args.repeat)
+        print(result)
+        if legacy_verdicts is None:
+            legacy_verdicts = verdicts
+        else:
+            mismatches = sum(old != new for old, new in zip(legacy_verdicts, verdicts))
+            print(f"{mismatches} answers judged differently from the thefuzz loop")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest.benchmarks.answer_matching", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=200, help="songs from the stub API's catalog")
+    parser.add_argument("--messages", type=int, default=50, help="chat messages per song")
+    parser.add_argument("--repeat", type=int, default=5, help="times to check every message, the fastest is shown")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
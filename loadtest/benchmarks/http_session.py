@@ -0,0 +1,87 @@
+"""
+Measures Hard Brain API request latency against the stub API when every request opens its own `ClientSession`, as
+the bot used to, compared with reusing `HardBrainService`'s shared, pooled session.
+
+    python -m loadtest.benchmarks.http_session --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from aiohttp import ClientSession
+
+from hard_brain_bot.services.audio_cache import AudioCache
+from hard_brain_bot.services.hard_brain_service import HardBrainService
+from hard_brain_bot.utils import http_requests
+from loadtest.stats import format_percentiles
+from loadtest.stub_api import StubHardBrainApi
+
+Request = Callable[[ClientSession], Awaitable]
+
+
+def _requests(service: HardBrainService, songs: list[dict], count: int, audio_every: int) -> list[Request]:
+    """
+    A mix of question requests with an audio download every `audio_every` requests, like a game fetching its
+    questions and then each round's clip.
+    """
+    requests = []
+    for index in range(count):
+        if index % audio_every == 0:
+            url = f"{service.url}/audio/{songs[index % len(songs)]['song_id']}"
+            requests.append(lambda session, url=url: http_requests.request_bytes("GET", url, session))
+        else:
+            requests.append(lambda session: http_requests.request_json(
+                "GET", f"{service.url}/question", session, params={"number_of_songs": 5},
+            ))
+    return requests
+
+
+async def run(mode: str, api: StubHardBrainApi, count: int, concurrency: int, audio_every: int) -> str:
+    service = HardBrainService(hostname=api.host, port=api.port, audio_cache=AudioCache())
+    requests = _requests(service, api.songs, count, audio_every)
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(request: Request) -> None:
+        async with semaphore:
+            started_at = time.perf_counter()
+            if mode == "per-request":
+                async with ClientSession() as session:
+                    await request(session)
+            else:
+                await request(service.session)
+            latencies.append(time.perf_counter() - started_at)
+
+    await service.start()
+    try:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(timed(request) for request in requests))
+        elapsed = time.perf_counter() - started_at
+    finally:
+        await service.close()
+    return "\n".join([
+        f"[{mode}] {count} requests, {concurrency} at a time, in {elapsed:.2f} s ({count / elapsed:.0f} requests/s)",
+        f"  latency: {format_percentiles(latencies)}",
+    ])
+
+
+async def main(args: argparse.Namespace) -> None:
+    api = StubHardBrainApi(latency=args.api_latency, audio_seconds=args.audio_seconds)
+    await api.start()
+    try:
+        for mode in ("per-request", "shared"):
+            print(await run(mode, api, args.requests, args.concurrency, args.audio_every))
+    finally:
+        await api.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest.benchmarks.http_session", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--audio-every", type=int, default=10, help="one in this many requests downloads audio")
+    parser.add_argument("--audio-seconds", type=float, default=1.0, help="length of the audio clips served")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="seconds the stub API waits per request")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,128 @@
+"""
+Feeds a synthetic gateway message stream from thousands of guilds, a few of them playing quizzes, through the quiz
+cog's `on_message` listener and measures the cost per message. Compares the channel index with looking games up by
+guild and leaving the quiz to check the channel, as the cog used to, and with scanning every game for the channel.
+
+    python -m loadtest.benchmarks.message_dispatch --guilds 10000 --games 500 --messages 200000
+"""
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from hard_brain_bot.client import HardBrain
+from hard_brain_bot.cogs.quiz_commands import QuizCommands
+from hard_brain_bot.data_models.game import Game
+
+
+class CountingQuizService:
+    def __init__(self, text_channel: SimpleNamespace):
+        """
+        Stands in for a game's `QuizService`, counting the answers passed to it.
+        """
+        self.text_channel = text_channel
+        self.answers = 0
+
+    async def queue_answer_to_check(self, ctx) -> None:
+        if ctx.channel.id != self.text_channel.id:
+            return
+        self.answers += 1
+
+
+async def _guild_lookup(cog: QuizCommands, ctx) -> None:
+    """
+    `on_message` as it was before games were indexed by channel.
+    """
+    guild_id = ctx.guild.id
+    if (guild_id not in cog.games.keys()) or (ctx.author.id == cog.bot.user.id):
+        return
+    game = cog.games[guild_id]
+    await game.quiz_service.queue_answer_to_check(ctx)
+
+
+async def _linear_scan(cog: QuizCommands, ctx) -> None:
+    if ctx.author.bot:
+        return
+    for game in cog.games.values():
+        if game.quiz_service.text_channel.id == ctx.channel.id:
+            await game.quiz_service.queue_answer_to_check(ctx)
+            return
+
+
+def _generate_stream(guilds: int, games: int, messages: int, quiz_share: float, bot_share: float, seed: int):
+    """
+    Generates the games, one per guild with its own quiz thread, and a stream of messages in which `quiz_share` of
+    messages are sent in quiz threads, and the rest are spread across every guild's other channels.
+    """
+    rng = random.Random(seed)
+    bot_user = SimpleNamespace(id=1, bot=True)
+    guild_list = [SimpleNamespace(id=1000 + index) for index in range(guilds)]
+    channels = [[SimpleNamespace(id=guild.id * 100 + index) for index in range(5)] for guild in guild_list]
+    quiz_threads = {}
+    for index in rng.sample(range(guilds), games):
+        quiz_threads[guild_list[index].id] = SimpleNamespace(id=guild_list[index].id * 100 + 99)
+    game_guilds = [guild for guild in guild_list if guild.id in quiz_threads]
+    users = [SimpleNamespace(id=10_000 + index, bot=False) for index in range(1000)]
+
+    stream = []
+    for _ in range(messages):
+        if rng.random() < quiz_share:
+            guild = rng.choice(game_guilds)
+            channel = quiz_threads[guild.id]
+        else:
+            index = rng.randrange(guilds)
+            guild = guild_list[index]
+            channel = rng.choice(channels[index])
+        author = bot_user if rng.random() < bot_share else rng.choice(users)
+        stream.append(SimpleNamespace(content="answer", guild=guild, channel=channel, author=author))
+    return bot_user, quiz_threads, stream
+
+
+async def run(args: argparse.Namespace) -> str:
+    bot_user, quiz_threads, stream = _generate_stream(
+        args.guilds, args.games, args.messages, args.quiz_share, args.bot_share, args.seed,
+    )
+    bot = HardBrain()
+    bot._connection.user = bot_user
+    cog = QuizCommands(bot)
+    quiz_services = []
+    for guild_id, thread in quiz_threads.items():
+        quiz_service = CountingQuizService(thread)
+        quiz_services.append(quiz_service)
+        game = Game(quiz_service, thread)
+        cog.games[guild_id] = game
+        cog.games_by_channel[thread.id] = game
+
+    lines = [f"{args.messages} messages from {args.guilds} guilds, {args.games} of them playing a quiz"]
+    try:
+        handlers = {
+            "linear-scan": lambda ctx: _linear_scan(cog, ctx),
+            "guild-lookup": lambda ctx: _guild_lookup(cog, ctx),
+            "channel-index": cog.on_message,
+        }
+        for mode, handler in handlers.items():
+            for quiz_service in quiz_services:
+                quiz_service.answers = 0
+            started_at = time.perf_counter()
+            for ctx in stream:
+                await handler(ctx)
+            elapsed = time.perf_counter() - started_at
+            answers = sum(quiz_service.answers for quiz_service in quiz_services)
+            lines.append(f"[{mode}] {elapsed:.2f} s, {elapsed / args.messages * 1e9:.0f} ns per message "
+                         f"({args.messages / elapsed:,.0f} messages/s), {answers} answers passed to games")
+    finally:
+        cog.cog_unload()
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest.benchmarks.message_dispatch", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", type=int, default=10_000)
+    parser.add_argument("--games", type=int, default=500, help="guilds playing a quiz")
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--quiz-share", type=float, default=0.02, help="share of messages sent in quiz threads")
+    parser.add_argument("--bot-share", type=float, default=0.05, help="share of messages sent by the bot")
+    parser.add_argument("--seed", type=int, default=0)
+    print(asyncio.run(run(parser.parse_args())))
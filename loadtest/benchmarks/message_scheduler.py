@@ -0,0 +1,121 @@
+"""
+Simulates quiz message traffic against a fake Discord REST API which enforces per-webhook and per-channel rate
+limits, sending either directly or through `MessageScheduler`, and reports how many requests were rate limited.
+
+    python -m loadtest.benchmarks.message_scheduler --destinations 20 --rounds 5
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import aiohttp
+from disnake import Embed, Webhook
+from disnake.http import Route
+
+from hard_brain_bot.services.message_scheduler import MessagePriority, MessageScheduler
+from loadtest.fake_discord import FakeDiscordRest, RestThread
+from loadtest.stats import format_percentiles
+
+
+async def _send_direct(destination, content=None, embed=None, priority=MessagePriority.NORMAL):
+    if embed:
+        await destination.send(content=content, embeds=[embed])
+    else:
+        await destination.send(content)
+
+
+async def _run_destination(destination, send, rounds: int, burst: int, round_interval: float, seed: int,
+                           latencies: list[float]) -> None:
+    """
+    Sends one game's messages: a start message, then per round a start message, a burst of embeds (e.g. several
+    rounds ending in quick succession after skips) and the end of round embed, then the final scores.
+    """
+    rng = random.Random(seed)
+
+    async def timed(*args, **kwargs):
+        started_at = time.perf_counter()
+        await send(destination, *args, **kwargs)
+        latencies.append(time.perf_counter() - started_at)
+
+    await timed("Quiz starting!")
+    background = []
+    for index in range(rounds):
+        await timed(f"Round {index + 1}", priority=MessagePriority.HIGH)
+        for _ in range(burst):
+            embed = Embed(title="Someone got the correct answer!", description="x" * rng.randint(50, 300))
+            background.append(asyncio.create_task(timed(embed=embed)))
+        await asyncio.sleep(rng.uniform(0, round_interval))
+    await asyncio.gather(*background)
+    await timed(embed=Embed(title="Game ending. Thank you for playing!"))
+
+
+async def run(mode: str, destinations: int, rounds: int, burst: int, round_interval: float) -> str:
+    rest = FakeDiscordRest()
+    await rest.start()
+    base = Route.BASE
+    Route.BASE = rest.url
+    latencies: list[float] = []
+    try:
+        async with aiohttp.ClientSession() as session:
+            targets = [
+                Webhook.partial(1000 + index, "token", session=session) if index % 2 == 0
+                else RestThread(2000 + index, session, rest.url)
+                for index in range(destinations)
+            ]
+            scheduler = MessageScheduler()
+            send = _send_direct if mode == "direct" else scheduler.send
+            started_at = time.perf_counter()
+            await asyncio.gather(*(
+                _run_destination(target, send, rounds, burst, round_interval, index, latencies)
+                for index, target in enumerate(targets)
+            ))
+            elapsed = time.perf_counter() - started_at
+    finally:
+        Route.BASE = base
+        await rest.close()
+    return "\n".join([
+        f"[{mode}] {len(latencies)} messages to {destinations} destinations in {elapsed:.1f} s",
+        f"  REST requests: {rest.requests}, rate limited (429): {rest.rate_limited}, embeds delivered: {rest.embeds}",
+        f"  send latency: {format_percentiles(latencies)}",
+    ])
+
+
+async def sequential(count: int) -> str:
+    """
+    Awaits `count` sends to one thread one after another, which should be paced by the channel rate limit rather
+    than each getting a fresh bucket.
+    """
+    rest = FakeDiscordRest()
+    await rest.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            thread = RestThread(1, session, rest.url)
+            scheduler = MessageScheduler()
+            started_at = time.perf_counter()
+            for index in range(count):
+                await scheduler.send(thread, f"message {index}")
+            elapsed = time.perf_counter() - started_at
+    finally:
+        await rest.close()
+    rate, per = MessageScheduler.CHANNEL_RATE_LIMIT
+    expected = max(0.0, count - rate) * per / rate
+    return (f"[sequential] {count} awaited sends to one thread took {elapsed:.1f} s (limit allows it in "
+            f"{expected:.1f} s), rate limited (429): {rest.rate_limited}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(await sequential(args.sequential))
+    for mode in ("direct", "scheduler"):
+        print(await run(mode, args.destinations, args.rounds, args.burst, args.round_interval))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest.benchmarks.message_scheduler", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--destinations", type=int, default=20, help="webhooks and threads, half of each")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--burst", type=int, default=3, help="embeds sent at once per round")
+    parser.add_argument("--round-interval", type=float, default=1.0, help="maximum seconds between rounds")
+    parser.add_argument("--sequential", type=int, default=10, help="awaited sends to one thread in a row")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,121 @@
+"""
+Measures the CPU time spent getting each round's audio ready and reading it out as the voice client would, when every
+round is encoded by ffmpeg as it plays, compared with Opus passthrough, where each song is transcoded once, cached
+and then played without an encoder. CPU time includes the ffmpeg processes.
+
+    python -m loadtest.benchmarks.opus_passthrough --rounds 100 --songs 20
+"""
+import argparse
+import asyncio
+import random
+import resource
+import shutil
+import sys
+import time
+
+from loguru import logger
+
+from hard_brain_bot.services import hard_brain_service
+from hard_brain_bot.services.audio_cache import AudioCache
+from hard_brain_bot.services.hard_brain_service import HardBrainService
+from hard_brain_bot.services.quiz_service import QuizService
+from loadtest.fakes import (
+    FakeGuild, FakeInteraction, FakeMember, FakeThread, FakeVoiceChannel, FakeVoiceState, PcmPassthroughEncoder,
+    fake_transcode_to_opus,
+)
+from loadtest.stats import format_percentiles
+from loadtest.stub_api import StubHardBrainApi
+
+
+def _cpu_time() -> float:
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def _drain(source) -> int:
+    """
+    Reads a source to the end, 20 ms frame by frame, like the voice client's player thread.
+    """
+    frames = 0
+    try:
+        while source.read():
+            frames += 1
+    finally:
+        source.cleanup()
+    return frames
+
+
+def _create_quiz(backend: HardBrainService, songs: list[dict]) -> QuizService:
+    guild = FakeGuild()
+    voice_channel = FakeVoiceChannel(guild, "voice", realtime_audio=False)
+    thread = FakeThread("quiz")
+    ctx = FakeInteraction(FakeMember("host", voice=FakeVoiceState(voice_channel)), guild, thread)
+    return QuizService(ctx, thread, backend, song_data_list=songs)
+
+
+async def run(mode: str, api: StubHardBrainApi, rounds: int, songs: int, seed: int) -> str:
+    backend = HardBrainService(
+        hostname=api.host, port=api.port, audio_cache=AudioCache(),
+        opus_cache=AudioCache() if mode == "passthrough" else None, stream_audio=False,
+    )
+    # games draw from the same catalog, so songs come up again across rounds
+    rng = random.Random(seed)
+    song_data_list = [rng.choice(api.songs[:songs]) for _ in range(rounds)]
+    quiz = _create_quiz(backend, song_data_list)
+    # fetch every song's raw audio first, so only the work that differs between the modes is measured
+    for song in api.songs[:songs]:
+        await backend.get_audio(song["song_id"])
+
+    round_cpu_times = []
+    frames = 0
+    started_at = time.perf_counter()
+    cpu_started_at = _cpu_time()
+    try:
+        for song in quiz.song_data_list:
+            round_started_at = _cpu_time()
+            audio = await quiz._download_audio(song.song_id)
+            frames += await asyncio.to_thread(_drain, quiz._create_audio_source(audio))
+            round_cpu_times.append(_cpu_time() - round_started_at)
+    finally:
+        await backend.close()
+    cpu_time = _cpu_time() - cpu_started_at
+    elapsed = time.perf_counter() - started_at
+    return "\n".join([
+        f"[{mode}] {rounds} rounds of {songs} songs ({frames} frames) in {elapsed:.2f} s",
+        f"  CPU: {cpu_time:.2f} s, {cpu_time / rounds * 1000:.1f} ms per round",
+        f"  CPU per round: {format_percentiles(round_cpu_times)}",
+    ])
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.no_ffmpeg or shutil.which("ffmpeg") is None:
+        logger.warning("Running without ffmpeg, so only the bot's own overhead is measured, not encoding")
+        QuizService._create_encoder = lambda service, source: PcmPassthroughEncoder(source)
+
+        async def transcode_to_opus(audio: bytes, bitrate: int = 128, executable: str = "ffmpeg") -> bytes:
+            return fake_transcode_to_opus(audio, bitrate, executable)
+
+        hard_brain_service.transcode_to_opus = transcode_to_opus
+    api = StubHardBrainApi(catalog_size=args.songs, latency=0, audio_seconds=args.audio_seconds, seed=args.seed)
+    await api.start()
+    try:
+        for mode in ("encode", "passthrough"):
+            print(await run(mode, api, args.rounds, args.songs, args.seed))
+    finally:
+        await api.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest.benchmarks.opus_passthrough", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--songs", type=int, default=20, help="distinct songs the rounds are drawn from")
+    parser.add_argument("--audio-seconds", type=float, default=10.0, help="length of the audio clips")
+    parser.add_argument("--no-ffmpeg", action="store_true", help="don't encode audio, even if ffmpeg is installed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    asyncio.run(main(args))
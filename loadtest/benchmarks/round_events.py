@@ -0,0 +1,177 @@
+"""
+Runs many simulated games at once and counts how often the event loop wakes up, and how long it takes from a
+correct answer being sent to it being judged. Compares polling the voice client every 50 ms for the end of playback
+and checking each answer after a 100 ms sleep, as the bot used to, with waiting on playback events and the batched
+`AnswerQueue`.
+
+    python -m loadtest.benchmarks.round_events --games 50 --rounds 3
+"""
+import argparse
+import asyncio
+import random
+import selectors
+import string
+import threading
+import time
+from collections import namedtuple
+
+from hard_brain_bot.data_models.requests import SongData
+from hard_brain_bot.utils.async_helpers import AnswerQueue
+from loadtest.stats import format_percentiles
+
+
+class CountingSelector(selectors.DefaultSelector):
+    """
+    Counts how many times the event loop waits for I/O, i.e. how many times it wakes up.
+    """
+    def __init__(self):
+        super().__init__()
+        self.wakeups = 0
+
+    def select(self, timeout=None):
+        self.wakeups += 1
+        return super().select(timeout)
+
+
+class LegacyAnswerQueue:
+    """
+    The answer queue as it was before answers were batched, for comparison.
+    """
+    Input = namedtuple("Input", "current_song answer")
+
+    def __init__(self):
+        self._queue = asyncio.Queue(1)
+
+    async def queue_answer(self, current_song: SongData, answer: str):
+        await self._queue.put(LegacyAnswerQueue.Input(current_song, answer))
+
+    async def check_answer_fifo(self):
+        await asyncio.sleep(0.1)
+        if self._queue.empty():
+            return False
+        answer_input = await self._queue.get()
+        return answer_input.current_song.is_correct_answer(answer_input.answer)
+
+
+class FakePlayer:
+    def __init__(self, clip_seconds: float):
+        """
+        Plays a clip on a background thread like the voice client, calling `after` on that thread when it ends.
+        """
+        self._clip_seconds = clip_seconds
+        self._playing = False
+
+    def is_playing(self) -> bool:
+        return self._playing
+
+    def play(self, after) -> None:
+        self._playing = True
+
+        def finish():
+            self._playing = False
+            after(None)
+
+        threading.Timer(self._clip_seconds, finish).start()
+
+
+async def _run_game(mode: str, songs: list[SongData], rounds: int, clip_seconds: float, answer_rate: float,
+                    seed: int, verdict_latencies: list[float]) -> None:
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    correct_sent_at: dict[SongData, float] = {}
+    handlers: set[asyncio.Task] = set()
+
+    async def on_correct_answer(current_song: SongData, sender) -> None:
+        if current_song in correct_sent_at:
+            verdict_latencies.append(time.perf_counter() - correct_sent_at.pop(current_song))
+
+    answer_queue = AnswerQueue(on_correct_answer)
+    legacy_answer_queue = LegacyAnswerQueue()
+
+    async def on_message(song: SongData, content: str) -> None:
+        if mode == "event":
+            answer_queue.queue_answer(song, content, time.time())
+        else:
+            await legacy_answer_queue.queue_answer(song, content)
+            if await legacy_answer_queue.check_answer_fifo():
+                await on_correct_answer(song, None)
+
+    async def send_answers(song: SongData) -> None:
+        correct_at = time.perf_counter() + rng.uniform(0, clip_seconds * 0.8)
+        while True:
+            await asyncio.sleep(rng.expovariate(answer_rate))
+            if song not in correct_sent_at and correct_at <= time.perf_counter():
+                correct_sent_at[song] = time.perf_counter()
+                content = song.title
+                correct_at = float("inf")
+            else:
+                content = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 20)))
+            # disnake dispatches each message to its listeners in a new task
+            task = asyncio.create_task(on_message(song, content))
+            handlers.add(task)
+            task.add_done_callback(handlers.discard)
+
+    player = FakePlayer(clip_seconds)
+    for index in range(rounds):
+        song = songs[(seed + index) % len(songs)]
+        playback_finished = asyncio.Event()
+        player.play(after=lambda error: loop.call_soon_threadsafe(playback_finished.set))
+        answers = asyncio.create_task(send_answers(song))
+        if mode == "event":
+            await playback_finished.wait()
+        else:
+            while player.is_playing():
+                await asyncio.sleep(0.05)
+        answers.cancel()
+        correct_sent_at.pop(song, None)
+    answer_queue.close()
+    for task in list(handlers):
+        task.cancel()
+
+
+def run(mode: str, games: int, rounds: int, clip_seconds: float, answer_rate: float) -> str:
+    songs = [
+        SongData.from_props({
+            "song_id": f"01{index:03d}", "filename": "", "title": f"Benchmark song number {index}",
+            "alt_titles": "", "game_version": 1, "genre": "GENRE", "artist": "Artist",
+        })
+        for index in range(games + rounds)
+    ]
+    selector = CountingSelector()
+    loop = asyncio.SelectorEventLoop(selector)
+    verdict_latencies: list[float] = []
+    started_at = time.perf_counter()
+    cpu_started_at = time.process_time()
+
+    async def run_games():
+        await asyncio.gather(*(
+            _run_game(mode, songs, rounds, clip_seconds, answer_rate, index, verdict_latencies)
+            for index in range(games)
+        ))
+
+    try:
+        loop.run_until_complete(run_games())
+    finally:
+        loop.close()
+    elapsed = time.perf_counter() - started_at
+    cpu_time = time.process_time() - cpu_started_at
+    return "\n".join([
+        f"[{mode}] {games} games of {rounds} rounds in {elapsed:.1f} s, CPU {cpu_time:.2f} s",
+        f"  event loop wakeups: {selector.wakeups} ({selector.wakeups / elapsed:.0f}/s)",
+        f"  answer to verdict: {format_percentiles(verdict_latencies)}",
+    ])
+
+
+def main(args: argparse.Namespace) -> None:
+    for mode in ("poll", "event"):
+        print(run(mode, args.games, args.rounds, args.clip_seconds, args.answer_rate))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest.benchmarks.round_events", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--clip-seconds", type=float, default=2.0, help="how long each round's audio plays")
+    parser.add_argument("--answer-rate", type=float, default=2.0, help="answers per second per game")
+    main(parser.parse_args())
@@ -0,0 +1,124 @@
+"""
+Runs the load test with games spread across several shards, then takes one shard's gateway down part way through,
+so that no messages arrive from its guilds, and checks that the shards are isolated from each other: the disconnect
+is reported with exactly that shard's games, the other shards' games carry on as before, and each game's log lines
+are attributed to its own shard.
+
+    python -m loadtest.benchmarks.shards --shards 4 --games 20 --rounds 4
+"""
+import argparse
+import asyncio
+import re
+import sys
+
+from loguru import logger
+
+from hard_brain_bot.client import add_shard_to_log_record
+from loadtest.fakes import FakeThread, FakeMember
+from loadtest.harness import GameStats, LoadTest, LoadTestOptions
+
+
+class ShardOutageLoadTest(LoadTest):
+    GAME_LOG_PATTERN = re.compile(r"(?:Starting new|Ending) game with \d+ questions in voice-(\d+)")
+
+    def __init__(self, options: LoadTestOptions, outage_shard: int, outage_start: float, outage_seconds: float):
+        """
+        A load test in which one shard stops receiving messages for `outage_seconds`, `outage_start` seconds in.
+        """
+        super().__init__(options)
+        self.outage_shard = outage_shard
+        self.outage_start = outage_start
+        self.outage_seconds = outage_seconds
+        self.outage_active = False
+        self.messages_dropped = 0
+        self.games_on_shard_at_outage: set[int] = set()
+        self.games_in_progress_at_outage: set[int] = set()
+        self.disconnect_warnings: list[str] = []
+        self.game_log_shards: list[tuple[int, int | str]] = []
+
+    async def run(self) -> str:
+        sink = logger.add(self._on_log, level="DEBUG", format="{message}")
+        outage = asyncio.create_task(self._outage())
+        try:
+            report = await super().run()
+        finally:
+            outage.cancel()
+            logger.remove(sink)
+        return report + "\n" + "\n".join(self._isolation_report())
+
+    async def _outage(self) -> None:
+        await asyncio.sleep(self.outage_start)
+        stats_by_guild = {stats.guild_id: stats for stats in self.stats}
+        self.games_in_progress_at_outage = {
+            guild_id for guild_id in self.cog.games if stats_by_guild[guild_id].shard_id == self.outage_shard
+        }
+        self.games_on_shard_at_outage = set(self.cog.get_games_on_shard(self.outage_shard))
+        self.outage_active = True
+        await self.cog.on_shard_disconnect(self.outage_shard)
+        await asyncio.sleep(self.outage_seconds)
+        self.outage_active = False
+
+    async def _send_message(self, content: str, channel: FakeThread, players: list[FakeMember], stats: GameStats):
+        if self.outage_active and stats.shard_id == self.outage_shard:
+            self.messages_dropped += 1
+            return
+        await super()._send_message(content, channel, players, stats)
+
+    def _on_log(self, message) -> None:
+        record = message.record
+        if record["message"].startswith(f"Shard {self.outage_shard} disconnected"):
+            self.disconnect_warnings.append(record["message"])
+        elif match := ShardOutageLoadTest.GAME_LOG_PATTERN.match(record["message"]):
+            self.game_log_shards.append((int(match.group(1)), record["extra"]["shard"]))
+
+    def _isolation_report(self) -> list[str]:
+        expected_warning = f"Shard {self.outage_shard} disconnected with {len(self.games_in_progress_at_outage)} " \
+                           f"game(s) in progress"
+        misattributed = [
+            (index, shard) for index, shard in self.game_log_shards if shard != index % self.options.shards
+        ]
+        return [
+            f"Outage: shard {self.outage_shard} for {self.outage_seconds:.1f} s, {self.messages_dropped} messages lost",
+            f"  games on shard {self.outage_shard} found: {len(self.games_on_shard_at_outage)}, "
+            f"expected {len(self.games_in_progress_at_outage)}, "
+            f"{'match' if self.games_on_shard_at_outage == self.games_in_progress_at_outage else 'MISMATCH'}",
+            f"  disconnect warnings: {self.disconnect_warnings or 'none'}"
+            + ("" if self.disconnect_warnings == [expected_warning] else f", expected ['{expected_warning}']"),
+            f"Game log lines: {len(self.game_log_shards)}, {len(misattributed)} attributed to the wrong shard"
+            + (f": {misattributed[:5]}" if misattributed else ""),
+        ]
+
+
+async def main(args: argparse.Namespace) -> None:
+    options = LoadTestOptions(
+        games=args.games,
+        rounds=args.rounds,
+        time_limit=args.time_limit,
+        realtime_audio=not args.fast_audio,
+        audio_seconds=args.audio_seconds,
+        ramp_interval=0.01,
+        shards=args.shards,
+    )
+    load_test = ShardOutageLoadTest(options, args.outage_shard, args.outage_start, args.outage_seconds)
+    print(await load_test.run())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest.benchmarks.shards", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--time-limit", type=float, default=10.0, help="round time limit in seconds")
+    parser.add_argument("--audio-seconds", type=float, default=10.0, help="length of the stub API's audio clips")
+    parser.add_argument("--fast-audio", action="store_true", help="play audio as fast as possible, not in real time")
+    parser.add_argument("--outage-shard", type=int, default=0)
+    parser.add_argument("--outage-start", type=float, default=5.0, help="seconds into the run the outage starts")
+    parser.add_argument("--outage-seconds", type=float, default=10.0)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.configure(patcher=add_shard_to_log_record)
+    logger.add(sys.stderr, level=args.log_level)
+    asyncio.run(main(args))
@@ -0,0 +1,87 @@
+"""
+Times building the end of round embeds for games of 100 rounds, copying each song's cached base embed as
+`embed_song_data` does, against building every embed from scratch as it used to. `Embed.copy()` goes through
+`to_dict()` and `from_dict()`, so it isn't free. Also times serializing each embed for sending, as a webhook does.
+
+    python -m loadtest.benchmarks.song_embeds --rounds 100 --songs 50 --repeat 200
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Callable
+
+from disnake import Asset, Embed
+
+from hard_brain_bot.data_models.requests import SongData
+from hard_brain_bot.message_templates import embeds
+from loadtest.stub_api import StubHardBrainApi
+
+
+def rebuild_song_embed(title: str, song_data: SongData, thumbnail: Asset | str | None = None) -> Embed:
+    """
+    `embed_song_data` as it was before the base embeds were cached, for comparison.
+    """
+    embed = Embed(
+        title=title,
+    )
+    if thumbnail:
+        embed.set_thumbnail(thumbnail)
+    embed.add_field(name="Song Title", value=song_data.title, inline=False)
+    embed.add_field(name="Song Artist", value=song_data.artist, inline=False)
+    embed.add_field(name="Genre", value=song_data.genre, inline=False)
+    if len(song_data.alt_titles) > 0 and len(song_data.alt_titles[0]) > 0:
+        titles = [f"`{title}`" for title in song_data.alt_titles]
+        embed.add_field(name="Alternate Titles", value=", ".join(titles), inline=False)
+    embed.add_field(name="Game Version", value=song_data.version, inline=False)
+    return embed
+
+
+def _time_game(build: Callable, rounds: list[tuple[SongData, str | None]], serialize: bool) -> float:
+    started_at = time.perf_counter()
+    for song, winner in rounds:
+        title = f"{winner or 'No one'} got the correct answer{'' if winner else '...'}"
+        thumbnail = f"https://cdn.discordapp.com/avatars/{winner}.png" if winner else None
+        embed = build(title, song, thumbnail)
+        if serialize:
+            embed.to_dict()
+    return time.perf_counter() - started_at
+
+
+def run(mode: str, games: list[list[tuple[SongData, str | None]]], serialize: bool, cold: bool) -> str:
+    build = embeds.embed_song_data if mode == "cached-copy" else rebuild_song_embed
+    game_times = []
+    for rounds in games:
+        if cold:
+            embeds._song_embeds.clear()
+        game_times.append(_time_game(build, rounds, serialize))
+    median = statistics.median(game_times)
+    rounds = len(games[0])
+    label = f"{mode}{', cold cache' if cold else ''}{', with to_dict' if serialize else ''}"
+    return f"[{label}] {median * 1e6:.0f} µs per {rounds} round game, {median / rounds * 1e6:.1f} µs per embed"
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    songs = [SongData.from_props(props) for props in StubHardBrainApi(catalog_size=args.songs, seed=args.seed).songs]
+    games = [
+        [(rng.choice(songs), f"player{rng.randrange(5)}" if rng.random() < 0.8 else None) for _ in range(args.rounds)]
+        for _ in range(args.repeat)
+    ]
+    # warm up both ways of building embeds before timing either
+    for build in (rebuild_song_embed, embeds.embed_song_data):
+        _time_game(build, games[0], serialize=True)
+    for serialize in (False, True):
+        print(run("rebuild", games, serialize, cold=False))
+        print(run("cached-copy", games, serialize, cold=True))
+        print(run("cached-copy", games, serialize, cold=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest.benchmarks.song_embeds", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=100, help="rounds per game")
+    parser.add_argument("--songs", type=int, default=50, help="distinct songs the rounds are drawn from")
+    parser.add_argument("--repeat", type=int, default=200, help="games to time")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
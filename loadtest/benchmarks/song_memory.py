@@ -0,0 +1,92 @@
+"""
+Measures the memory held by the songs of many concurrent games with tracemalloc, building each game's songs from its
+own API response. Compares the slotted `SongData` shared between games through `SongData.from_props`, with interned
+genres and artists, against the plain dataclass every game used to build its own copies of.
+
+    python -m loadtest.benchmarks.song_memory --games 500 --rounds 10 --catalog-size 2000
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from dataclasses import dataclass
+
+from hard_brain_bot.data_models.requests import SongData
+from hard_brain_bot.utils.helpers import VersionHelper
+from loadtest.stub_api import StubHardBrainApi
+
+
+@dataclass
+class LegacySongData:
+    """
+    SongData as it was before it was slotted and shared, for comparison.
+    """
+    song_id: str
+    filename: str
+    title: str
+    alt_titles: list[str]
+    game_version: int
+    genre: str
+    artist: str
+    similarity_threshold = 85
+
+    def __post_init__(self) -> None:
+        alt_titles = list(filter(lambda a: len(a) != 0, self.alt_titles))
+        correct_answers = set(map(lambda s: s.lower(), (self.title, *alt_titles)))
+        self.correct_answers = correct_answers
+        self.version = VersionHelper.get_game_version_from_song_id(self.song_id)
+
+    @classmethod
+    def from_props(cls, props: dict) -> "LegacySongData":
+        return cls(
+            song_id=props["song_id"],
+            filename=props["filename"],
+            title=props["title"],
+            alt_titles=props["alt_titles"].split(", "),
+            game_version=props["game_version"],
+            genre=props["genre"],
+            artist=props["artist"],
+        )
+
+
+def _responses(catalog: list[dict], games: int, rounds: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [json.dumps(rng.sample(catalog, rounds)) for _ in range(games)]
+
+
+def run(mode: str, responses: list[str], rounds: int) -> str:
+    song_type = SongData if mode == "shared" else LegacySongData
+    SongData._instances.clear()
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    # each game parses its own question response, so nothing is shared unless SongData shares it
+    games = [[song_type.from_props(props) for props in json.loads(response)] for response in responses]
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    unique_songs = len({id(song) for songs in games for song in songs})
+    result = (f"[{mode}] {len(games)} games of {rounds} rounds, {unique_songs} song objects: "
+              f"{allocated / 1024:.0f} KiB, {allocated / unique_songs:.0f} bytes per song object, "
+              f"{allocated / len(games):.0f} bytes per game")
+    del games
+    SongData._instances.clear()
+    return result
+
+
+def main(args: argparse.Namespace) -> None:
+    catalog = StubHardBrainApi(catalog_size=args.catalog_size, seed=args.seed).songs
+    responses = _responses(catalog, args.games, args.rounds, args.seed)
+    for mode in ("per-game", "shared"):
+        print(run(mode, responses, args.rounds))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m loadtest.benchmarks.song_memory", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--catalog-size", type=int, default=2000, help="number of songs games draw from")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass
+
+import aiohttp
+import disnake
+from aiohttp import web
+from disnake import Embed
+from loguru import logger
+
+
+@dataclass
+class _RouteBucket:
+    limit: int
+    per: float
+    remaining: int
+    reset_at: float
+    requests: int = 0
+    rate_limited: int = 0
+    messages: int = 0
+    embeds: int = 0
+
+
+class FakeDiscordRest:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        webhook_rate_limit: tuple[int, float] = (5, 2.0),
+        channel_rate_limit: tuple[int, float] = (5, 5.0),
+    ):
+        """
+        A stand-in for Discord's REST API which accepts webhook executions and channel messages, and enforces a
+        rate limit bucket per webhook and per channel the way Discord does: each bucket allows `limit` requests per
+        window, and requests over the limit get a 429 response with `retry_after`.
+        :param host: Address to listen on.
+        :param port: Port to listen on. If 0, a free port is picked, see `port` once started.
+        :param webhook_rate_limit: Requests allowed per webhook, and the window in seconds.
+        :param channel_rate_limit: Requests allowed per channel, and the window in seconds.
+        """
+        self.host = host
+        self.port = port
+        self.webhook_rate_limit = webhook_rate_limit
+        self.channel_rate_limit = channel_rate_limit
+        self.buckets: dict[str, _RouteBucket] = {}
+        self._message_ids = itertools.count(1)
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/v10"
+
+    @property
+    def requests(self) -> int:
+        return sum(bucket.requests for bucket in self.buckets.values())
+
+    @property
+    def rate_limited(self) -> int:
+        return sum(bucket.rate_limited for bucket in self.buckets.values())
+
+    @property
+    def embeds(self) -> int:
+        return sum(bucket.embeds for bucket in self.buckets.values())
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/api/v10/webhooks/{webhook_id}/{token}", self._handle_webhook)
+        app.router.add_post("/api/v10/channels/{channel_id}/messages", self._handle_channel)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"Fake Discord REST API on {self.url}")
+
+    async def close(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_webhook(self, request: web.Request) -> web.Response:
+        return await self._handle(f"webhook:{request.match_info['webhook_id']}", self.webhook_rate_limit, request)
+
+    async def _handle_channel(self, request: web.Request) -> web.Response:
+        return await self._handle(f"channel:{request.match_info['channel_id']}", self.channel_rate_limit, request)
+
+    async def _handle(self, key: str, rate_limit: tuple[int, float], request: web.Request) -> web.Response:
+        now = time.monotonic()
+        limit, per = rate_limit
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = _RouteBucket(limit, per, limit, now + per)
+        if now >= bucket.reset_at:
+            bucket.remaining = limit
+            bucket.reset_at = now + per
+        bucket.requests += 1
+        reset_after = bucket.reset_at - now
+        # Discord's rate limit responses come through its proxy, which is how clients tell them from other 429s
+        headers = {"Via": "1.1 google", "X-RateLimit-Limit": str(limit), "X-RateLimit-Bucket": key}
+        if bucket.remaining == 0:
+            bucket.rate_limited += 1
+            headers.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": f"{reset_after:.3f}"})
+            return web.json_response(
+                {"message": "You are being rate limited.", "retry_after": reset_after, "global": False},
+                status=429,
+                headers=headers,
+            )
+        bucket.remaining -= 1
+        headers.update({
+            "X-RateLimit-Remaining": str(bucket.remaining),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+        })
+        payload = await request.json()
+        bucket.messages += 1
+        bucket.embeds += len(payload.get("embeds") or [])
+        if key.startswith("webhook:") and request.query.get("wait") not in ("1", "true"):
+            return web.Response(status=204, headers=headers)
+        return web.json_response({"id": str(next(self._message_ids))}, headers=headers)
+
+
+class RestThread(disnake.Thread):
+    def __init__(self, channel_id: int, session: aiohttp.ClientSession, api_url: str):
+        """
+        A thread which sends its messages to a `FakeDiscordRest` server, retrying rate limited requests like
+        disnake's HTTP client.
+        """
+        self.id = channel_id
+        self.name = f"thread-{channel_id}"
+        self._session = session
+        self._url = f"{api_url}/channels/{channel_id}/messages"
+
+    async def send(self, content: str | None = None, *, embed: Embed | None = None, embeds: list[Embed] = ()):
+        embeds = [embed] if embed else list(embeds)
+        payload = {"content": content, "embeds": [embed.to_dict() for embed in embeds]}
+        for _ in range(5):
+            async with self._session.post(self._url, json=payload) as response:
+                data = await response.json()
+                if response.status != 429:
+                    response.raise_for_status()
+                    return data
+            await asyncio.sleep(data["retry_after"])
+        raise disnake.HTTPException(response, data)
+
+    def __str__(self) -> str:
+        return self.name
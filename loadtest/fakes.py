@@ -0,0 +1,211 @@
+import io
+import itertools
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable
+
+import disnake
+from disnake import AudioSource, Embed
+
+_ids = itertools.count(1_000_000)
+
+
+def next_id() -> int:
+    return next(_ids)
+
+
+class FakeThread(disnake.Thread):
+    def __init__(self, name: str):
+        """
+        A stand-in for a Discord thread which records the messages sent to it instead of sending them.
+        """
+        self.id = next_id()
+        self.name = name
+        self.sent: list[tuple[float, str | None, list[Embed]]] = []
+        self.on_send: Callable[[float, str | None, list[Embed]], None] | None = None
+
+    async def send(self, content: str | None = None, *, embed: Embed | None = None, embeds: list[Embed] = ()):
+        sent_at = time.perf_counter()
+        embeds = [embed] if embed else list(embeds)
+        self.sent.append((sent_at, content, embeds))
+        if self.on_send:
+            self.on_send(sent_at, content, embeds)
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class FakeVoiceClient:
+    FRAME_DURATION = 0.02
+
+    def __init__(self, channel: "FakeVoiceChannel", realtime: bool = True):
+        """
+        A stand-in for a voice client which reads audio frames from the playing source in a player thread, like
+        disnake's, but discards them instead of sending them.
+        :param realtime: If True, frames are read every 20 ms like real playback, otherwise as fast as possible.
+        """
+        self.channel = channel
+        self.realtime = realtime
+        self.frames_played = 0
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def play(self, source: AudioSource, *, after: Callable[[Exception | None], None] | None = None) -> None:
+        if self.is_playing():
+            raise disnake.ClientException("Already playing audio.")
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._play, args=(source, self._stopped, after), daemon=True)
+        self._thread.start()
+
+    def _play(self, source: AudioSource, stopped: threading.Event, after) -> None:
+        error = None
+        next_frame_at = time.perf_counter()
+        first_frame = True
+        try:
+            while not stopped.is_set():
+                data = source.read()
+                if not data:
+                    break
+                if first_frame:
+                    self.channel.first_frame_times.append(time.perf_counter())
+                    first_frame = False
+                self.frames_played += 1
+                if self.realtime:
+                    next_frame_at += FakeVoiceClient.FRAME_DURATION
+                    stopped.wait(max(0.0, next_frame_at - time.perf_counter()))
+        except Exception as e:
+            error = e
+        self.channel.playback_end_times.append(time.perf_counter())
+        if after:
+            after(error)
+
+    def is_playing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stopped.is_set()
+
+    def is_connected(self) -> bool:
+        return self.channel.guild.voice_client is self
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    async def disconnect(self, *, force: bool = False) -> None:
+        self.stop()
+        self.channel.guild.voice_client = None
+
+
+class FakeVoiceChannel:
+    def __init__(self, guild: "FakeGuild", name: str, realtime_audio: bool = True):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.realtime_audio = realtime_audio
+        # perf_counter times at which each clip played in this channel had its first frame read, and stopped
+        self.first_frame_times: list[float] = []
+        self.playback_end_times: list[float] = []
+
+    async def connect(self) -> FakeVoiceClient:
+        if self.guild.voice_client:
+            raise disnake.ClientException("Already connected to a voice channel.")
+        voice_client = FakeVoiceClient(self, realtime=self.realtime_audio)
+        self.guild.voice_client = voice_client
+        return voice_client
+
+    def __str__(self) -> str:
+        return self.name
+
+
+@dataclass
+class FakeGuild:
+    id: int = field(default_factory=next_id)
+    name: str = "Load test guild"
+    shard_id: int = 0
+    voice_client: FakeVoiceClient | None = None
+
+
+@dataclass
+class FakeVoiceState:
+    channel: FakeVoiceChannel
+
+
+@dataclass
+class FakeMember:
+    display_name: str
+    voice: FakeVoiceState | None = None
+    id: int = field(default_factory=next_id)
+    bot: bool = False
+    display_avatar: None = None
+
+    @property
+    def name(self) -> str:
+        return self.display_name
+
+    def __str__(self) -> str:
+        return self.display_name
+
+
+@dataclass
+class FakeMessage:
+    content: str
+    channel: FakeThread
+    author: FakeMember
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class FakeResponse:
+    async def defer(self, *args, **kwargs) -> None:
+        pass
+
+    async def send_message(self, *args, **kwargs) -> None:
+        pass
+
+
+@dataclass
+class FakeInteraction:
+    author: FakeMember
+    guild: FakeGuild
+    channel: FakeThread
+    response: FakeResponse = field(default_factory=FakeResponse)
+    original_response: str | None = None
+
+    async def edit_original_response(self, content: str | None = None, **kwargs) -> None:
+        self.original_response = content
+
+
+class PcmPassthroughEncoder(AudioSource):
+    FRAME_SIZE = 3840
+
+    def __init__(self, source: io.IOBase):
+        """
+        Reads 20 ms PCM frames straight from a WAV stream, for running without ffmpeg installed. The output is not
+        Opus, but the fake voice clients don't care.
+        """
+        self.source = source
+
+    def read(self) -> bytes:
+        data = self.source.read(PcmPassthroughEncoder.FRAME_SIZE)
+        return data or b""
+
+    def is_opus(self) -> bool:
+        return False
+
+    def cleanup(self) -> None:
+        self.source.close()
+
+
+def fake_transcode_to_opus(audio: bytes, bitrate: int = 128, executable: str = "ffmpeg") -> bytes:
+    """
+    Stands in for `transcode_to_opus_sync` without ffmpeg, by wrapping one small packet per 20 ms of PCM audio in an
+    Ogg stream, after the OpusHead and OpusTags packets.
+    """
+    packet_size = bitrate * 1000 // 8 // 50
+    packets = [b"OpusHead" + bytes(11), b"OpusTags" + bytes(8)]
+    packets.extend(audio[i:i + packet_size] for i in range(0, len(audio), PcmPassthroughEncoder.FRAME_SIZE))
+    pages = []
+    for page_number, packet in enumerate(packets):
+        segments = bytes([255] * (len(packet) // 255) + [len(packet) % 255])
+        header = struct.pack("<BBQIIIB", 0, 0, page_number * 960, 1, page_number, 0, len(segments))
+        pages.append(b"OggS" + header + segments + packet)
+    return b"".join(pages)
@@ -0,0 +1,232 @@
+import asyncio
+import math
+import random
+import resource
+import shutil
+import string
+import time
+from dataclasses import dataclass, field
+
+from disnake import Embed
+from loguru import logger
+
+from hard_brain_bot.client import HardBrain
+from hard_brain_bot.cogs.quiz_commands import QuizCommands
+from hard_brain_bot.data_models.requests import SongData
+from hard_brain_bot.services.hard_brain_service import HardBrainService
+from hard_brain_bot.services import quiz_service
+from hard_brain_bot.services.quiz_service import QuizService
+from hard_brain_bot.utils import metrics
+from hard_brain_bot.utils.async_helpers import measure_loop_lag
+from loadtest.fakes import (
+    FakeGuild, FakeInteraction, FakeMember, FakeMessage, FakeThread, FakeVoiceChannel, FakeVoiceState,
+    PcmPassthroughEncoder, fake_transcode_to_opus,
+)
+from loadtest.stats import format_percentiles
+from loadtest.stub_api import StubHardBrainApi
+
+
+@dataclass
+class LoadTestOptions:
+    games: int = 10
+    rounds: int = 5
+    time_limit: float = 10.0
+    players: int = 5
+    wrong_answer_rate: float = 2.0
+    answer_delay: float = 3.0
+    correct_probability: float = 0.8
+    ramp_interval: float = 0.1
+    api_latency: float = 0.05
+    audio_seconds: float = 10.0
+    catalog_size: int = 2000
+    realtime_audio: bool = True
+    use_ffmpeg: bool | None = None
+    game_workers: int | None = None
+    shards: int = 1
+    seed: int = 0
+
+
+@dataclass
+class GameStats:
+    guild_id: int = 0
+    shard_id: int = 0
+    round_ends: list[float] = field(default_factory=list)
+    answer_latencies: list[float] = field(default_factory=list)
+    messages_sent: int = 0
+    correct_answer_sent_at: float | None = None
+
+    def on_send(self, sent_at: float, content: str | None, embeds: list[Embed]) -> None:
+        for embed in embeds:
+            if not embed.title or "got the correct answer" not in embed.title:
+                continue
+            self.round_ends.append(sent_at)
+            if not embed.title.startswith("No one") and self.correct_answer_sent_at is not None:
+                self.answer_latencies.append(sent_at - self.correct_answer_sent_at)
+            self.correct_answer_sent_at = None
+
+
+class LoadTest:
+    def __init__(self, options: LoadTestOptions):
+        """
+        Drives concurrent quizzes through `QuizCommands` and `QuizService` against a stub Hard Brain API, fake
+        Discord threads and voice clients, and simulated players, then reports how the bot coped.
+        """
+        self.options = options
+        self.random = random.Random(options.seed)
+        self.api = StubHardBrainApi(
+            catalog_size=options.catalog_size,
+            latency=options.api_latency,
+            audio_seconds=options.audio_seconds,
+            seed=options.seed,
+        )
+        self.cog: QuizCommands | None = None
+        self.stats: list[GameStats] = []
+        self.voice_channels: list[FakeVoiceChannel] = []
+        self.loop_lags: list[float] = []
+        self.errors = 0
+
+    async def run(self) -> str:
+        """
+        Runs the load test.
+        :return: The report.
+        """
+        await self.api.start()
+        bot = HardBrain()
+        bot.backend = HardBrainService(hostname=self.api.host, port=self.api.port)
+        if self.options.game_workers is not None:
+            QuizCommands.GAME_WORKERS = self.options.game_workers
+        use_ffmpeg = self.options.use_ffmpeg
+        if use_ffmpeg is None:
+            use_ffmpeg = shutil.which("ffmpeg") is not None
+        if not use_ffmpeg:
+            logger.warning("Running without ffmpeg, audio is passed through to the fake voice clients unencoded")
+            QuizService._create_encoder = lambda service, source: PcmPassthroughEncoder(source)
+            quiz_service.transcode_to_opus_sync = fake_transcode_to_opus
+        self.cog = QuizCommands(bot)
+        lag_task = asyncio.create_task(measure_loop_lag(0.1, self.loop_lags.append))
+        await self.cog.on_ready()
+
+        started_at = time.perf_counter()
+        cpu_started_at = time.process_time()
+        children_started_at = resource.getrusage(resource.RUSAGE_CHILDREN)
+        games = []
+        for index in range(self.options.games):
+            games.append(asyncio.create_task(self._run_game(index)))
+            await asyncio.sleep(self.options.ramp_interval)
+        await asyncio.gather(*games)
+        elapsed = time.perf_counter() - started_at
+        cpu_time = time.process_time() - cpu_started_at
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        children_cpu_time = children.ru_utime + children.ru_stime \
+            - children_started_at.ru_utime - children_started_at.ru_stime
+
+        lag_task.cancel()
+        self.cog.cog_unload()
+        await bot.backend.close()
+        await self.api.close()
+        return self._report(elapsed, cpu_time, children_cpu_time)
+
+    async def _run_game(self, index: int) -> None:
+        guild = FakeGuild(name=f"Load test guild {index}", shard_id=index % self.options.shards)
+        channel = FakeThread(f"quiz-{index}")
+        voice_channel = FakeVoiceChannel(guild, f"voice-{index}", realtime_audio=self.options.realtime_audio)
+        host = FakeMember(f"host-{index}", voice=FakeVoiceState(voice_channel))
+        ctx = FakeInteraction(host, guild, channel)
+        players = [FakeMember(f"player-{index}-{i}") for i in range(self.options.players)]
+        stats = GameStats(guild_id=guild.id, shard_id=guild.shard_id)
+        channel.on_send = stats.on_send
+        self.stats.append(stats)
+
+        answers = asyncio.create_task(self._send_answers(guild.id, channel, players, stats))
+        try:
+            # disnake runs this before invoking the command
+            await self.cog.cog_before_slash_command_invoke(ctx)
+            await QuizCommands.start_quiz.callback(
+                self.cog, ctx, rounds=self.options.rounds, time_limit=self.options.time_limit, versions=""
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Game {index} failed: {e!r}")
+        finally:
+            answers.cancel()
+        if ctx.original_response and ctx.original_response.startswith(("Error", "Network", "An unexpected")):
+            self.errors += 1
+            logger.error(f"Game {index} could not start: {ctx.original_response}")
+        self.voice_channels.append(voice_channel)
+
+    async def _send_answers(
+        self, guild_id: int, channel: FakeThread, players: list[FakeMember], stats: GameStats
+    ) -> None:
+        """
+        Simulates players answering: each round, wrong answers are sent at random intervals until someone sends
+        the correct answer after a random delay, or no one does.
+        """
+        current_song: SongData | None = None
+        correct_at = math.inf
+        while True:
+            game = self.cog.games.get(guild_id)
+            song = game.quiz_service._current_song if game else None
+            if song is None:
+                await asyncio.sleep(0.05)
+                continue
+            now = time.perf_counter()
+            if song is not current_song:
+                current_song = song
+                answer_is_sent = self.random.random() < self.options.correct_probability
+                correct_at = now + self.random.expovariate(1 / self.options.answer_delay) if answer_is_sent \
+                    else math.inf
+            if now >= correct_at:
+                correct_at = math.inf
+                stats.correct_answer_sent_at = time.perf_counter()
+                await self._send_message(song.title, channel, players, stats)
+            else:
+                wrong_answer = "".join(self.random.choices(string.ascii_lowercase, k=self.random.randint(3, 20)))
+                await self._send_message(wrong_answer, channel, players, stats)
+            await asyncio.sleep(min(self.random.expovariate(self.options.wrong_answer_rate), correct_at - now))
+
+    async def _send_message(self, content: str, channel: FakeThread, players: list[FakeMember], stats: GameStats):
+        stats.messages_sent += 1
+        await self.cog.on_message(FakeMessage(content, channel, self.random.choice(players)))
+
+    def _report(self, elapsed: float, cpu_time: float, children_cpu_time: float) -> str:
+        rounds = sum(len(stats.round_ends) for stats in self.stats)
+        messages = sum(stats.messages_sent for stats in self.stats)
+        answer_latencies = [latency for stats in self.stats for latency in stats.answer_latencies]
+        # the silence between one round's audio stopping and the next round's starting
+        transitions = [
+            first_frame - playback_end
+            for voice_channel in self.voice_channels
+            for playback_end, first_frame in zip(voice_channel.playback_end_times, voice_channel.first_frame_times[1:])
+        ]
+        first_audio = metrics.TIME_TO_FIRST_AUDIO.labels()
+        first_audio_count = sum(first_audio.counts)
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        lines = [
+            f"Games: {self.options.games} ({self.errors} failed) of {self.options.rounds} rounds in {elapsed:.1f} s",
+            f"Rounds: {rounds} ({rounds / elapsed:.2f}/s)",
+            f"Player messages: {messages} ({messages / elapsed:.1f}/s), "
+            f"{metrics.ANSWERS_DROPPED.labels().value:.0f} dropped",
+            f"Answer latency: {format_percentiles(answer_latencies)}",
+            f"Round transition latency: {format_percentiles(transitions)}",
+            "Time to first audio: " + (f"mean {first_audio.sum / first_audio_count * 1000:.1f} ms"
+                                       if first_audio_count else "n/a"),
+            f"Event loop lag: {format_percentiles(self.loop_lags)}",
+            f"CPU: {cpu_time / elapsed * 100:.1f}% of a core in the bot, "
+            f"{max(0.0, children_cpu_time) / elapsed * 100:.1f}% in child processes",
+            f"Peak memory: {peak_memory:.1f} MB",
+            f"Stub API requests: {self.api.requests}, {self.api.audio_bytes_served / 1024 / 1024:.1f} MB of audio",
+        ]
+        if self.options.shards > 1:
+            lines.extend(self._shard_report())
+        return "\n".join(lines)
+
+    def _shard_report(self) -> list[str]:
+        lines = []
+        for shard_id in range(self.options.shards):
+            shard_stats = [stats for stats in self.stats if stats.shard_id == shard_id]
+            rounds = sum(len(stats.round_ends) for stats in shard_stats)
+            answer_latencies = [latency for stats in shard_stats for latency in stats.answer_latencies]
+            lines.append(f"Shard {shard_id}: {len(shard_stats)} games, {rounds} rounds, "
+                         f"answer latency {format_percentiles(answer_latencies)}")
+        return lines
+
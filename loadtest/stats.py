@@ -0,0 +1,17 @@
+import math
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))]
+
+
+def format_percentiles(values: list[float]) -> str:
+    """
+    Formats the p50, p90, p99 and maximum of a list of durations in seconds, in milliseconds.
+    """
+    if not values:
+        return "n/a"
+    return ", ".join(
+        f"p{percent} {percentile(values, percent) * 1000:.1f} ms" for percent in (50, 90, 99)
+    ) + f", max {max(values) * 1000:.1f} ms ({len(values)} samples)"
@@ -0,0 +1,130 @@
+import asyncio
+import io
+import random
+import wave
+
+from aiohttp import web
+from loguru import logger
+
+from hard_brain_bot.utils.helpers import VersionHelper
+
+WORDS = (
+    "fire", "beat", "dream", "light", "night", "star", "burst", "chaos", "rising", "sky", "heaven", "blue",
+    "crystal", "eternal", "flower", "glory", "horizon", "infinity", "love", "mirror", "neon", "ocean", "rhythm",
+)
+
+
+class StubHardBrainApi:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        catalog_size: int = 2000,
+        latency: float = 0.05,
+        audio_seconds: float = 10.0,
+        seed: int = 0,
+        chunk_size: int = 16 * 1024,
+        chunk_delay: float = 0.0,
+    ):
+        """
+        A stand-in for the Hard Brain API which serves `/question` and `/audio/{song_id}` from a generated catalog.
+        :param host: Address to listen on.
+        :param port: Port to listen on. If 0, a free port is picked, see `port` once started.
+        :param catalog_size: Number of songs in the generated catalog.
+        :param latency: Seconds to wait before answering each request.
+        :param audio_seconds: Length of the audio clips served, which are 48 kHz stereo WAV files.
+        :param seed: Seed for generating the catalog.
+        :param chunk_size: Size of the chunks audio is streamed in, if `chunk_delay` is set.
+        :param chunk_delay: If above 0, audio is streamed slowly, waiting this many seconds before each chunk.
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self.audio_bytes_served = 0
+        self._random = random.Random(seed)
+        self._songs = [self._generate_song(index) for index in range(catalog_size)]
+        self._songs_by_id = {song["song_id"]: song for song in self._songs}
+        self._audio = _generate_wav(audio_seconds)
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def songs(self) -> list[dict]:
+        return self._songs
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/question", self._handle_question)
+        app.router.add_get("/audio/{song_id}", self._handle_audio)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"Stub Hard Brain API serving {len(self._songs)} songs on {self.url}")
+
+    async def close(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_question(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        number_of_songs = int(request.query.get("number_of_songs", 5))
+        songs = self._songs
+        if version_string := request.query.get("version_string"):
+            versions = set(VersionHelper.get_game_versions(version_string))
+            songs = [song for song in songs if song["game_version"] in versions]
+        return web.json_response(self._random.sample(songs, min(number_of_songs, len(songs))))
+
+    async def _handle_audio(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if request.match_info["song_id"] not in self._songs_by_id:
+            raise web.HTTPNotFound()
+        if self.chunk_delay <= 0:
+            self.audio_bytes_served += len(self._audio)
+            return web.Response(body=self._audio, content_type="audio/wav")
+        response = web.StreamResponse(headers={"Content-Type": "audio/wav"})
+        response.content_length = len(self._audio)
+        await response.prepare(request)
+        for start in range(0, len(self._audio), self.chunk_size):
+            await asyncio.sleep(self.chunk_delay)
+            chunk = self._audio[start:start + self.chunk_size]
+            await response.write(chunk)
+            self.audio_bytes_served += len(chunk)
+        await response.write_eof()
+        return response
+
+    def _generate_song(self, index: int) -> dict:
+        game_version = self._random.randint(1, 31)
+        title = " ".join(self._random.choice(WORDS) for _ in range(self._random.randint(1, 4))).title()
+        alt_titles = ", ".join(title.lower().split()[:self._random.randint(0, 2)])
+        return {
+            "song_id": f"{game_version:02d}{index:03d}",
+            "filename": f"{game_version:02d}{index:03d}.mp3",
+            "title": title,
+            "alt_titles": alt_titles,
+            "game_version": game_version,
+            "genre": self._random.choice(WORDS).upper(),
+            "artist": self._random.choice(WORDS).capitalize(),
+        }
+
+
+def _generate_wav(seconds: float) -> bytes:
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(48000)
+        # low level noise rather than silence, so that encoders do real work
+        frame = bytes(random.Random(0).getrandbits(8) & 0x0F for _ in range(3840))
+        wav.writeframes(frame * int(seconds * 50))
+    return output.getvalue()
@@ -0,0 +1,173 @@
+import asyncio
+import pickle
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from hard_brain_bot.data_models.requests import SongData
+from hard_brain_bot.utils.async_helpers import AnswerQueue
+from hard_brain_bot.utils.metrics import ANSWER_CHECKS, REGISTRY
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_song(song_id: str, title: str) -> SongData:
+    return SongData.from_props({
+        "song_id": song_id, "filename": f"{song_id}.mp3", "title": title, "alt_titles": "",
+        "game_version": 1, "genre": "GENRE", "artist": "Artist",
+    })
+
+
+class Recorder:
+    def __init__(self):
+        self.winners: list[tuple[SongData, str]] = []
+        self.answered = asyncio.Event()
+        self.answered_at: float | None = None
+
+    async def on_correct_answer(self, current_song: SongData, sender: str) -> None:
+        self.winners.append((current_song, sender))
+        if self.answered_at is None:
+            self.answered_at = time.perf_counter()
+        self.answered.set()
+
+
+def test_earliest_correct_answer_wins_regardless_of_arrival_order():
+    song = make_song("01001", "Hard Brain")
+
+    async def main():
+        recorder = Recorder()
+        queue = AnswerQueue(recorder.on_correct_answer)
+        # messages arrive out of order, e.g. from different shards or after a gateway hiccup
+        queue.queue_answer(song, "hard brain", START + timedelta(seconds=3), "third")
+        queue.queue_answer(song, "wrong", START, "first")
+        queue.queue_answer(song, "hardbrain", START + timedelta(seconds=1), "second")
+        await asyncio.wait_for(recorder.answered.wait(), timeout=1)
+        await asyncio.sleep(0.05)
+        return recorder
+
+    recorder = asyncio.run(main())
+    assert recorder.winners == [(song, "second")]
+
+
+def test_answers_for_an_answered_song_are_discarded():
+    first_song = make_song("01001", "Hard Brain")
+    second_song = make_song("01002", "Quasar")
+
+    async def main():
+        recorder = Recorder()
+        queue = AnswerQueue(recorder.on_correct_answer)
+        queue.queue_answer(first_song, "hard brain", START, "first")
+        await asyncio.wait_for(recorder.answered.wait(), timeout=1)
+        assert not queue.queue_answer(first_song, "hard brain", START - timedelta(seconds=1), "too late")
+        # the next round's answers are still checked
+        assert queue.queue_answer(second_song, "quasar", START + timedelta(seconds=10), "next round")
+        await asyncio.sleep(0.05)
+        return recorder
+
+    recorder = asyncio.run(main())
+    assert recorder.winners == [(first_song, "first"), (second_song, "next round")]
+
+
+@pytest.mark.parametrize("use_executor", [False, True])
+def test_burst_of_answers_is_judged_quickly(use_executor):
+    song = make_song("01003", "Colors (radio edit)")
+    burst_size = 200
+    executor = ThreadPoolExecutor(max_workers=1) if use_executor else None
+
+    async def main():
+        recorder = Recorder()
+        queue = AnswerQueue(recorder.on_correct_answer, executor=executor, max_pending=burst_size)
+        answers = [
+            (f"player{index}", f"wrong guess number {index}", START + timedelta(milliseconds=index))
+            for index in range(burst_size - 2)
+        ]
+        answers.append(("late", "colors radio edit", START + timedelta(seconds=5)))
+        answers.append(("winner", "colors radio edi", START + timedelta(seconds=4)))
+        random.Random(0).shuffle(answers)
+
+        started_at = time.perf_counter()
+        for sender, answer, created_at in answers:
+            assert queue.queue_answer(song, answer, created_at, sender)
+        queued_in = time.perf_counter() - started_at
+        # one more than the queue can hold is dropped instead of blocking
+        assert not queue.queue_answer(song, "colors", START, "overflow")
+        await asyncio.wait_for(recorder.answered.wait(), timeout=5)
+        return recorder, queued_in, recorder.answered_at - started_at, queue.dropped
+
+    try:
+        recorder, queued_in, verdict_latency, dropped = asyncio.run(main())
+    finally:
+        if executor:
+            executor.shutdown()
+    assert recorder.winners == [(song, "winner")]
+    assert dropped == 1
+    # queueing only appends, and the whole burst is scored as one batch
+    assert queued_in < 0.05
+    assert verdict_latency < 0.5
+
+
+def test_answer_checks_scored_in_another_process_are_counted_in_this_one():
+    song = make_song("01004", "Hard Brain")
+    executor = ProcessPoolExecutor(max_workers=1)
+    before = {check: ANSWER_CHECKS.labels(check).value for check in ("exact_match", "rejected_early", "scored")}
+
+    async def main():
+        recorder = Recorder()
+        queue = AnswerQueue(recorder.on_correct_answer, executor=executor)
+        for index, answer in enumerate(["no", "brain hard", "hard brains", "hard brain"]):
+            queue.queue_answer(song, answer, START + timedelta(seconds=index), answer)
+        await asyncio.wait_for(recorder.answered.wait(), timeout=30)
+        return recorder
+
+    try:
+        recorder = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert recorder.winners == [(song, "hard brains")]
+    after = {check: ANSWER_CHECKS.labels(check).value for check in before}
+    assert {check: after[check] - before[check] for check in before} == {
+        "exact_match": 0, "rejected_early": 1, "scored": 2,
+    }
+    assert 'hard_brain_answer_checks_total{check="scored"}' in REGISTRY.render()
+
+
+class PicklingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        """
+        Pickles work like a process pool does, keeping the payloads, then runs it on a thread.
+        """
+        super().__init__(max_workers=1)
+        self.payloads: list[bytes] = []
+
+    def submit(self, fn, /, *args, **kwargs):
+        payload = pickle.dumps((fn, args, kwargs))
+        self.payloads.append(payload)
+        fn, args, kwargs = pickle.loads(payload)
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_only_the_answer_key_is_sent_to_the_executor():
+    song = SongData.from_props({
+        "song_id": "01005", "filename": "01005_unique_filename.mp3", "title": "Hard Brain", "alt_titles": "HB",
+        "game_version": 1, "genre": "UNIQUE GENRE", "artist": "Unique Artist",
+    })
+    executor = PicklingExecutor()
+
+    async def main():
+        recorder = Recorder()
+        queue = AnswerQueue(recorder.on_correct_answer, executor=executor)
+        queue.queue_answer(song, "hard brains", START, "winner")
+        await asyncio.wait_for(recorder.answered.wait(), timeout=5)
+        return recorder
+
+    try:
+        recorder = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert recorder.winners == [(song, "winner")]
+    [payload] = executor.payloads
+    assert b"hardbrain" in payload
+    assert not any(field in payload for field in (b"unique_filename", b"UNIQUE GENRE", b"Unique Artist", b"SongData"))
@@ -0,0 +1,158 @@
+import asyncio
+import os
+
+import pytest
+
+from hard_brain_bot.services.audio_cache import AudioCache
+from hard_brain_bot.services.hard_brain_service import HardBrainService
+from hard_brain_bot.utils.metrics import REGISTRY
+
+
+class CountingFetch:
+    def __init__(self, size: int = 10, fail: bool = False):
+        """
+        Fetches a clip of `size` bytes for a song id, counting each fetch. Fetches wait until `release` is set.
+        """
+        self.size = size
+        self.fail = fail
+        self.fetched: list[str] = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, song_id: str) -> bytes:
+        self.fetched.append(song_id)
+        await self.release.wait()
+        if self.fail:
+            raise ConnectionError(f"could not fetch {song_id}")
+        return song_id.encode().ljust(self.size, b".")
+
+
+def test_concurrent_requests_share_one_fetch():
+    cache = AudioCache()
+
+    async def main():
+        fetch = CountingFetch()
+        fetch.release.clear()
+        requests = [asyncio.create_task(cache.get_or_fetch("01001", fetch)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        fetch.release.set()
+        clips = await asyncio.gather(*requests)
+        # once stored, the clip is served from memory
+        clips.append(await cache.get_or_fetch("01001", fetch))
+        return fetch, clips
+
+    fetch, clips = asyncio.run(main())
+    assert fetch.fetched == ["01001"]
+    assert len(set(clips)) == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_waiter_takes_over_a_cancelled_fetch():
+    cache = AudioCache()
+
+    async def main():
+        fetch = CountingFetch()
+        fetch.release.clear()
+        first = asyncio.create_task(cache.get_or_fetch("01001", fetch))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(cache.get_or_fetch("01001", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        fetch.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return fetch, await second
+
+    fetch, clip = asyncio.run(main())
+    assert clip.startswith(b"01001")
+    assert fetch.fetched == ["01001", "01001"]
+
+
+def test_failed_fetch_is_shared_then_retried():
+    cache = AudioCache()
+
+    async def main():
+        fetch = CountingFetch(fail=True)
+        fetch.release.clear()
+        requests = [asyncio.create_task(cache.get_or_fetch("01001", fetch)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        fetch.release.set()
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert fetch.fetched == ["01001"]
+        fetch.fail = False
+        return await cache.get_or_fetch("01001", fetch)
+
+    assert asyncio.run(main()).startswith(b"01001")
+    assert "01001" in cache
+
+
+def test_memory_tier_evicts_least_recently_used_clips():
+    cache = AudioCache(memory_budget=30)
+
+    async def main():
+        fetch = CountingFetch(size=10)
+        for song_id in ("a", "b", "c"):
+            await cache.get_or_fetch(song_id, fetch)
+        # using "a" makes "b" the least recently used
+        await cache.get_or_fetch("a", fetch)
+        await cache.get_or_fetch("d", fetch)
+        # clips larger than the whole budget aren't kept
+        await cache.get_or_fetch("huge", CountingFetch(size=31))
+
+    asyncio.run(main())
+    assert [song_id for song_id in ("a", "b", "c", "d", "huge") if song_id in cache] == ["a", "c", "d"]
+    assert cache.stats()["memory_bytes"] == 30
+
+
+def test_disk_tier_evicts_least_recently_used_clips(tmp_path):
+    # nothing fits in memory, so every repeat request is read from disk
+    cache = AudioCache(memory_budget=0, disk_directory=str(tmp_path), disk_budget=25)
+
+    async def main():
+        fetch = CountingFetch(size=10)
+        await cache.get_or_fetch("a", fetch)
+        await cache.get_or_fetch("b", fetch)
+        await cache.get_or_fetch("a", fetch)
+        await cache.get_or_fetch("c", fetch)
+        return fetch
+
+    fetch = asyncio.run(main())
+    assert fetch.fetched == ["a", "b", "c"]
+    assert cache.stats()["disk_hits"] == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.audio", "c.audio"]
+    assert cache.stats()["disk_bytes"] == 20
+
+
+def test_disk_index_is_reloaded_and_trimmed_to_budget(tmp_path):
+    for age, song_id in enumerate(("old", "middle", "new")):
+        path = tmp_path / f"{song_id}.audio"
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (1_000_000 + age, 1_000_000 + age))
+
+    cache = AudioCache(disk_directory=str(tmp_path), disk_budget=20)
+
+    async def main():
+        return await cache.get_or_fetch("new", CountingFetch())
+
+    assert asyncio.run(main()) == b"x" * 10
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["middle.audio", "new.audio"]
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_cache_counters_are_exposed_as_metrics():
+    cache = AudioCache()
+    HardBrainService(audio_cache=cache)
+
+    async def main():
+        fetch = CountingFetch(size=10)
+        await cache.get_or_fetch("01001", fetch)
+        await cache.get_or_fetch("01001", fetch)
+
+    asyncio.run(main())
+    metrics = REGISTRY.render()
+    assert 'hard_brain_audio_cache_lookups{cache="audio",result="hits"} 1.0' in metrics
+    assert 'hard_brain_audio_cache_lookups{cache="audio",result="misses"} 1.0' in metrics
+    assert 'hard_brain_audio_cache_bytes{cache="audio",tier="memory"} 10.0' in metrics
@@ -0,0 +1,190 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import ClientResponseError, web
+
+from hard_brain_bot.services.audio_cache import AudioCache
+from hard_brain_bot.services.hard_brain_service import HardBrainService
+from hard_brain_bot.services.quiz_service import QuizService
+from hard_brain_bot.utils.audio import AudioPipe
+from loadtest.fakes import (
+    FakeGuild, FakeInteraction, FakeMember, FakeThread, FakeVoiceChannel, FakeVoiceState, PcmPassthroughEncoder,
+)
+from loadtest.stub_api import StubHardBrainApi
+
+CHUNK_SIZE = 16 * 1024
+
+
+class DroppingAudioApi:
+    def __init__(self, failures: int = 0, drop_after: int | None = None, audio: bytes = bytes(64 * 1024)):
+        """
+        Serves `/audio/{song_id}`, answering the first `failures` requests with a 500, and dropping the connection
+        after `drop_after` bytes of each response if set.
+        """
+        self.failures = failures
+        self.drop_after = drop_after
+        self.audio = audio
+        self.requests = 0
+        self.port = 0
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/audio/{song_id}", self._handle_audio)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        self.port = self._runner.addresses[0][1]
+
+    async def close(self) -> None:
+        await self._runner.cleanup()
+
+    async def _handle_audio(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        if self.requests <= self.failures:
+            return web.json_response({"detail": "Internal error"}, status=500)
+        response = web.StreamResponse(headers={"Content-Type": "audio/wav"})
+        response.content_length = len(self.audio)
+        await response.prepare(request)
+        if self.drop_after is None:
+            await response.write(self.audio)
+            await response.write_eof()
+            return response
+        await response.write(self.audio[:self.drop_after])
+        await asyncio.sleep(0.05)
+        request.transport.close()
+        return response
+
+
+def make_service(port: int, stream_audio: bool = True) -> HardBrainService:
+    return HardBrainService(hostname="127.0.0.1", port=port, audio_cache=AudioCache(), stream_audio=stream_audio)
+
+
+async def read_all(audio_pipe: AudioPipe) -> bytes:
+    chunks = []
+    while chunk := await asyncio.to_thread(audio_pipe.read):
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def test_slow_stream_plays_before_download_finishes_with_bounded_buffer():
+    async def main():
+        api = StubHardBrainApi(catalog_size=1, latency=0, audio_seconds=1.0, chunk_size=CHUNK_SIZE, chunk_delay=0.03)
+        await api.start()
+        service = make_service(api.port)
+        song_id = api.songs[0]["song_id"]
+        try:
+            started_at = time.perf_counter()
+            audio_pipe = AudioPipe(service.stream_audio(song_id), max_buffered_chunks=2)
+            first_chunk = await asyncio.to_thread(audio_pipe.read)
+            time_to_first_chunk = time.perf_counter() - started_at
+
+            # stop reading for long enough that the whole clip would have arrived if it weren't held back
+            await asyncio.sleep(0.5)
+            assert audio_pipe.bytes_received <= 3 * CHUNK_SIZE
+
+            rest = await read_all(audio_pipe)
+            download_time = time.perf_counter() - started_at
+        finally:
+            await service.close()
+            await api.close()
+        return api, first_chunk + rest, time_to_first_chunk, download_time
+
+    api, audio, time_to_first_chunk, download_time = asyncio.run(main())
+    assert audio == api._audio
+    # the clip is 12 chunks at 30 ms each, so the first chunk should be playable long before the last arrives
+    assert time_to_first_chunk < 0.2
+    assert download_time > 0.3
+
+
+def test_stream_failing_before_any_audio_raises_when_waited_on():
+    async def main():
+        api = StubHardBrainApi(catalog_size=1, latency=0)
+        await api.start()
+        service = make_service(api.port)
+        try:
+            audio_pipe = AudioPipe(service.stream_audio("99999"))
+            with pytest.raises(ClientResponseError):
+                await audio_pipe.wait_until_started()
+            assert await asyncio.to_thread(audio_pipe.read) == b""
+        finally:
+            await service.close()
+            await api.close()
+
+    asyncio.run(main())
+
+
+def test_stream_dropped_part_way_ends_early_with_error():
+    async def main():
+        api = DroppingAudioApi(drop_after=20_000)
+        await api.start()
+        service = make_service(api.port)
+        try:
+            audio_pipe = AudioPipe(service.stream_audio("01001"))
+            await audio_pipe.wait_until_started()
+            audio = await read_all(audio_pipe)
+        finally:
+            await service.close()
+            await api.close()
+        return audio_pipe, audio
+
+    audio_pipe, audio = asyncio.run(main())
+    assert len(audio) == 20_000
+    assert audio_pipe.error is not None
+
+
+def make_quiz(service: HardBrainService, round_time_limit: float = 10.0):
+    guild = FakeGuild()
+    voice_channel = FakeVoiceChannel(guild, "voice", realtime_audio=False)
+    thread = FakeThread("quiz")
+    ctx = FakeInteraction(FakeMember("host", voice=FakeVoiceState(voice_channel)), guild, thread)
+    song = {
+        "song_id": "01001", "filename": "01001.mp3", "title": "Song", "alt_titles": "", "game_version": 1,
+        "genre": "GENRE", "artist": "Artist",
+    }
+    return voice_channel, thread, lambda voice_client: QuizService(
+        ctx, thread, service, song_data_list=[song], round_time_limit=round_time_limit, voice_client=voice_client,
+    )
+
+
+def test_stream_failing_to_start_falls_back_to_download():
+    async def main():
+        api = DroppingAudioApi(failures=1)
+        await api.start()
+        service = make_service(api.port)
+        _, _, create_quiz = make_quiz(service)
+        try:
+            quiz = create_quiz(None)
+            audio = await quiz._get_audio(0, "01001")
+        finally:
+            await service.close()
+            await api.close()
+        return api, audio
+
+    api, audio = asyncio.run(main())
+    assert audio == api.audio
+    assert api.requests == 2
+
+
+def test_stream_dropped_mid_round_skips_round(monkeypatch):
+    monkeypatch.setattr(QuizService, "_create_encoder", lambda quiz, source: PcmPassthroughEncoder(source))
+
+    async def main():
+        api = DroppingAudioApi(drop_after=20_000)
+        await api.start()
+        service = make_service(api.port)
+        voice_channel, thread, create_quiz = make_quiz(service, round_time_limit=10.0)
+        try:
+            quiz = create_quiz(await voice_channel.connect())
+            started_at = time.perf_counter()
+            await asyncio.wait_for(quiz.start_game(), timeout=5)
+            elapsed = time.perf_counter() - started_at
+        finally:
+            await service.close()
+            await api.close()
+        return thread, elapsed
+
+    thread, elapsed = asyncio.run(main())
+    assert "An error occurred while streaming the song, skipping round" in [content for _, content, _ in thread.sent]
+    assert elapsed < 5
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError, web
+
+from hard_brain_bot.services.audio_cache import AudioCache
+from hard_brain_bot.services.hard_brain_service import HardBrainService
+
+
+class FlakyAudioApi:
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.requests = 0
+        self._runner: web.AppRunner | None = None
+        self.port = 0
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/audio/{song_id}", self._handle_audio)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        self.port = self._runner.addresses[0][1]
+
+    async def close(self) -> None:
+        await self._runner.cleanup()
+
+    async def _handle_audio(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.requests <= self.failures:
+            return web.json_response({"detail": "Internal error"}, status=500)
+        return web.Response(body=b"audio " + request.match_info["song_id"].encode(), content_type="audio/wav")
+
+
+def test_error_responses_are_raised_and_not_cached(tmp_path):
+    async def main():
+        api = FlakyAudioApi(failures=1)
+        await api.start()
+        cache = AudioCache(disk_directory=str(tmp_path))
+        service = HardBrainService(hostname="127.0.0.1", port=api.port, audio_cache=cache, stream_audio=False)
+        try:
+            with pytest.raises(ClientResponseError) as error:
+                await service.get_audio("27001")
+            assert error.value.status == 500
+            assert "27001" not in cache
+            assert not list(tmp_path.iterdir())
+
+            assert await service.get_audio("27001") == b"audio 27001"
+            assert await service.get_audio("27001") == b"audio 27001"
+        finally:
+            await service.close()
+            await api.close()
+        return api
+
+    api = asyncio.run(main())
+    assert api.requests == 2
@@ -0,0 +1,94 @@
+import asyncio
+import itertools
+import time
+
+import aiohttp
+import pytest
+from disnake import Embed
+
+from hard_brain_bot.services.message_scheduler import MessagePriority, MessageScheduler
+
+_ids = itertools.count(1)
+
+
+class RecordingChannel:
+    def __init__(self, error: Exception | None = None):
+        self.id = next(_ids)
+        self.error = error
+        self.sent: list[tuple[float, str | None, list[Embed]]] = []
+
+    async def send(self, content: str | None = None, *, embeds: list[Embed] = ()):
+        if self.error:
+            raise self.error
+        self.sent.append((time.monotonic(), content, list(embeds)))
+
+
+def make_scheduler(rate: int = 2, per: float = 0.2) -> MessageScheduler:
+    scheduler = MessageScheduler()
+    scheduler.CHANNEL_RATE_LIMIT = (rate, per)
+    return scheduler
+
+
+def test_awaited_sends_share_rate_limit():
+    async def main():
+        scheduler = make_scheduler(rate=2, per=0.2)
+        channel = RecordingChannel()
+        started_at = time.monotonic()
+        for index in range(5):
+            await scheduler.send(channel, f"message {index}")
+        return channel, time.monotonic() - started_at
+
+    channel, elapsed = asyncio.run(main())
+    assert [content for _, content, _ in channel.sent] == [f"message {index}" for index in range(5)]
+    # 2 messages per window, so the 5th message waits for the third window
+    assert elapsed >= 0.4
+    sent_at = [sent_at for sent_at, _, _ in channel.sent]
+    for first, third in zip(sent_at, sent_at[2:]):
+        assert third - first >= 0.2
+
+
+def test_bucket_is_dropped_once_refilled():
+    async def main():
+        scheduler = make_scheduler(rate=2, per=0.1)
+        await scheduler.send(RecordingChannel(), "message")
+        assert scheduler._buckets
+        await asyncio.sleep(0.2)
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert not scheduler._buckets
+
+
+@pytest.mark.parametrize("error", [aiohttp.ClientConnectionError("connection reset"), asyncio.TimeoutError()])
+def test_send_errors_are_raised_to_senders(error):
+    async def main():
+        scheduler = make_scheduler()
+        channel = RecordingChannel(error)
+        scheduled = scheduler.schedule(channel, embed=Embed(title="scores"))
+        with pytest.raises(type(error)):
+            await asyncio.wait_for(scheduler.send(channel, "message"), timeout=1)
+        assert scheduled.done()
+        # the bucket keeps sending after a failure
+        channel.error = None
+        await asyncio.wait_for(scheduler.send(channel, "next message"), timeout=1)
+        return channel
+
+    channel = asyncio.run(main())
+    assert [content for _, content, _ in channel.sent] == ["next message"]
+
+
+def test_queued_embeds_are_merged_in_order():
+    async def main():
+        scheduler = make_scheduler(rate=1, per=0.1)
+        channel = RecordingChannel()
+        first = scheduler.schedule(channel, "Round 1")
+        embeds = [scheduler.schedule(channel, embed=Embed(title=f"embed {index}")) for index in range(3)]
+        urgent = scheduler.schedule(channel, "Round 2", priority=MessagePriority.HIGH)
+        await asyncio.gather(first, urgent, *embeds)
+        return channel
+
+    channel = asyncio.run(main())
+    assert [(content, [embed.title for embed in embeds]) for _, content, embeds in channel.sent] == [
+        ("Round 2", []),
+        ("Round 1", ["embed 0", "embed 1", "embed 2"]),
+    ]
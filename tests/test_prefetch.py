@@ -0,0 +1,130 @@
+import asyncio
+
+from aiohttp import ClientConnectionError
+
+from hard_brain_bot.services.audio_cache import AudioCache
+from hard_brain_bot.services.hard_brain_service import HardBrainService
+from hard_brain_bot.services.quiz_service import QuizService
+from loadtest.fakes import FakeGuild, FakeInteraction, FakeMember, FakeThread, FakeVoiceChannel, FakeVoiceState
+from loadtest.stub_api import StubHardBrainApi
+
+
+def run_with_quiz(test, rounds: int = 4, prefetch_depth: int = 1, latency: float = 0.0) -> None:
+    """
+    Runs a test coroutine function with a quiz over `rounds` songs from a stub API answering audio requests after
+    `latency` seconds, and the API and quiz's backend.
+    """
+    async def main():
+        api = StubHardBrainApi(catalog_size=rounds, latency=latency, audio_seconds=0.1)
+        await api.start()
+        service = HardBrainService(hostname="127.0.0.1", port=api.port, audio_cache=AudioCache(), stream_audio=False)
+        guild = FakeGuild()
+        voice_channel = FakeVoiceChannel(guild, "voice", realtime_audio=False)
+        thread = FakeThread("quiz")
+        ctx = FakeInteraction(FakeMember("host", voice=FakeVoiceState(voice_channel)), guild, thread)
+        quiz = QuizService(
+            ctx, thread, service, song_data_list=api.songs, prefetch_depth=prefetch_depth,
+            voice_client=await voice_channel.connect(),
+        )
+        try:
+            await test(quiz, api, service)
+        finally:
+            quiz._cancel_prefetch()
+            await service.close()
+            await api.close()
+
+    asyncio.run(main())
+
+
+def song_id(quiz: QuizService, index: int) -> str:
+    return quiz.song_data_list[index].song_id
+
+
+def test_prefetch_downloads_the_round_and_the_next_prefetch_depth_rounds():
+    async def test(quiz, api, service):
+        quiz._prefetch_audio(0)
+        first_tasks = dict(quiz._prefetch_tasks)
+        assert sorted(first_tasks) == [0, 1, 2]
+        await asyncio.gather(*first_tasks.values())
+
+        # rounds already downloading or downloaded aren't fetched again
+        quiz._prefetch_audio(1)
+        assert sorted(quiz._prefetch_tasks) == [0, 1, 2, 3]
+        assert all(quiz._prefetch_tasks[index] is task for index, task in first_tasks.items())
+        await asyncio.gather(*quiz._prefetch_tasks.values())
+        assert api.requests == 4
+
+        # the last rounds don't prefetch past the end of the game
+        quiz._prefetch_audio(3)
+        assert sorted(quiz._prefetch_tasks) == [0, 1, 2, 3]
+
+    run_with_quiz(test, prefetch_depth=2)
+
+
+def test_prefetched_audio_is_used_for_the_round():
+    async def test(quiz, api, service):
+        quiz._prefetch_audio(0)
+        await asyncio.gather(*quiz._prefetch_tasks.values())
+        requests = api.requests
+        assert await quiz._get_audio(0, song_id(quiz, 0)) == api._audio
+        assert api.requests == requests
+        assert 0 not in quiz._prefetch_tasks
+
+    run_with_quiz(test)
+
+
+def test_prefetch_depth_zero_only_downloads_the_current_round():
+    async def test(quiz, api, service):
+        quiz._prefetch_audio(0)
+        assert list(quiz._prefetch_tasks) == [0]
+
+    run_with_quiz(test, prefetch_depth=0)
+
+
+def test_end_game_cancels_outstanding_downloads():
+    async def test(quiz, api, service):
+        quiz._prefetch_audio(0)
+        tasks = list(quiz._prefetch_tasks.values())
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(quiz.end_game(show_embed=False), timeout=1)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(task.cancelled() for task in tasks)
+        assert quiz._prefetch_tasks == {}
+
+    run_with_quiz(test, prefetch_depth=2, latency=0.5)
+
+
+def test_skipping_a_loading_round_cancels_only_its_download():
+    async def test(quiz, api, service):
+        quiz._prefetch_audio(0)
+        next_round = quiz._prefetch_tasks[1]
+        audio = asyncio.create_task(quiz._get_audio(0, song_id(quiz, 0)))
+        await asyncio.sleep(0.05)
+        await quiz.skip_round()
+        # a cancelled download means the round is skipped rather than played
+        assert await asyncio.wait_for(audio, timeout=1) is None
+        assert 0 not in quiz._prefetch_tasks
+        assert not next_round.done()
+
+    run_with_quiz(test, latency=0.5)
+
+
+def test_failed_prefetch_falls_back_to_fetching_on_demand():
+    async def test(quiz, api, service):
+        fetch_audio = service._fetch_audio
+        failures = []
+
+        async def fail_once(song_id: str) -> bytes:
+            if not failures:
+                failures.append(song_id)
+                raise ClientConnectionError("connection reset")
+            return await fetch_audio(song_id)
+
+        service._fetch_audio = fail_once
+        quiz._prefetch_audio(0)
+        await asyncio.wait(quiz._prefetch_tasks.values())
+        assert quiz._prefetch_tasks[0].exception() is not None
+        assert await quiz._get_audio(0, song_id(quiz, 0)) == api._audio
+        assert failures == [song_id(quiz, 0)]
+
+    run_with_quiz(test, prefetch_depth=0)
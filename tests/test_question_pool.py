@@ -0,0 +1,58 @@
+import asyncio
+import random
+
+from hard_brain_bot.services.question_pool import QuestionPool
+
+
+def make_song(index: int, game_version: int = 1) -> dict:
+    return {
+        "song_id": f"{game_version:02d}{index:03d}", "filename": "", "title": f"Song {index}", "alt_titles": "",
+        "game_version": game_version, "genre": "", "artist": "",
+    }
+
+
+class FakeCatalog:
+    def __init__(self, songs: list[dict]):
+        self.songs = songs
+
+    def is_ready(self) -> bool:
+        return True
+
+    def sample(self, number_of_songs: int, versions: list[int]) -> list[dict]:
+        songs = [song for song in self.songs if not versions or song["game_version"] in versions]
+        return random.sample(songs, min(number_of_songs, len(songs)))
+
+
+class FakeBackend:
+    def __init__(self):
+        self.requests: list[int] = []
+
+    async def get_question(self, number_of_songs: int = 5, versions: list[int] | str = "") -> list[dict]:
+        self.requests.append(number_of_songs)
+        return [make_song(500 + index) for index in range(number_of_songs)]
+
+
+def get_questions(catalog: FakeCatalog, rounds: int, versions: list[int]) -> tuple[list[dict], FakeBackend]:
+    backend = FakeBackend()
+
+    async def main():
+        pool = QuestionPool(backend, catalog=catalog)
+        return await pool.get_questions(guild_id=1, rounds=rounds, versions=versions)
+
+    return asyncio.run(main()), backend
+
+
+def test_questions_are_sampled_from_catalog_when_it_has_enough_songs():
+    catalog = FakeCatalog([make_song(index) for index in range(50)])
+    questions, backend = get_questions(catalog, rounds=20, versions=[1])
+    assert len(questions) == 20
+    assert all(question in catalog.songs for question in questions)
+    assert backend.requests == []
+
+
+def test_incomplete_catalog_falls_through_to_api():
+    # a catalog which has only synced a few version 1 songs so far
+    catalog = FakeCatalog([make_song(index) for index in range(3)])
+    questions, backend = get_questions(catalog, rounds=20, versions=[1])
+    assert len(questions) == 20
+    assert backend.requests[0] == 20
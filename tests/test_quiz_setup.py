@@ -0,0 +1,158 @@
+import asyncio
+from types import SimpleNamespace
+
+import disnake
+import pytest
+from disnake import Webhook
+
+from hard_brain_bot.client import HardBrain
+from hard_brain_bot.cogs import quiz_commands
+from hard_brain_bot.cogs.quiz_commands import QuizCommands, QuizSetupError
+from loadtest.fakes import FakeGuild, FakeInteraction, FakeMember, FakeThread, FakeVoiceChannel, FakeVoiceState
+
+SONG = {
+    "song_id": "01001", "filename": "01001.mp3", "title": "Song", "alt_titles": "", "game_version": 1,
+    "genre": "GENRE", "artist": "Artist",
+}
+
+
+def run_with_cog(test) -> None:
+    """
+    Runs a test coroutine function with a quiz cog, which has to be created inside the event loop.
+    """
+    async def main():
+        cog = QuizCommands(HardBrain())
+
+        async def get_questions(guild_id, rounds, versions):
+            return [SONG] * rounds
+
+        cog._get_questions = get_questions
+        try:
+            await test(cog)
+        finally:
+            cog.cog_unload()
+
+    asyncio.run(main())
+
+
+def make_interaction() -> tuple[FakeInteraction, FakeVoiceChannel]:
+    guild = FakeGuild()
+    voice_channel = FakeVoiceChannel(guild, "voice", realtime_audio=False)
+    host = FakeMember("host", voice=FakeVoiceState(voice_channel))
+    return FakeInteraction(host, guild, FakeThread("quiz")), voice_channel
+
+
+def test_failed_setup_leaves_other_setups_voice_client_alone():
+    ctx, voice_channel = make_interaction()
+
+    async def test(cog):
+        # another quiz in this guild is still being set up and has already connected
+        other_voice_client = await voice_channel.connect()
+        with pytest.raises(QuizSetupError):
+            await cog._prepare_game(ctx, 1, [], {})
+        assert ctx.guild.voice_client is other_voice_client
+
+    run_with_cog(test)
+
+
+def test_failed_setup_disconnects_its_own_voice_client():
+    ctx, _ = make_interaction()
+
+    async def fail_questions(guild_id, rounds, versions):
+        # let voice connect first
+        await asyncio.sleep(0.05)
+        raise QuizSetupError("Network error occurred while preparing quiz...")
+
+    async def test(cog):
+        cog._get_questions = fail_questions
+        with pytest.raises(QuizSetupError):
+            await cog._prepare_game(ctx, 1, [], {})
+        assert ctx.guild.voice_client is None
+
+    run_with_cog(test)
+
+
+def test_error_before_game_starts_releases_everything(monkeypatch):
+    ctx, _ = make_interaction()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("quiz service could not be created")
+
+    async def test(cog):
+        with pytest.raises(RuntimeError):
+            await QuizCommands.start_quiz.callback(cog, ctx, rounds=1, time_limit=10.0, versions="")
+        assert ctx.guild.voice_client is None
+        assert not cog.games
+
+    monkeypatch.setattr(quiz_commands, "QuizService", fail)
+    run_with_cog(test)
+
+
+class FakeWebhook(Webhook):
+    def __init__(self, webhook_id: int, deleted: bool = False):
+        self.id = webhook_id
+        self.deleted = deleted
+        self.sent: list[str] = []
+
+    async def send(self, content: str | None = None, **kwargs) -> None:
+        if self.deleted:
+            raise disnake.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Webhook")
+        self.sent.append(content)
+
+
+def test_deleted_cached_webhook_is_replaced_before_the_game_starts(monkeypatch):
+    ctx, _ = make_interaction()
+    deleted_webhook = FakeWebhook(1, deleted=True)
+    new_webhook = FakeWebhook(2)
+    played = []
+
+    async def play(quiz_service):
+        played.append(quiz_service.webhook)
+
+    async def test(cog):
+        # the channel's webhook was cached by an earlier quiz, then deleted by someone else
+        cog.webhook_pool._webhooks[ctx.channel.id] = deleted_webhook
+
+        async def find_webhook(channel):
+            return None
+
+        async def create_webhook(channel):
+            return new_webhook
+
+        async def setup_message_receiver(ctx):
+            return await cog.webhook_pool.acquire(ctx.channel)
+
+        monkeypatch.setattr(cog.webhook_pool, "_find_webhook", find_webhook)
+        monkeypatch.setattr(cog.webhook_pool, "_create_webhook", create_webhook)
+        monkeypatch.setattr(cog, "_setup_message_receiver", setup_message_receiver)
+        await QuizCommands.start_quiz.callback(cog, ctx, rounds=1, time_limit=10.0, versions="")
+        assert played == [new_webhook]
+        assert new_webhook.sent[0].startswith("Quiz starting")
+        assert cog.webhook_pool._webhooks[ctx.channel.id] is new_webhook
+        assert not cog.webhook_pool._in_use
+        assert not cog.games
+
+    monkeypatch.setattr(quiz_commands.QuizService, "play", play)
+    run_with_cog(test)
+
+
+def test_start_reports_an_error_if_messages_still_cant_be_sent(monkeypatch):
+    ctx, _ = make_interaction()
+
+    async def play(quiz_service):
+        raise AssertionError("The game shouldn't start")
+
+    async def test(cog):
+        async def setup_message_receiver(ctx):
+            cog.webhook_pool._in_use[ctx.channel.id] += 1
+            return FakeWebhook(1, deleted=True)
+
+        monkeypatch.setattr(cog, "_setup_message_receiver", setup_message_receiver)
+        await QuizCommands.start_quiz.callback(cog, ctx, rounds=1, time_limit=10.0, versions="")
+        assert ctx.original_response.startswith("Error:")
+        assert ctx.guild.voice_client is None
+        assert not cog.webhook_pool._in_use
+        assert not cog.games
+
+    monkeypatch.setattr(quiz_commands.QuizService, "play", play)
+    run_with_cog(test)
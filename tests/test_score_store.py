@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from hard_brain_bot.services.score_store import LeaderboardEntry, ScoreStore
+
+START = datetime(2024, 1, 1)
+
+
+def run_with_store(tmp_path, test, **kwargs) -> None:
+    """
+    Runs a test coroutine function with a started score store on a fresh database.
+    """
+    async def main():
+        store = ScoreStore(str(tmp_path / "scores.db"), **kwargs)
+        await store.start()
+        try:
+            await test(store)
+        finally:
+            await store.close()
+
+    asyncio.run(main())
+
+
+def record_at(store: ScoreStore, minutes: int, user_id: int, guild_id: int, user_name: str, points: int = 1,
+              song_id: str | None = None) -> None:
+    store.record(user_id, guild_id, user_name, points, song_id)
+    # give each score a distinct time, as scores recorded in quick succession can share one
+    store._buffer[-1]["scored_at"] = START + timedelta(minutes=minutes)
+
+
+def test_buffered_scores_are_written_once_flush_size_is_reached(tmp_path):
+    async def test(store):
+        for index in range(2):
+            record_at(store, index, user_id=1, guild_id=10, user_name="alice")
+        assert store._size_flush_task is None
+        record_at(store, 2, user_id=1, guild_id=10, user_name="alice")
+        await store._size_flush_task
+        assert store._buffer == []
+        assert await store.top_players() == [LeaderboardEntry(1, "alice", 3, 3)]
+
+    # the periodic flush never runs during the test
+    run_with_store(tmp_path, test, flush_size=3, flush_interval=3600)
+
+
+def test_scores_are_kept_when_a_write_fails(tmp_path):
+    async def test(store):
+        record_at(store, 0, user_id=1, guild_id=10, user_name="alice")
+        insert_events = store._insert_events
+
+        def fail(events):
+            raise OSError("database is locked")
+
+        store._insert_events = fail
+        assert await store.flush() == 0
+        # scores recorded while the write was failing are kept after the ones which failed
+        record_at(store, 1, user_id=2, guild_id=10, user_name="bob")
+        assert [event["user_name"] for event in store._buffer] == ["alice", "bob"]
+        store._insert_events = insert_events
+        assert await store.flush() == 2
+        assert store._buffer == []
+
+    run_with_store(tmp_path, test, flush_interval=3600)
+
+
+def test_query_results_are_cached_until_the_next_flush(tmp_path):
+    async def test(store):
+        record_at(store, 0, user_id=1, guild_id=10, user_name="alice")
+        await store.flush()
+        assert await store.top_players() == [LeaderboardEntry(1, "alice", 1, 1)]
+        assert (await store.player_history(1)).total_points == 1
+
+        record_at(store, 1, user_id=1, guild_id=10, user_name="alice", points=2)
+        # buffered scores aren't written yet, so the cached results still stand
+        assert await store.top_players() == [LeaderboardEntry(1, "alice", 1, 1)]
+        await store.flush()
+        assert await store.top_players() == [LeaderboardEntry(1, "alice", 3, 2)]
+        assert (await store.player_history(1)).total_points == 3
+
+    run_with_store(tmp_path, test, flush_interval=3600, cache_ttl=3600)
+
+
+def test_top_players_by_guild_and_across_guilds(tmp_path):
+    async def test(store):
+        record_at(store, 0, user_id=1, guild_id=10, user_name="alice", points=3)
+        record_at(store, 1, user_id=2, guild_id=10, user_name="bob", points=2)
+        record_at(store, 2, user_id=2, guild_id=20, user_name="bob", points=2)
+        record_at(store, 3, user_id=3, guild_id=20, user_name="carol", points=1)
+        await store.flush()
+
+        assert await store.top_players() == [
+            LeaderboardEntry(2, "bob", 4, 2), LeaderboardEntry(1, "alice", 3, 1), LeaderboardEntry(3, "carol", 1, 1),
+        ]
+        assert await store.top_players(guild_id=10) == [
+            LeaderboardEntry(1, "alice", 3, 1), LeaderboardEntry(2, "bob", 2, 1),
+        ]
+        assert await store.top_players(guild_id=20, limit=1) == [LeaderboardEntry(2, "bob", 2, 1)]
+        assert await store.top_players(guild_id=30) == []
+
+    run_with_store(tmp_path, test, flush_interval=3600)
+
+
+def test_players_are_shown_by_their_latest_name(tmp_path):
+    async def test(store):
+        record_at(store, 0, user_id=1, guild_id=10, user_name="alice")
+        record_at(store, 1, user_id=1, guild_id=20, user_name="Alice in guild 20")
+        record_at(store, 2, user_id=1, guild_id=10, user_name="alice2")
+        await store.flush()
+
+        assert (await store.top_players())[0].user_name == "alice2"
+        # within a guild, the latest name used in that guild
+        assert (await store.top_players(guild_id=20))[0].user_name == "Alice in guild 20"
+
+    run_with_store(tmp_path, test, flush_interval=3600)
+
+
+def test_player_history_lists_most_recent_scores_first(tmp_path):
+    async def test(store):
+        # recorded out of order, as games in different guilds flush independently
+        record_at(store, 2, user_id=1, guild_id=10, user_name="alice", points=1, song_id="01003")
+        record_at(store, 0, user_id=1, guild_id=20, user_name="alice", points=2, song_id="01001")
+        record_at(store, 1, user_id=1, guild_id=10, user_name="alice", points=3, song_id="01002")
+        record_at(store, 3, user_id=2, guild_id=10, user_name="bob", points=5, song_id="01004")
+        await store.flush()
+
+        history = await store.player_history(1)
+        assert (history.total_points, history.rounds_won) == (6, 3)
+        assert history.recent == [
+            (START + timedelta(minutes=2), 10, "01003", 1),
+            (START + timedelta(minutes=1), 10, "01002", 3),
+            (START, 20, "01001", 2),
+        ]
+        assert [event[2] for event in (await store.player_history(1, limit=2)).recent] == ["01003", "01002"]
+
+        guild_history = await store.player_history(1, guild_id=10)
+        assert (guild_history.total_points, guild_history.rounds_won) == (4, 2)
+        assert [event[2] for event in guild_history.recent] == ["01003", "01002"]
+
+        empty = await store.player_history(3)
+        assert (empty.total_points, empty.rounds_won, empty.recent) == (0, 0, [])
+
+    run_with_store(tmp_path, test, flush_interval=3600)
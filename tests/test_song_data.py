@@ -0,0 +1,114 @@
+import pytest
+
+from hard_brain_bot.data_models.requests import SongData
+
+
+def make_song(title: str, alt_titles: str = "") -> SongData:
+    return SongData.from_props({
+        "song_id": "01001", "filename": "01001.mp3", "title": title, "alt_titles": alt_titles,
+        "game_version": 1, "genre": "GENRE", "artist": "Artist",
+    })
+
+
+def test_threshold_is_pinned():
+    # the expectations below were checked against thefuzz's token_sort_ratio at this threshold
+    assert SongData.similarity_threshold == 85
+
+
+@pytest.mark.parametrize("title, answer", [
+    ("Hard Brain", "hard brain"),
+    ("Hard Brain", "hardbrain"),
+    ("Hard Brain", "HARD BRAIN!!!"),
+    ("Hard Brain", "Hard Brian"),
+    ("Hard Brain", "Hart Brain"),
+    ("Hard Brain", "Hard Bran"),
+    ("Hard Brain", "hard brains"),
+    ("quasar", "quasr"),
+    ("quasar", "qusar"),
+    ("Mei", "meii"),
+    ("GAMBOL", "gambo"),
+    ("Colors (radio edit)", "colors radio edit"),
+    ("Colors (radio edit)", "colors radio edi"),
+    ("smooooch・∀・", "smooooch"),
+    ("smooooch・∀・", "smooch"),
+    # scores 84.6, which rounds up to the threshold
+    ("abcdefghijklm", "abcdefghijkxy"),
+])
+def test_accepted_answers(title, answer):
+    assert make_song(title).is_correct_answer(answer)
+
+
+@pytest.mark.parametrize("title, answer", [
+    ("Hard Brain", ""),
+    ("Hard Brain", "!!!"),
+    ("Hard Brain", "hard"),
+    ("Hard Brain", "brain hard"),
+    ("Hard Brain", "Hardcore Brain"),
+    ("quasar", "quaser"),
+    ("quasar", "qasr"),
+    ("Mei", "me"),
+    ("Colors (radio edit)", "colors"),
+    ("Colors (radio edit)", "radio edit colors"),
+    # scores 84.4, which rounds down below the threshold
+    ("abcdefghijklmnopqrstuv", "abcdefghijklmnopqrswxyz"),
+])
+def test_rejected_answers(title, answer):
+    assert not make_song(title).is_correct_answer(answer)
+
+
+@pytest.mark.parametrize("title, alt_titles, answer, expected", [
+    # CJK text is dropped before fuzzy matching, so it has to match exactly, ignoring punctuation and spaces
+    ("卑弥呼", "", "卑弥呼", True),
+    ("卑弥呼", "", "卑弥呼!", True),
+    ("冥", "", "冥 ", True),
+    ("卑弥呼", "", "卑弥", False),
+    ("卑弥呼", "", "ひみこ", False),
+    ("卑弥呼", "", "冥", False),
+    ("卑弥呼", "", "himiko", False),
+    ("冥", "", "mei", False),
+    # romanized alt titles are matched as usual
+    ("卑弥呼", "Himiko", "himiko", True),
+    ("卑弥呼", "Himiko", "himko", True),
+])
+def test_cjk_answers(title, alt_titles, answer, expected):
+    assert make_song(title, alt_titles).is_correct_answer(answer) is expected
+
+
+@pytest.mark.parametrize("title, answer, expected", [
+    # full-width letters are only accepted when typed exactly, they aren't folded to ascii
+    ("ＦＬＯＷＥＲ", "ＦＬＯＷＥＲ", True),
+    ("ＦＬＯＷＥＲ", "ｆｌｏｗｅｒ", True),
+    ("ＦＬＯＷＥＲ", "flower", False),
+    ("ＦＬＯＷＥＲ", "flowr", False),
+    ("Ｖ", "V", False),
+    ("V", "Ｖ", False),
+    ("Hard Brain", "ｈａｒｄ ｂｒａｉｎ", False),
+    ("Hard Brain", "ＨＡＲＤＢＲＡＩＮ", False),
+])
+def test_full_width_answers(title, answer, expected):
+    assert make_song(title).is_correct_answer(answer) is expected
+
+
+def test_first_correct_answer_returns_index_of_first_match():
+    song = make_song("Hard Brain", "HB")
+    assert song.first_correct_answer(["hard", "hb", "hard brain"])[0] == 1
+    assert song.first_correct_answer(["hard", "brain hard"])[0] is None
+    assert song.first_correct_answer([])[0] is None
+
+
+def test_first_correct_answer_counts_how_each_answer_was_checked():
+    song = make_song("Hard Brain")
+    # answers after the winner aren't checked
+    winner, checks = song.first_correct_answer(["no", "brain hard", "hard brains", "hard brain"])
+    assert winner == 2
+    assert checks == {"rejected_early": 1, "scored": 2}
+    assert song.first_correct_answer(["HARD BRAIN"]) == (0, {"exact_match": 1})
+
+
+def test_from_props_shares_songs_until_their_props_change():
+    song = make_song("Shared Song", "Shared")
+    assert make_song("Shared Song", "Shared") is song
+    changed = make_song("Shared Song", "Shared, Renamed")
+    assert changed is not song
+    assert changed.is_correct_answer("renamed")
+    assert make_song("Shared Song", "Shared, Renamed") is changed
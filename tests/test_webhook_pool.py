@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+from hard_brain_bot.services.webhook_pool import WebhookPool
+
+_ids = itertools.count(1)
+BOT_USER = SimpleNamespace(id=1, avatar=None)
+OTHER_USER = SimpleNamespace(id=2)
+
+
+class FakeWebhook:
+    def __init__(self, channel_id: int, name: str = WebhookPool.WEBHOOK_NAME, user=BOT_USER, token: str | None = "t"):
+        self.id = next(_ids)
+        self.channel_id = channel_id
+        self.name = name
+        self.user = user
+        self.token = token
+        self.deleted = False
+
+    async def delete(self, reason: str | None = None) -> None:
+        self.deleted = True
+
+
+class FakeChannel:
+    def __init__(self, guild: "FakeGuild"):
+        self.id = next(_ids)
+        self.guild = guild
+
+    async def webhooks(self) -> list[FakeWebhook]:
+        return [webhook for webhook in self.guild.all_webhooks if webhook.channel_id == self.id and not webhook.deleted]
+
+    async def create_webhook(self, name: str, avatar=None, reason: str | None = None) -> FakeWebhook:
+        webhook = FakeWebhook(self.id, name=name)
+        self.guild.all_webhooks.append(webhook)
+        return webhook
+
+
+class FakeGuild:
+    def __init__(self, manage_webhooks: bool = True):
+        self.id = next(_ids)
+        self.me = SimpleNamespace(guild_permissions=SimpleNamespace(manage_webhooks=manage_webhooks))
+        self.all_webhooks: list[FakeWebhook] = []
+
+    async def webhooks(self) -> list[FakeWebhook]:
+        raise AssertionError("Listing every webhook in a guild shouldn't be needed")
+
+
+class FakeBot:
+    def __init__(self, guilds: list[FakeGuild], channels: list[FakeChannel]):
+        self.user = BOT_USER
+        self.guilds = guilds
+        self.channels = {channel.id: channel for channel in channels}
+
+    def get_channel(self, channel_id: int) -> FakeChannel | None:
+        return self.channels.get(channel_id)
+
+
+def make_pool(guilds: list[FakeGuild], max_idle_time: float = 3600.0, channels: list[FakeChannel] = (),
+              database_path: str | None = None) -> WebhookPool:
+    return WebhookPool(FakeBot(guilds, channels), max_idle_time=max_idle_time, database_path=database_path)
+
+
+def test_sweep_orphans_deletes_only_owned_webhooks_in_recorded_channels(tmp_path):
+    database_path = str(tmp_path / "webhooks.db")
+    guild, other_process_guild = FakeGuild(), FakeGuild()
+    cached_channel, busy_channel, idle_channel, deleted_channel, unrecorded_channel = \
+        [FakeChannel(guild) for _ in range(5)]
+    other_process_channel = FakeChannel(other_process_guild)
+    channels = [cached_channel, busy_channel, idle_channel, unrecorded_channel, other_process_channel]
+
+    async def crashed_run():
+        # a run which used these channels' webhooks, then stopped without deleting them
+        pool = make_pool([guild, other_process_guild], channels=channels + [deleted_channel],
+                         database_path=database_path)
+        await pool.start()
+        used_channels = [idle_channel, busy_channel, deleted_channel, other_process_channel]
+        return [await pool.acquire(channel) for channel in used_channels]
+
+    async def main():
+        orphan, busy_orphan, _, other_process_orphan = await crashed_run()
+        someone_elses = FakeWebhook(idle_channel.id, user=OTHER_USER)
+        other_name = FakeWebhook(idle_channel.id, name="Other")
+        unrecorded_orphan = FakeWebhook(unrecorded_channel.id)
+        guild.all_webhooks += [someone_elses, other_name, unrecorded_orphan]
+
+        # this process only handles the first guild, and the deleted channel no longer exists
+        pool = make_pool([guild], channels=channels, database_path=database_path)
+        await pool.start()
+        cached = await pool.acquire(cached_channel)
+        pool.release(cached_channel.id)
+        # a quiz is being set up in this channel, so its webhook may be about to be adopted
+        pool._in_use[busy_channel.id] += 1
+        await pool.sweep_orphans(delay=0)
+
+        assert orphan.deleted
+        assert not cached.deleted
+        assert not busy_orphan.deleted
+        assert not someone_elses.deleted
+        assert not other_name.deleted
+        assert not unrecorded_orphan.deleted
+        assert not other_process_orphan.deleted
+        # swept and missing channels are forgotten, the rest are kept for the next run
+        assert set(pool._load_channels()) == {cached_channel.id, busy_channel.id, other_process_channel.id}
+
+    asyncio.run(main())
+
+
+def test_sweep_orphans_does_nothing_without_a_database():
+    guild = FakeGuild()
+    channel = FakeChannel(guild)
+    orphan = FakeWebhook(channel.id)
+    guild.all_webhooks.append(orphan)
+    pool = make_pool([guild], channels=[channel])
+
+    async def main():
+        await pool.start()
+        await pool.sweep_orphans(delay=0)
+
+    asyncio.run(main())
+    assert not orphan.deleted
+
+
+def test_close_deletes_cached_webhooks():
+    guild = FakeGuild()
+    channels = [FakeChannel(guild) for _ in range(3)]
+    pool = make_pool([guild])
+
+    async def main():
+        webhooks = [await pool.acquire(channel) for channel in channels]
+        pool.release(channels[0].id)
+        await pool.close()
+        return webhooks
+
+    webhooks = asyncio.run(main())
+    assert all(webhook.deleted for webhook in webhooks)
+
+
+def test_webhook_stays_in_use_until_every_quiz_releases_it():
+    guild = FakeGuild()
+    channel = FakeChannel(guild)
+    pool = make_pool([guild], max_idle_time=-1)
+
+    async def main():
+        first = await pool.acquire(channel)
+        second = await pool.acquire(channel)
+        assert first is second
+        pool.release(channel.id)
+        await pool.sweep()
+        assert not first.deleted
+        pool.release(channel.id)
+        await pool.sweep()
+        assert first.deleted
+
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from hard_brain_bot.data_models.requests import SongData
+from hard_brain_bot.services.worker_pool import WorkerPool
+from hard_brain_bot.utils.async_helpers import AnswerQueue
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(size=1, fallback_threads=1)
+    yield pool
+    pool.close()
+
+
+def kill_worker(pool: WorkerPool, worker_id: int) -> None:
+    process = pool.workers[worker_id]._process
+    process.kill()
+    process.join()
+
+
+def test_game_work_survives_its_worker_dying(pool):
+    executor = pool.assign(guild_id=1)
+    first_worker = pool.workers[0]
+    worker_pid = executor.submit(os.getpid).result(timeout=30)
+    assert worker_pid not in (None, os.getpid())
+
+    kill_worker(pool, 0)
+    # the worker is replaced, keeping its games
+    replacement_pid = executor.submit(os.getpid).result(timeout=30)
+    assert pool.workers[0] is not first_worker
+    assert replacement_pid not in (worker_pid, os.getpid())
+    assert pool.workers[0].guild_ids == {1}
+
+    # while it can't be replaced again, work runs in this process instead
+    kill_worker(pool, 0)
+    assert executor.submit(os.getpid).result(timeout=30) == os.getpid()
+
+
+def test_work_in_flight_when_worker_dies_is_run_again(pool):
+    executor = pool.assign(guild_id=1)
+    executor.submit(os.getpid).result(timeout=30)
+    future = executor.submit(time.sleep, 1.0)
+    time.sleep(0.2)
+    kill_worker(pool, 0)
+    assert future.result(timeout=10) is None
+
+
+class BrokenExecutor(Executor):
+    def submit(self, fn, /, *args, **kwargs):
+        raise RuntimeError("Worker has been shut down")
+
+
+def test_answer_queue_scores_on_event_loop_if_executor_fails():
+    song = SongData.from_props({
+        "song_id": "01001", "filename": "01001.mp3", "title": "Broken Executor", "alt_titles": "",
+        "game_version": 1, "genre": "GENRE", "artist": "Artist",
+    })
+    winners = []
+
+    async def on_correct_answer(current_song, sender):
+        winners.append(sender)
+
+    async def main():
+        queue = AnswerQueue(on_correct_answer, executor=BrokenExecutor())
+        now = datetime.now(timezone.utc)
+        queue.queue_answer(song, "wrong", now, "first")
+        queue.queue_answer(song, "broken executor", now + timedelta(seconds=1), "second")
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert winners == ["second"]